@@ -0,0 +1,125 @@
+"""
+Benchmark PubMed XML parsing: whole-document DOM vs streaming iterparse.
+
+The DOM baseline reproduces the previous efetch path: read the whole response,
+decode it to a string, ET.fromstring, then parse each PubmedArticle with the
+title and abstract text re-serialised through ET.tostring (legacy_text), as
+the parser did before itertext. The streaming path is
+pubmed_fetch.iter_pubmed_articles over the open file.
+Reports articles/sec and peak traced memory (tracemalloc) for each.
+
+Usage:
+    python -m benchmarks.bench_pubmed_parse data/corpus/raw/efetch_*.xml
+    python -m benchmarks.bench_pubmed_parse --synthetic 20000
+"""
+
+import gc
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils import pubmed_fetch
+from src.utils.pubmed_fetch import _parse_single_article, iter_pubmed_articles
+
+
+@contextmanager
+def legacy_text():
+    """Read mixed-content text the pre-iterparse way: serialise, then reparse as text."""
+    saved = pubmed_fetch._text
+    pubmed_fetch._text = lambda elem: ET.tostring(elem, encoding="unicode", method="text")
+    try:
+        yield
+    finally:
+        pubmed_fetch._text = saved
+
+
+def dom_parse(path: str) -> list[dict]:
+    with open(path, "rb") as f:
+        xml_str = f.read().decode()
+    root = ET.fromstring(xml_str)
+    with legacy_text():
+        return [art for elem in root.findall(".//PubmedArticle") if (art := _parse_single_article(elem))]
+
+
+def stream_parse(path: str) -> list[dict]:
+    with open(path, "rb") as f:
+        return list(iter_pubmed_articles(f))
+
+
+def synthetic_response(path: Path, n_articles: int):
+    """Write an efetch-like response with realistic structured abstracts."""
+    sentence = ("Short-term exposure to <i>PM</i><sub>2.5</sub> was associated with "
+                "respiratory hospital admissions (RR 1.021, 95% CI 1.010-1.032). ")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" ?>\n<PubmedArticleSet>\n')
+        for i in range(n_articles):
+            authors = "".join(f"<Author><LastName>Author{j}</LastName><ForeName>A</ForeName></Author>"
+                              for j in range(8))
+            sections = "".join(f'<AbstractText Label="{label}">{sentence * 3}</AbstractText>'
+                               for label in ("BACKGROUND", "METHODS", "RESULTS", "CONCLUSIONS"))
+            mesh = "".join(f"<MeshHeading><DescriptorName>Term {j}</DescriptorName></MeshHeading>"
+                           for j in range(12))
+            f.write(
+                f"<PubmedArticle><MedlineCitation><PMID>{30000000 + i}</PMID><Article>"
+                f"<Journal><Title>Environ Res</Title><JournalIssue><PubDate><Year>2020</Year>"
+                f"</PubDate></JournalIssue></Journal>"
+                f"<ArticleTitle>Fine particulate matter and asthma admissions {i}</ArticleTitle>"
+                f"<Abstract>{sections}</Abstract><AuthorList>{authors}</AuthorList>"
+                f"<PublicationTypeList><PublicationType>Journal Article</PublicationType>"
+                f"</PublicationTypeList></Article><MeshHeadingList>{mesh}</MeshHeadingList>"
+                f"</MedlineCitation><PubmedData><ArticleIdList>"
+                f'<ArticleId IdType="doi">10.1000/{i}</ArticleId></ArticleIdList></PubmedData>'
+                f"</PubmedArticle>\n"
+            )
+        f.write("</PubmedArticleSet>\n")
+
+
+def measure(parse, path: str) -> tuple[int, float, float]:
+    """(n_articles, seconds, peak MiB) for one parser on one file."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    n = len(parse(path))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return n, elapsed, peak / 2 ** 20
+
+
+def main(paths: list[str]):
+    print(f"{'file':<32} {'parser':<8} {'articles':>8} {'art/s':>10} {'peak MiB':>9}")
+    for path in paths:
+        size = Path(path).stat().st_size / 2 ** 20
+        results = {}
+        for name, parse in (("dom", dom_parse), ("stream", stream_parse)):
+            n, elapsed, peak = measure(parse, path)
+            results[name] = (n, elapsed, peak)
+            print(f"{Path(path).name[:24] + f' ({size:.0f}M)':<32} {name:<8} {n:>8} "
+                  f"{n / elapsed:>10.0f} {peak:>9.1f}")
+        assert results["dom"][0] == results["stream"][0], "parsers disagree on article count"
+        print(f"{'':<32} speedup {results['dom'][1] / results['stream'][1]:.2f}x, "
+              f"memory {results['dom'][2] / results['stream'][2]:.1f}x lower")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark PubMed XML parsers")
+    parser.add_argument("paths", nargs="*", help="Saved efetch XML responses")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Also benchmark a generated response with this many articles")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = list(args.paths)
+        if args.synthetic or not paths:
+            synthetic = Path(tmp) / f"synthetic_{args.synthetic or 10000}.xml"
+            synthetic_response(synthetic, args.synthetic or 10000)
+            paths.append(str(synthetic))
+        main(paths)
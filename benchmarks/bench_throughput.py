@@ -0,0 +1,160 @@
+"""
+End-to-end throughput benchmark of the screening and extraction pipelines.
+
+Drives run_screening and run_extraction, with the real HTTP model runners,
+against the local mock LLM server (tests/mock_llm_server.py) for each
+provider wire format, and reports per provider and stage:
+
+  calls/s     completed calls per wall-clock second (all concurrent runs)
+  call p99    end-to-end call latency: prompt build, HTTP, retries and
+              backoff, parsing, validation and hashing
+  http p99    latency of the successful HTTP request (run-card timing stats)
+  retries     extra attempts caused by injected 429/5xx/malformed outputs
+  peak MiB    peak traced memory (tracemalloc) while the runs execute
+
+The "faulty" scenario injects 429s, 5xx errors and malformed JSON; the
+runners' backoff sleeps are scaled by --backoff-scale so a benchmark does not
+spend most of its time waiting out 5 s rate-limit backoffs.
+
+Usage:
+    python -m benchmarks.bench_throughput
+    python -m benchmarks.bench_throughput --calls 200 --latency 50 --concurrency 4
+    python -m benchmarks.bench_throughput --providers ollama --scenarios faulty
+"""
+
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.extraction import runner as extraction_runner
+from src.provenance.hasher import merge_timing, timing_stats
+from src.provenance.sketch import QuantileSketch
+from src.screening import runner as screening_runner
+from tests.mock_llm_server import MockLLMServer, patch_runners
+
+CORPUS_PATH = "data/corpus/corpus_500.json"
+PROMPTS = {"screening": "configs/prompts/screening.txt", "extraction": "configs/prompts/extraction.txt"}
+SCHEMAS = {"screening": "configs/schemas/screening_output.json",
+           "extraction": "configs/schemas/extraction_output.json"}
+STAGES = {"screening": screening_runner.run_screening, "extraction": extraction_runner.run_extraction}
+PROVIDERS = {
+    "anthropic": {"id": "mock-claude", "provider": "anthropic", "model": "claude-mock"},
+    "google": {"id": "mock-gemini", "provider": "google", "model": "gemini-mock"},
+    "ollama": {"id": "mock-llama", "provider": "ollama", "model": "llama-mock"},
+}
+SCENARIOS = {
+    "clean": {},
+    "faulty": {"rate_429": 0.02, "rate_5xx": 0.02, "malformed_rate": 0.03},
+}
+
+
+@contextmanager
+def scaled_backoff(scale: float):
+    """Scale the pipeline runners' retry and throttle sleeps (the runners use only time.sleep)."""
+    modules = (screening_runner, extraction_runner)
+    shim = SimpleNamespace(sleep=lambda s: time.sleep(s * scale))
+    for module in modules:
+        module.time = shim
+    try:
+        yield
+    finally:
+        for module in modules:
+            module.time = time
+
+
+def load_articles(stage: str, n_calls: int) -> list[dict]:
+    """First n_calls articles for the stage, cycling the corpus if it is shorter."""
+    with open(CORPUS_PATH) as f:
+        corpus = json.load(f)["corpus"]
+    if stage == "extraction":
+        corpus = [a for a in corpus if a["gold_category"] == "include"]
+    articles = []
+    while len(articles) < n_calls:
+        for a in corpus[:n_calls - len(articles)]:
+            articles.append({**a, "corpus_id": f"{a['corpus_id']}-{len(articles)}"})
+    return articles
+
+
+def measure(stage: str, model_config: dict, articles: list[dict], concurrency: int) -> dict:
+    """Run `concurrency` runs of one stage in parallel; timings and peak memory."""
+    with open(PROMPTS[stage]) as f:
+        prompt = f.read()
+    with open(SCHEMAS[stage]) as f:
+        schema = json.load(f)
+    call_latency = QuantileSketch()
+
+    def one_run(run_id: int) -> dict:
+        last = [time.perf_counter()]
+
+        def on_call(current, total):
+            now = time.perf_counter()
+            call_latency.add((now - last[0]) * 1000)
+            last[0] = now
+
+        _, records, stats = STAGES[stage](articles, model_config, run_id, prompt, schema, progress_callback=on_call)
+        return {**stats, "timing": timing_stats(records)}
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        all_stats = list(pool.map(one_run, range(1, concurrency + 1)))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timing = merge_timing([s["timing"] for s in all_stats])
+    calls = len(articles) * concurrency
+    return {
+        "calls": calls,
+        "valid": sum(s["valid"] for s in all_stats),
+        "calls_per_sec": calls / elapsed,
+        "call_p99": call_latency.quantile(0.99),
+        "http_p99": timing["latency_ms"]["p99"],
+        "retries": timing["retries"],
+        "peak_mib": peak / 2 ** 20,
+    }
+
+
+def main(args):
+    latency = ("lognormal", args.latency, args.sigma) if args.latency else 0.0
+    print(f"{args.calls} calls x {args.concurrency} runs, server latency "
+          f"{'median %.0f ms (σ=%.2f)' % (args.latency, args.sigma) if args.latency else '0 ms'}, "
+          f"backoff x{args.backoff_scale}")
+    print(f"{'scenario':<8} {'provider':<10} {'stage':<11} {'calls':>6} {'valid':>6} {'calls/s':>8} "
+          f"{'call p99':>9} {'http p99':>9} {'retries':>7} {'peak MiB':>9}")
+    for scenario in args.scenarios:
+        for provider in args.providers:
+            for stage in args.stages:
+                server = MockLLMServer(latency, seed=args.seed, **SCENARIOS[scenario])
+                model_config = {**PROVIDERS[provider], "endpoint": server.url}
+                articles = load_articles(stage, args.calls)
+                with server, patch_runners(server.url), scaled_backoff(args.backoff_scale):
+                    r = measure(stage, model_config, articles, args.concurrency)
+                print(f"{scenario:<8} {provider:<10} {stage:<11} {r['calls']:>6} {r['valid']:>6} "
+                      f"{r['calls_per_sec']:>8.1f} {r['call_p99']:>9.1f} {r['http_p99']:>9.1f} "
+                      f"{r['retries']:>7} {r['peak_mib']:>9.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the pipelines against the mock LLM server")
+    parser.add_argument("--calls", type=int, default=100, help="Calls per run")
+    parser.add_argument("--concurrency", type=int, default=1, help="Runs executed in parallel")
+    parser.add_argument("--latency", type=float, default=20.0, help="Median server latency in ms (0 = none)")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Log-normal latency shape")
+    parser.add_argument("--backoff-scale", type=float, default=0.01, help="Multiplier on runner sleeps")
+    parser.add_argument("--providers", nargs="+", choices=list(PROVIDERS), default=list(PROVIDERS))
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -20,6 +20,9 @@ Usage:
 
     # Dry run (1 abstract, 1 run)
     python run_experiment.py --dry-run
+
+    # Record tracing spans (.json → Chrome trace, .jsonl → one span per line)
+    python run_experiment.py --model llama3-8b --runs 1 --trace trace.json
 """
 
 import argparse
@@ -29,13 +32,17 @@ import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Optional
 
 from src.utils.env_loader import load_env
 load_env()  # Load .env before importing runners
 
 from src.screening.runner import run_screening
 from src.extraction.runner import run_extraction
-from src.provenance.hasher import create_run_card, save_run_outputs
+from src.provenance.hasher import create_run_card, merge_timing, save_run_outputs
+from src.provenance.ledger import LEDGER_FILE, Ledger
+from src.analysis.metrics_store import update_metrics_store, summarize_store
+from src.utils import tracing
 
 
 # ── Model configurations ────────────────────────────────────
@@ -160,6 +167,76 @@ def _run_already_done(model_id: str, run_id: int, stage: str) -> bool:
         return False
 
 
+def _missing_articles(model_id: str, run_id: int, stage: str, articles: list[dict]) -> list[dict]:
+    """Articles a completed run has no result for (e.g. added by a corpus update)."""
+    results_path = Path(OUTPUT_DIR) / model_id / stage / f"run_{run_id:03d}" / "results.json"
+    with open(results_path) as f:
+        done = {r["corpus_id"] for r in json.load(f)}
+    return [a for a in articles if a["corpus_id"] not in done]
+
+
+def _merge_with_existing(
+    model_id: str,
+    run_id: int,
+    stage: str,
+    articles: list[dict],
+    results: list[dict],
+    records: list[dict],
+    stats: dict,
+) -> tuple[list[dict], list[dict], dict]:
+    """Combine a top-up of new abstracts with the run's stored outputs, in corpus order."""
+    run_dir = Path(OUTPUT_DIR) / model_id / stage / f"run_{run_id:03d}"
+    with open(run_dir / "results.json") as f:
+        old_results = json.load(f)
+    with open(run_dir / "call_records.json") as f:
+        old_records = json.load(f)
+    with open(run_dir / "run_card.json") as f:
+        execution = json.load(f)["execution"]
+
+    order = {a["corpus_id"]: i for i, a in enumerate(articles)}
+    key = lambda r: order.get(r["corpus_id"], len(order))
+    merged_results = sorted(old_results + results, key=key)
+    merged = {
+        **stats,
+        "total": execution["total_calls"] + stats["total"],
+        "successful": execution["successful_calls"] + stats["successful"],
+        "failed": execution["failed_calls"] + stats["failed"],
+        # Run cards don't store a valid count; recount over the merged results
+        "valid": sum(bool(r.get("valid")) for r in merged_results),
+        "start_time": execution["start_time"],
+        "end_time": stats["end_time"],
+        "topped_up": stats["total"],
+    }
+    return merged_results, sorted(old_records + records, key=key), merged
+
+
+def _update_live_metrics(
+    model_id: str,
+    run_id: int,
+    stage: str,
+    results: list[dict],
+    articles: list[dict],
+):
+    """Fold a finished run into the incremental metrics store and print the summary."""
+    try:
+        store = update_metrics_store(
+            output_dir=OUTPUT_DIR,
+            model_id=model_id,
+            stage=stage,
+            run_id=run_id,
+            results=results,
+            corpus_ids=[a["corpus_id"] for a in articles],
+        )
+        summary = summarize_store(store)
+        run_metrics = summary["per_run"][run_id]
+        print(f"  Live metrics: {summary['n_runs']} runs | "
+              f"flip rate {summary['flip_rate']:.3f} | "
+              f"mean kappa {summary['pairwise_kappa']['mean']:.3f} | "
+              f"run F1 {run_metrics['f1']:.3f}")
+    except Exception as e:
+        print(f"  WARNING: metrics store not updated: {e}")  # Don't break the experiment
+
+
 def run_single_experiment(
     model_id: str,
     run_id: int,
@@ -170,87 +247,116 @@ def run_single_experiment(
     extraction_prompt: str,
     screening_schema: dict,
     extraction_schema: dict,
+    ledger: Optional[Ledger] = None,
 ) -> dict:
-    """Run a single experiment (one model, one run, one stage)."""
-    # Skip if already completed successfully
-    if _run_already_done(model_id, run_id, stage):
-        print(f"\n  SKIP: {model_id}/{stage}/run_{run_id:03d} (already done)")
-        return {"skipped": True, "run_id": run_id, "model_id": model_id, "stage": stage}
+    """Run a single experiment (one model, one run, one stage).
+
+    A completed run is skipped unless the corpus gained abstracts since it ran
+    (see corpus_builder --update); then only the new abstracts are run and
+    merged into the stored run.
+    """
+    if stage not in ("screening", "extraction"):
+        raise ValueError(f"Unknown stage: {stage}")
+    stage_articles = corpus if stage == "screening" else included
+
+    # Skip if already completed successfully, unless new abstracts were added
+    todo = stage_articles
+    top_up = _run_already_done(model_id, run_id, stage)
+    if top_up:
+        todo = _missing_articles(model_id, run_id, stage, stage_articles)
+        if not todo:
+            print(f"\n  SKIP: {model_id}/{stage}/run_{run_id:03d} (already done)")
+            return {"skipped": True, "run_id": run_id, "model_id": model_id, "stage": stage}
 
     config = MODEL_CONFIGS[model_id]
     model_info = get_model_info(config)
 
     print(f"\n{'─' * 60}")
     print(f"  Model: {model_id} | Run: {run_id} | Stage: {stage}")
+    if top_up:
+        print(f"  Top-up: {len(todo)} new abstracts")
     print(f"{'─' * 60}")
 
-    if stage == "screening":
-        articles = corpus
-        prompt = screening_prompt
-        schema = screening_schema
-
-        def cb(c, t):
-            progress_bar(c, t, model_id, stage)
+    def cb(c, t):
+        progress_bar(c, t, model_id, stage)
 
+    if stage == "screening":
         results, records, stats = run_screening(
-            corpus=articles,
+            corpus=todo,
             model_config=config,
             run_id=run_id,
-            prompt_template=prompt,
-            schema=schema,
+            prompt_template=screening_prompt,
+            schema=screening_schema,
             progress_callback=cb,
+            ledger=ledger,
         )
-    elif stage == "extraction":
-        articles = included
-        prompt = extraction_prompt
-        schema = extraction_schema
-
-        def cb(c, t):
-            progress_bar(c, t, model_id, stage)
-
+    else:
         results, records, stats = run_extraction(
-            articles=articles,
+            articles=todo,
             model_config=config,
             run_id=run_id,
-            prompt_template=prompt,
-            schema=schema,
+            prompt_template=extraction_prompt,
+            schema=extraction_schema,
             progress_callback=cb,
+            ledger=ledger,
         )
-    else:
-        raise ValueError(f"Unknown stage: {stage}")
+
+    if top_up:
+        results, records, stats = _merge_with_existing(
+            model_id, run_id, stage, stage_articles, results, records, stats)
+    articles = stage_articles
 
     print()  # newline after progress bar
 
     # Create run card
-    run_card = create_run_card(
-        run_id=run_id,
-        model_id=model_id,
-        provider=config["provider"],
-        stage=stage,
-        total_calls=stats["total"],
-        successful_calls=stats["successful"],
-        failed_calls=stats["failed"],
-        call_records=records,
-        model_info=model_info,
-        config=config,
-        start_time=stats["start_time"],
-        end_time=stats["end_time"],
-    )
+    with tracing.span("run_card.create"):
+        run_card = create_run_card(
+            run_id=run_id,
+            model_id=model_id,
+            provider=config["provider"],
+            stage=stage,
+            total_calls=stats["total"],
+            successful_calls=stats["successful"],
+            failed_calls=stats["failed"],
+            call_records=records,
+            model_info=model_info,
+            config=config,
+            start_time=stats["start_time"],
+            end_time=stats["end_time"],
+        )
 
     # Save outputs
-    output_path = save_run_outputs(
-        output_dir=OUTPUT_DIR,
-        run_id=run_id,
-        model_id=model_id,
-        stage=stage,
-        results=results,
-        call_records=records,
-        run_card=run_card,
-    )
+    with tracing.span("run.save"):
+        output_path = save_run_outputs(
+            output_dir=OUTPUT_DIR,
+            run_id=run_id,
+            model_id=model_id,
+            stage=stage,
+            results=results,
+            call_records=records,
+            run_card=run_card,
+        )
+    if ledger is not None:
+        with tracing.span("ledger.append"):
+            ledger.append("run_card", {"path": output_path, "run_card": run_card})
 
-    print(f"  Results: {stats['successful']}/{stats['total']} successful, "
-          f"{stats['valid']} valid")
+    if top_up:
+        print(f"  Results: {stats['successful']}/{stats['total']} successful, "
+              f"{stats['valid']} valid ({stats['topped_up']} new)")
+    else:
+        print(f"  Results: {stats['successful']}/{stats['total']} successful, "
+              f"{stats['valid']} valid")
+    timing = run_card["execution"]["timing"]
+    latency = timing["latency_ms"]
+    print(f"  Latency: p50 {latency['p50']} ms | p99 {latency['p99']} ms | max {latency['max']} ms | "
+          f"{timing['retries']} retries | {timing['throttle_wait_ms'] / 1000:.1f}s throttled | "
+          f"{timing.get('backoff_wait_ms', 0.0) / 1000:.1f}s backoff")
     print(f"  Saved to: {output_path}")
+    stats["timing"] = timing
+
+    if stage == "screening":
+        with tracing.span("metrics.update"):
+            _update_live_metrics(model_id, run_id, stage, results, articles)
 
     return stats
 
@@ -296,8 +402,11 @@ def run_full_experiment(
     print(f"{'═' * 60}")
 
     all_stats = []
+    timings = {}  # (model_id, stage) -> run timing stats, merged into the summary
     experiment_num = 0
     t0 = time.time()
+    # Every call and run card is also chained into the experiment ledger
+    ledger = Ledger(str(Path(OUTPUT_DIR) / LEDGER_FILE))
 
     for model_id in models:
         for stage in stages:
@@ -306,17 +415,21 @@ def run_full_experiment(
                 print(f"\n[{experiment_num}/{total_experiments}]", end="")
 
                 try:
-                    stats = run_single_experiment(
-                        model_id=model_id,
-                        run_id=run_id,
-                        stage=stage,
-                        corpus=corpus,
-                        included=included,
-                        screening_prompt=screening_prompt,
-                        extraction_prompt=extraction_prompt,
-                        screening_schema=screening_schema,
-                        extraction_schema=extraction_schema,
-                    )
+                    with tracing.span("run", model=model_id, run=run_id, stage=stage):
+                        stats = run_single_experiment(
+                            model_id=model_id,
+                            run_id=run_id,
+                            stage=stage,
+                            corpus=corpus,
+                            included=included,
+                            screening_prompt=screening_prompt,
+                            extraction_prompt=extraction_prompt,
+                            screening_schema=screening_schema,
+                            extraction_schema=extraction_schema,
+                            ledger=ledger,
+                        )
+                    if "timing" in stats:
+                        timings.setdefault((model_id, stage), []).append(stats.pop("timing"))
                     all_stats.append(stats)
                     # Auto-commit after each completed run
                     _auto_commit(model_id, run_id, stage, stats)
@@ -329,6 +442,7 @@ def run_full_experiment(
                         "error": str(e),
                     })
 
+    ledger.close()
     elapsed = time.time() - t0
 
     # Save experiment summary
@@ -340,6 +454,7 @@ def run_full_experiment(
         "runs": list(runs),
         "stages": stages,
         "stats": all_stats,
+        "timing": {f"{m}/{s}": merge_timing(t) for (m, s), t in timings.items()},
     }
 
     summary_path = Path(OUTPUT_DIR) / "experiment_summary.json"
@@ -380,6 +495,11 @@ def main():
         action="store_true",
         help="Dry run: 1 abstract, 1 run, 1 model",
     )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Write tracing spans to PATH (.json: Chrome trace, otherwise JSONL)",
+    )
     args = parser.parse_args()
 
     # Parse models
@@ -409,7 +529,12 @@ def main():
         print("=== DRY RUN MODE ===")
         print("Using 5 abstracts, 1 run, 1 model for validation")
 
-    run_full_experiment(models, runs, stages, dry_run=args.dry_run)
+    if args.trace:
+        tracing.enable(args.trace)
+    try:
+        run_full_experiment(models, runs, stages, dry_run=args.dry_run)
+    finally:
+        tracing.disable()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+"""
+Array encodings shared by the analysis modules.
+
+Screening decisions and gold labels are mapped to small integer codes so
+that cross-run metrics can be computed with numpy instead of dict walks.
+
+Decision codes:   include=0, exclude=1, uncertain=2, missing=3
+Gold codes:       include=0, exclude=1, unlabeled=-1
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+
+GOLD_SCREENING_PATH = "data/gold_standard/screening_labels.json"
+
+DECISIONS = ("include", "exclude", "uncertain")
+DECISION_CODES = {d: i for i, d in enumerate(DECISIONS)}
+MISSING = len(DECISIONS)
+N_CODES = len(DECISIONS) + 1  # decisions + missing
+
+GOLD_CLASSES = ("include", "exclude")
+GOLD_CODES = {g: i for i, g in enumerate(GOLD_CLASSES)}
+UNLABELED = -1
+
+
+def encode_decisions(results: list[dict], corpus_ids: list[str]) -> np.ndarray:
+    """Encode one run's screening results as an int8 vector aligned to corpus_ids."""
+    index = {cid: i for i, cid in enumerate(corpus_ids)}
+    codes = np.full(len(corpus_ids), MISSING, dtype=np.int8)
+    for r in results:
+        i = index.get(r["corpus_id"])
+        if i is None:
+            continue
+        decision = r.get("output", {}).get("decision")
+        codes[i] = DECISION_CODES.get(decision, MISSING)
+    return codes
+
+
+def load_gold_screening(
+    corpus_ids: list[str],
+    path: str = GOLD_SCREENING_PATH,
+) -> np.ndarray:
+    """Load screening gold labels as an int8 vector aligned to corpus_ids.
+
+    Abstracts with a null ``final_label`` (pending human review) are UNLABELED.
+    """
+    with open(path) as f:
+        labels = json.load(f)["labels"]
+    by_id = {l["corpus_id"]: l.get("final_label") for l in labels}
+    return np.array(
+        [GOLD_CODES.get(by_id.get(cid), UNLABELED) for cid in corpus_ids],
+        dtype=np.int8,
+    )
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file's bytes (empty string if the file does not exist)."""
+    p = Path(path)
+    if not p.exists():
+        return ""
+    return hashlib.sha256(p.read_bytes()).hexdigest()
+
+
+# ── Cached run loaders ───────────────────────────────────────
+
+_MATRIX_CACHE: dict = {}
+
+
+def stage_fingerprint(stage_dir: Path) -> tuple:
+    """(run_dir, mtime_ns) pairs, so cached arrays are dropped when a run is rewritten."""
+    return tuple(
+        (p.parent.name, p.stat().st_mtime_ns)
+        for p in sorted(stage_dir.glob("run_*/results.json"))
+    )
+
+
+def load_run_results(output_dir: str, model_id: str, stage: str) -> dict[int, list[dict]]:
+    """Load results.json for every run of one model × stage, keyed by run_id."""
+    runs = {}
+    for path in sorted((Path(output_dir) / model_id / stage).glob("run_*/results.json")):
+        with open(path) as f:
+            runs[int(path.parent.name.split("_")[1])] = json.load(f)
+    return runs
+
+
+def load_decision_matrix(
+    output_dir: str,
+    model_id: str,
+    corpus_ids: list[str],
+) -> tuple[list[int], np.ndarray]:
+    """Screening decisions of every run as a (runs × abstracts) int8 matrix.
+
+    The matrix is built once and cached until a run's results.json changes.
+    """
+    stage_dir = Path(output_dir) / model_id / "screening"
+    key = ("decisions", str(stage_dir), tuple(corpus_ids))
+    fingerprint = stage_fingerprint(stage_dir)
+    cached = _MATRIX_CACHE.get(key)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+
+    runs = load_run_results(output_dir, model_id, "screening")
+    run_ids = sorted(runs)
+    matrix = np.full((len(run_ids), len(corpus_ids)), MISSING, dtype=np.int8)
+    for row, run_id in enumerate(run_ids):
+        matrix[row] = encode_decisions(runs[run_id], corpus_ids)
+    _MATRIX_CACHE[key] = (fingerprint, (run_ids, matrix))
+    return run_ids, matrix
+
+
+def load_decision_tensor(
+    output_dir: str,
+    model_ids: list[str],
+    corpus_ids: list[str],
+) -> tuple[list[int], np.ndarray, np.ndarray]:
+    """Decisions for several models as a (models × runs × abstracts) tensor.
+
+    Run ids are the union across models; runs a model lacks are all MISSING
+    and flagged False in the returned (models × runs) ``present`` mask.
+    """
+    per_model = [load_decision_matrix(output_dir, m, corpus_ids) for m in model_ids]
+    run_ids = sorted({r for ids, _ in per_model for r in ids})
+    col = {r: i for i, r in enumerate(run_ids)}
+    tensor = np.full((len(model_ids), len(run_ids), len(corpus_ids)), MISSING, dtype=np.int8)
+    present = np.zeros((len(model_ids), len(run_ids)), dtype=bool)
+    for m, (ids, matrix) in enumerate(per_model):
+        cols = [col[r] for r in ids]
+        tensor[m, cols] = matrix
+        present[m, cols] = True
+    return run_ids, tensor, present
+
+
+def clear_cache():
+    """Drop all cached arrays."""
+    _MATRIX_CACHE.clear()
@@ -0,0 +1,347 @@
+"""
+Input-tracked build of analysis tables and figures.
+
+Every artifact under analysis/ is a target that declares its inputs:
+  - run cards of the model × stage runs it reads, by aggregate_output_hash
+  - gold-standard files and the corpus, by SHA-256
+  - the source files of the code that produces it
+
+A target is rebuilt only when the hash of its declared inputs differs from
+the one recorded in analysis/.build_state.json, or when an output is missing.
+Targets are per model (or per model pair), so adding one run rebuilds only
+that model's artifacts. Every target reads only raw outputs, the corpus and
+gold files, never another target's outputs, so stale targets are independent
+and run in parallel processes.
+
+Usage:
+    python -m src.analysis.build                # rebuild what changed
+    python -m src.analysis.build --dry-run      # list stale targets
+    python -m src.analysis.build --force meta_  # force targets matching a prefix
+    python -m src.analysis.build --no-verify    # skip the provenance check of raw outputs
+"""
+
+import hashlib
+import importlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from src.analysis.arrays import GOLD_SCREENING_PATH, file_sha256
+
+OUTPUT_DIR = "data/raw_outputs"
+CORPUS_PATH = "data/corpus/corpus_500.json"
+GOLD_EXTRACTION_PATH = "data/gold_standard/extraction_labels.json"
+ANALYSIS_DIR = "analysis"
+STATE_FILE = ".build_state.json"
+SCREENING_POLICY = "include"  # the screening_eval CLI default
+
+
+# ── Input fingerprints ───────────────────────────────────────
+
+def run_card_hashes(output_dir: str, model_id: str, stage: str) -> list[list]:
+    """[run_id, aggregate_output_hash] for every run of a model × stage.
+
+    Runs without a run card fall back to the SHA-256 of their results.json.
+    """
+    stage_dir = Path(output_dir) / model_id / stage
+    hashes = []
+    for run_dir in sorted(stage_dir.glob("run_*")):
+        card_path = run_dir / "run_card.json"
+        if card_path.exists():
+            with open(card_path) as f:
+                digest = json.load(f).get("provenance", {}).get("aggregate_output_hash")
+        else:
+            digest = None
+        if digest is None and (run_dir / "results.json").exists():
+            digest = file_sha256(str(run_dir / "results.json"))
+        hashes.append([run_dir.name, digest])
+    return hashes
+
+
+def file_input(path: str) -> Optional[str]:
+    """SHA-256 of a file, or None when it does not exist."""
+    return file_sha256(path) if Path(path).exists() else None
+
+
+def source_input(modules: list[str]) -> dict[str, str]:
+    """SHA-256 of the source file of each module."""
+    return {m: file_sha256(importlib.import_module(m).__file__) for m in modules}
+
+
+def inputs_key(inputs: dict) -> str:
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# ── Builders (top-level so they can run in worker processes) ─
+
+def build_screening_eval(target: dict):
+    from src.analysis.screening_eval import evaluate_screening
+    a = target["args"]
+    evaluate_screening([a["model_id"]], policy=a["policy"], output_dir=a["output_dir"],
+                       corpus_path=a["corpus_path"], gold_path=a["gold_path"]
+                       ).to_csv(target["outputs"][0], index=False)
+
+
+def build_extraction_eval(target: dict):
+    from src.analysis.extraction_eval import evaluate_extraction
+    a = target["args"]
+    evaluate_extraction([a["model_id"]], output_dir=a["output_dir"], gold_path=a["gold_path"]
+                        ).to_csv(target["outputs"][0], index=False)
+
+
+def build_stability(target: dict):
+    from src.analysis.stability import estimate_stability
+    a = target["args"]
+    estimate_stability([a["model_id"]], output_dir=a["output_dir"]).to_csv(target["outputs"][0], index=False)
+
+
+def build_sensitivity(target: dict):
+    from src.meta_analysis.sensitivity import run_sensitivity_grid
+    a = target["args"]
+    run_sensitivity_grid([a["model_id"]], output_dir=a["output_dir"]).to_csv(target["outputs"][0], index=False)
+
+
+def build_cumulative(target: dict):
+    from src.meta_analysis.cumulative import cumulative_meta_analysis, subgroup_meta_analysis
+    a = target["args"]
+    cumulative_meta_analysis([a["model_id"]], a["output_dir"], a["corpus_path"]
+                             ).to_csv(target["outputs"][0], index=False)
+    subgroup_meta_analysis([a["model_id"]], a["output_dir"], a["corpus_path"]
+                           ).to_csv(target["outputs"][1], index=False)
+
+
+def build_permutation(target: dict):
+    from src.analysis.permutation import compare_models
+    a = target["args"]
+    summary, null = compare_models(a["model_a"], a["model_b"], tuple(a["statistics"]),
+                                   output_dir=a["output_dir"], corpus_path=a["corpus_path"])
+    summary.to_csv(target["outputs"][0], index=False)
+    np.savez_compressed(target["outputs"][1], **null)
+
+
+def build_figures(target: dict):
+    from src.analysis.figures import render_figures
+    a = target["args"]
+    # render_figures skips figures whose data hash is unchanged
+    render_figures(a["model_ids"], a["output_dir"], a["corpus_path"], a["figures_dir"], jobs=a.get("jobs", 1))
+
+
+# ── Target graph ─────────────────────────────────────────────
+
+def discover_models(output_dir: str, stage: str) -> list[str]:
+    root = Path(output_dir)
+    if not root.is_dir():
+        return []
+    return sorted(p.name for p in root.iterdir() if any((p / stage).glob("run_*")))
+
+
+def _target(name, builder, outputs, inputs, code, args, parallel=False) -> dict:
+    """parallel marks a builder with its own process pool; build() runs it
+    in the parent after the other targets, with jobs added to its args."""
+    return {"name": name, "builder": builder, "outputs": [str(o) for o in outputs],
+            "inputs": {**inputs, "code": source_input(code)}, "args": args, "parallel": parallel}
+
+
+def define_targets(
+    output_dir: str = OUTPUT_DIR,
+    corpus_path: str = CORPUS_PATH,
+    gold_screening_path: str = GOLD_SCREENING_PATH,
+    gold_extraction_path: str = GOLD_EXTRACTION_PATH,
+    analysis_dir: str = ANALYSIS_DIR,
+) -> list[dict]:
+    """All analysis targets for the models currently in output_dir."""
+    tables = Path(analysis_dir) / "tables"
+    screening_models = discover_models(output_dir, "screening")
+    extraction_models = discover_models(output_dir, "extraction")
+    cards = {(m, s): run_card_hashes(output_dir, m, s)
+             for s, models in (("screening", screening_models), ("extraction", extraction_models))
+             for m in models}
+    corpus = file_input(corpus_path)
+    gold_screening = file_input(gold_screening_path)
+    gold_extraction = file_input(gold_extraction_path)
+    common = {"output_dir": output_dir, "corpus_path": corpus_path}
+
+    # Per-model tables are named <CLI table stem>_<model>.csv
+    targets = []
+    for m in screening_models:
+        targets.append(_target(
+            f"screening_vs_gold:{m}", build_screening_eval,
+            [tables / f"screening_vs_gold_{SCREENING_POLICY}_{m}.csv"],
+            {"run_cards": cards[(m, "screening")], "corpus": corpus, "gold": gold_screening},
+            ["src.analysis.screening_eval", "src.analysis.arrays"],
+            {**common, "model_id": m, "policy": SCREENING_POLICY, "gold_path": gold_screening_path},
+        ))
+
+    extraction_code = ["src.analysis.estimates", "src.analysis.extraction_eval", "src.extraction.normalize"]
+    meta_code = extraction_code + ["src.meta_analysis.dataset", "src.meta_analysis.pooling"]
+    for m in extraction_models:
+        ext = {"run_cards": cards[(m, "extraction")]}
+        args = {**common, "model_id": m}
+        targets.append(_target(
+            f"extraction_vs_gold:{m}", build_extraction_eval, [tables / f"extraction_vs_gold_{m}.csv"],
+            {**ext, "gold": gold_extraction}, extraction_code,
+            {**args, "gold_path": gold_extraction_path},
+        ))
+        targets.append(_target(
+            f"extraction_stability:{m}", build_stability, [tables / f"extraction_stability_{m}.csv"],
+            ext, extraction_code + ["src.analysis.stability"], args,
+        ))
+        targets.append(_target(
+            f"meta_sensitivity:{m}", build_sensitivity, [tables / f"meta_sensitivity_{m}.csv"],
+            ext, meta_code + ["src.meta_analysis.sensitivity"], args,
+        ))
+        targets.append(_target(
+            f"meta_cumulative:{m}", build_cumulative,
+            [tables / f"meta_cumulative_{m}.csv", tables / f"meta_subgroups_{m}.csv"],
+            {**ext, "corpus": corpus}, meta_code + ["src.meta_analysis.cumulative"], args,
+        ))
+
+    for a, b in itertools.combinations(sorted(set(screening_models) | set(extraction_models)), 2):
+        statistics = []
+        if a in screening_models and b in screening_models:
+            statistics += ["flip_rate", "kappa"]
+        if a in extraction_models and b in extraction_models:
+            statistics.append("pooled_sd")
+        if not statistics:
+            continue
+        stem = tables / f"permutation_{a}_vs_{b}"
+        targets.append(_target(
+            f"permutation:{a}:{b}", build_permutation, [f"{stem}.csv", f"{stem}_null.npz"],
+            {"run_cards": {f"{m}/{s}": cards.get((m, s)) for m in (a, b) for s in ("screening", "extraction")},
+             "corpus": corpus, "statistics": statistics},
+            meta_code + ["src.analysis.permutation", "src.analysis.arrays"],
+            {**common, "model_a": a, "model_b": b, "statistics": statistics},
+        ))
+
+    figure_models = sorted(set(screening_models) | set(extraction_models))
+    if figure_models:
+        figures = Path(analysis_dir) / "figures"
+        targets.append(_target(
+            "figures", build_figures, [figures / ".figure_hashes.json"],
+            {"run_cards": {f"{m}/{s}": c for (m, s), c in cards.items()}, "corpus": corpus},
+            meta_code + ["src.analysis.figures", "src.analysis.permutation"],
+            {**common, "model_ids": figure_models, "figures_dir": str(figures)}, parallel=True,
+        ))
+    return targets
+
+
+# ── Build state ──────────────────────────────────────────────
+
+def load_state(analysis_dir: str = ANALYSIS_DIR) -> dict:
+    path = Path(analysis_dir) / STATE_FILE
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return {"targets": {}}
+
+
+def save_state(state: dict, analysis_dir: str = ANALYSIS_DIR):
+    path = Path(analysis_dir) / STATE_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _run_target(target: dict) -> tuple[str, float]:
+    """Build one target (worker entry point); returns (name, seconds)."""
+    for out in target["outputs"]:
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+    start = time.monotonic()
+    target["builder"](target)
+    return target["name"], time.monotonic() - start
+
+
+def build(
+    targets: list[dict],
+    analysis_dir: str = ANALYSIS_DIR,
+    jobs: int = 1,
+    force: Optional[list[str]] = None,
+    dry_run: bool = False,
+) -> dict[str, list[str]]:
+    """Rebuild stale targets; returns {"built": [...], "skipped": [...]}.
+
+    Args:
+        targets: from define_targets
+        analysis_dir: where the build state file lives
+        jobs: worker processes for the stale targets
+        force: target-name prefixes to rebuild regardless of inputs
+        dry_run: only report which targets are stale
+    """
+    state = load_state(analysis_dir)
+    recorded = state["targets"]
+    report = {"built": [], "skipped": []}
+
+    stale = []
+    for t in targets:
+        key = inputs_key(t["inputs"])
+        forced = any(t["name"].startswith(p) for p in force or [])
+        missing = any(not Path(o).exists() for o in t["outputs"])
+        if forced or missing or recorded.get(t["name"], {}).get("key") != key:
+            stale.append((t, key))
+        else:
+            report["skipped"].append(t["name"])
+
+    if dry_run:
+        report["built"].extend(t["name"] for t, _ in stale)
+        return report
+
+    by_name = {t["name"]: (t, key) for t, key in stale}
+    pooled = [t for t, _ in stale if not t.get("parallel")]
+    # Self-parallel targets run after the pool has drained, so the two pools never overlap
+    own_pool = [dict(t, args={**t["args"], "jobs": jobs}) for t, _ in stale if t.get("parallel")]
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 and len(pooled) > 1 else None
+    try:
+        results = itertools.chain(
+            executor.map(_run_target, pooled) if executor else map(_run_target, pooled),
+            map(_run_target, own_pool),
+        )
+        for name, seconds in results:
+            print(f"  [built] {name} ({seconds:.1f}s)")
+            target, key = by_name[name]
+            recorded[name] = {"key": key, "outputs": target["outputs"],
+                              "built_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            save_state(state, analysis_dir)
+            report["built"].append(name)
+    finally:
+        if executor:
+            executor.shutdown()
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Incremental build of analysis tables and figures")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--analysis-dir", default=ANALYSIS_DIR)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--dry-run", action="store_true", help="List stale targets without building")
+    parser.add_argument("--force", nargs="*", default=None, metavar="PREFIX",
+                        help="Rebuild targets whose name starts with PREFIX (all if none given)")
+    parser.add_argument("--no-verify", action="store_true",
+                        help="Skip verifying raw outputs against their provenance hashes")
+    args = parser.parse_args()
+
+    if not args.no_verify:
+        from src.provenance.verify import print_report, verify_outputs
+        verification = verify_outputs(args.output_dir, jobs=args.jobs)
+        print_report(verification)
+        if verification["failed"]:
+            raise SystemExit("Provenance check failed; fix the runs above or pass --no-verify")
+
+    force = None if args.force is None else (args.force or [""])
+    targets = define_targets(args.output_dir, analysis_dir=args.analysis_dir)
+    report = build(targets, args.analysis_dir, jobs=args.jobs, force=force, dry_run=args.dry_run)
+    label = "stale" if args.dry_run else "built"
+    print(f"\n{len(report['built'])} {label}, {len(report['skipped'])} up to date")
+    if args.dry_run:
+        for name in report["built"]:
+            print(f"  {name}")
@@ -0,0 +1,127 @@
+"""
+Flat estimates table — every extracted estimate as one row.
+
+Rows are keyed by (model_id, corpus_id, run_id, slot). Within each
+model × abstract, the estimate sets of all runs are aligned to a reference
+run (the earliest run with the modal set size) using the optimal assignment
+from src.analysis.extraction_eval, so ``slot`` identifies the same reported
+estimate across runs. Estimates with no counterpart in the reference set get
+slot -1.
+
+Each row also carries the exposure-increment normalization from
+src.extraction.normalize (increment in µg/m³, status flag, and log-effects
+rescaled to per 10 µg/m³), computed once when the table is built.
+
+A companion table records the estimate set size of every model × abstract ×
+run, including runs that extracted nothing.
+
+Usage:
+    from src.analysis.estimates import load_estimates_table
+    estimates, set_sizes = load_estimates_table(["claude-sonnet-4-5"])
+"""
+
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+
+from src.analysis.arrays import load_run_results, stage_fingerprint
+from src.analysis.extraction_eval import NUMERIC_FIELDS, cached_estimates, cached_match
+from src.extraction.normalize import normalize_estimates
+
+OUTPUT_DIR = "data/raw_outputs"
+
+TEXT_FIELDS = ("effect_measure", "lag", "outcome_specific", "exposure_increment")
+STUDY_FIELDS = ("study_location", "population")  # study-level, repeated per estimate
+
+_TABLE_CACHE: dict = {}
+
+
+def _output_key(result: dict) -> str:
+    return result.get("output_hash") or repr(result.get("output"))
+
+
+def _align_abstract(runs: list[tuple[int, dict, str]]) -> tuple[dict[int, list[int]], int]:
+    """Slot assignment for one model × abstract.
+
+    Args:
+        runs: (run_id, parsed estimates, cache key) for every run, sorted by run_id
+
+    Returns:
+        ({run_id: slot per estimate}, reference set size)
+    """
+    sizes = Counter(len(p["raw"]) for _, p, _ in runs)
+    # Most common size; ties go to the larger set
+    modal = max(sizes, key=lambda k: (sizes[k], k))
+    _, ref, ref_key = next(r for r in runs if len(r[1]["raw"]) == modal)
+
+    slots = {}
+    for run_id, parsed, key in runs:
+        run_slots = [-1] * len(parsed["raw"])
+        for i, j in cached_match((ref_key, key), ref, parsed):
+            run_slots[j] = i
+        slots[run_id] = run_slots
+    return slots, modal
+
+
+def build_estimates_table(
+    model_ids: list[str],
+    output_dir: str = OUTPUT_DIR,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Build (estimates, set_sizes) tables for all models and runs."""
+    rows = []
+    size_rows = []
+    for model_id in model_ids:
+        runs = load_run_results(output_dir, model_id, "extraction")
+        by_abstract: dict[str, list] = {}
+        for run_id in sorted(runs):
+            for r in runs[run_id]:
+                key = _output_key(r)
+                output = r.get("output", {})
+                parsed = cached_estimates(key, output.get("estimates"))
+                study = tuple(output.get(f) for f in STUDY_FIELDS)
+                by_abstract.setdefault(r["corpus_id"], []).append((run_id, parsed, key, study))
+
+        for corpus_id, abstract_runs in by_abstract.items():
+            slots, modal = _align_abstract([r[:3] for r in abstract_runs])
+            for run_id, parsed, _, study in abstract_runs:
+                size_rows.append((model_id, corpus_id, run_id, len(parsed["raw"]), modal))
+                for j, est in enumerate(parsed["raw"]):
+                    rows.append((
+                        model_id, corpus_id, run_id, slots[run_id][j],
+                        *parsed["values"][j],
+                        *(est.get(f) for f in TEXT_FIELDS),
+                        *study,
+                    ))
+
+    estimates = normalize_estimates(pd.DataFrame(
+        rows,
+        columns=["model_id", "corpus_id", "run_id", "slot", *NUMERIC_FIELDS, *TEXT_FIELDS, *STUDY_FIELDS],
+    ))
+    set_sizes = pd.DataFrame(
+        size_rows,
+        columns=["model_id", "corpus_id", "run_id", "n_estimates", "modal_n_estimates"],
+    )
+    return estimates, set_sizes
+
+
+def load_estimates_table(
+    model_ids: list[str],
+    output_dir: str = OUTPUT_DIR,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """build_estimates_table, cached until any extraction run changes on disk."""
+    fingerprint = tuple(
+        (m, stage_fingerprint(Path(output_dir) / m / "extraction")) for m in model_ids
+    )
+    key = (str(output_dir), tuple(model_ids))
+    cached = _TABLE_CACHE.get(key)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+    tables = build_estimates_table(model_ids, output_dir)
+    _TABLE_CACHE[key] = (fingerprint, tables)
+    return tables
+
+
+def clear_cache():
+    """Drop cached estimates tables."""
+    _TABLE_CACHE.clear()
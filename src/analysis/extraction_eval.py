@@ -0,0 +1,312 @@
+"""
+Extraction Evaluation — optimal matching of extracted estimates to gold.
+
+Extraction outputs carry a variable-length ``estimates`` array, and so do the
+gold templates in data/gold_standard/extraction_labels.json. For each abstract
+a cost matrix (effect measure, lag, outcome, numeric closeness of estimate and
+CI) is built between the two sets and solved as an optimal assignment; matched
+pairs are then scored field by field, both exactly and within the tolerances
+of the labeling guide's discordance protocol.
+
+Parsed estimate sets are cached by (output_hash, default increment) and
+assignments by (gold, output_hash), so identical outputs repeated across runs
+are parsed and matched once. Both caches evict least-recently-used entries
+beyond a fixed size.
+
+Usage:
+    from src.analysis.extraction_eval import evaluate_extraction
+    per_run = evaluate_extraction(["claude-sonnet-4-5", "llama3-8b"])
+
+    python -m src.analysis.extraction_eval
+"""
+
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+
+from src.analysis.arrays import load_run_results
+
+OUTPUT_DIR = "data/raw_outputs"
+GOLD_EXTRACTION_PATH = "data/gold_standard/extraction_labels.json"
+TABLES_DIR = "analysis/tables"
+
+NUMERIC_FIELDS = ("effect_estimate", "ci_lower", "ci_upper")
+CATEGORICAL_FIELDS = ("effect_measure", "lag", "outcome_specific", "exposure_increment")
+
+# Tolerances from the labeling guide's discordance protocol
+TOLERANCES = {"effect_estimate": 0.005, "ci_lower": 0.01, "ci_upper": 0.01}
+
+# Assignment cost weights; pairs costing more than MAX_MATCH_COST stay unmatched
+COST_WEIGHTS = {"effect_measure": 1.0, "lag": 0.5, "outcome_specific": 0.5, "numeric": 2.0}
+NUMERIC_SCALE = 0.05  # |Δ log value| at which the numeric cost saturates
+MAX_MATCH_COST = 2.5
+
+# Entries kept by the parse and assignment caches (LRU); a parsed set is a few KB
+PARSE_CACHE_SIZE = 20_000
+MATCH_CACHE_SIZE = 200_000
+
+
+# ── Normalization ────────────────────────────────────────────
+
+_LAG_RANGE = re.compile(r"^(?:rr)?\s*(?:lag|l)\s*(?:day\s*)?(\d+)\s*(?:-|to)\s*(\d+)$")
+_LAG_SINGLE = re.compile(r"^(?:rr)?\s*(?:lag|l)\s*(?:day\s*)?(\d+)$")
+_LAG_PACKED = re.compile(r"^lag0(\d+)$")  # "lag07" → 0-7
+
+
+def normalize_lag(lag: Optional[str]) -> str:
+    """Canonical lag string: 'lag0-1', 'L0-1', 'lag 0 to 1' → '0-1'; 'lag2' → '2'."""
+    if lag is None:
+        return ""
+    text = str(lag).strip().lower()
+    m = _LAG_PACKED.match(text)
+    if m:
+        return f"0-{m.group(1)}"
+    m = _LAG_RANGE.match(text)
+    if m:
+        return f"{int(m.group(1))}-{int(m.group(2))}"
+    m = _LAG_SINGLE.match(text)
+    if m:
+        return str(int(m.group(1)))
+    return re.sub(r"\s+", " ", text)
+
+
+def normalize_label(value: Optional[str]) -> str:
+    """Lowercase, collapse punctuation/whitespace to underscores."""
+    if value is None:
+        return ""
+    return re.sub(r"[^0-9a-zµμ³]+", "_", str(value).lower()).strip("_")
+
+
+def _as_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def parse_estimates(estimates: Optional[list], default_increment: Optional[str] = None) -> dict:
+    """Parse an estimates list into aligned arrays for cost computation."""
+    estimates = [e for e in (estimates or []) if isinstance(e, dict)]
+    raw = []
+    for e in estimates:
+        e = dict(e)
+        if e.get("exposure_increment") is None:
+            e["exposure_increment"] = default_increment
+        raw.append(e)
+    values = np.array(
+        [[_as_float(e.get(f)) for f in NUMERIC_FIELDS] for e in raw], dtype=float
+    ).reshape(len(raw), len(NUMERIC_FIELDS))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_values = np.log(np.where(values > 0, values, np.nan))
+    return {
+        "raw": raw,
+        "effect_measure": np.array([str(e.get("effect_measure") or "").upper() for e in raw], dtype=object),
+        "lag": np.array([normalize_lag(e.get("lag")) for e in raw], dtype=object),
+        "outcome_specific": np.array([normalize_label(e.get("outcome_specific")) for e in raw], dtype=object),
+        "exposure_increment": np.array([normalize_label(e.get("exposure_increment")) for e in raw], dtype=object),
+        "values": values,
+        "log_values": log_values,
+    }
+
+
+_PARSE_CACHE: OrderedDict = OrderedDict()
+_MATCH_CACHE: OrderedDict = OrderedDict()
+
+
+def _lru_get(cache: OrderedDict, key):
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def _lru_put(cache: OrderedDict, key, value, maxsize: int):
+    cache[key] = value
+    if len(cache) > maxsize:
+        cache.popitem(last=False)
+
+
+def cached_estimates(key: str, estimates: Optional[list], default_increment: Optional[str] = None) -> dict:
+    """parse_estimates memoized by (key, default_increment); key is the output_hash for model outputs."""
+    cache_key = (key, default_increment)
+    parsed = _lru_get(_PARSE_CACHE, cache_key)
+    if parsed is None:
+        parsed = parse_estimates(estimates, default_increment)
+        _lru_put(_PARSE_CACHE, cache_key, parsed, PARSE_CACHE_SIZE)
+    return parsed
+
+
+def clear_caches():
+    """Drop parsed-estimate and assignment caches."""
+    _PARSE_CACHE.clear()
+    _MATCH_CACHE.clear()
+
+
+# ── Matching ─────────────────────────────────────────────────
+
+def cost_matrix(a: dict, b: dict) -> np.ndarray:
+    """Pairwise assignment cost between two parsed estimate sets (len(a) × len(b))."""
+    cost = np.zeros((len(a["raw"]), len(b["raw"])))
+    for field in ("effect_measure", "lag", "outcome_specific"):
+        cost += COST_WEIGHTS[field] * (a[field][:, None] != b[field][None, :])
+
+    diff = np.abs(a["log_values"][:, None, :] - b["log_values"][None, :, :])
+    with np.errstate(invalid="ignore"):
+        scaled = np.minimum(diff / NUMERIC_SCALE, 1.0)
+    # Missing values on either side count as maximally distant
+    scaled = np.where(np.isnan(scaled), 1.0, scaled)
+    cost += COST_WEIGHTS["numeric"] * scaled.mean(axis=2)
+    return cost
+
+
+def match_estimates(a: dict, b: dict, max_cost: float = MAX_MATCH_COST) -> list[tuple[int, int]]:
+    """Optimal one-to-one matching of a to b; pairs above max_cost are dropped."""
+    if not a["raw"] or not b["raw"]:
+        return []
+    cost = cost_matrix(a, b)
+    rows, cols = linear_sum_assignment(cost)
+    return [(int(i), int(j)) for i, j in zip(rows, cols) if cost[i, j] <= max_cost]
+
+
+def cached_match(key: tuple, a: dict, b: dict) -> list[tuple[int, int]]:
+    """match_estimates memoized by (gold set key, output key)."""
+    pairs = _lru_get(_MATCH_CACHE, key)
+    if pairs is None:
+        pairs = match_estimates(a, b)
+        _lru_put(_MATCH_CACHE, key, pairs, MATCH_CACHE_SIZE)
+    return pairs
+
+
+def score_pairs(gold: dict, extracted: dict, pairs: list[tuple[int, int]]) -> dict:
+    """Field-level exact and tolerance agreement counts over matched pairs."""
+    scores = {}
+    if pairs:
+        gi, ei = (np.array(idx) for idx in zip(*pairs))
+    else:
+        gi = ei = np.array([], dtype=int)
+
+    for k, field in enumerate(NUMERIC_FIELDS):
+        g = gold["values"][gi, k]
+        e = extracted["values"][ei, k]
+        err = np.abs(g - e)
+        scores[field] = {
+            "exact": int(np.sum(np.isclose(g, e, rtol=0, atol=1e-9))),
+            "tolerance": int(np.sum(err <= TOLERANCES[field] + 1e-12)),
+            "abs_error_sum": float(np.nansum(err)),
+            "n": int(np.sum(~np.isnan(err))),
+        }
+    for field in CATEGORICAL_FIELDS:
+        g_raw = [gold["raw"][i].get(field) for i in gi]
+        e_raw = [extracted["raw"][j].get(field) for j in ei]
+        scores[field] = {
+            "exact": int(sum(x == y for x, y in zip(g_raw, e_raw))),
+            "tolerance": int(np.sum(gold[field][gi] == extracted[field][ei])),
+            "n": len(pairs),
+        }
+    return scores
+
+
+# ── Batch evaluation ─────────────────────────────────────────
+
+def load_gold_extraction(path: str = GOLD_EXTRACTION_PATH) -> dict[str, dict]:
+    """Parsed gold estimate sets for templates the extractors have completed.
+
+    Templates whose estimates are still blank (no effect_estimate) are skipped.
+    """
+    with open(path) as f:
+        templates = json.load(f)["templates"]
+    gold = {}
+    for t in templates:
+        extraction = t.get("extraction", {})
+        estimates = [e for e in extraction.get("estimates", []) if e.get("effect_estimate") is not None]
+        if not estimates:
+            continue
+        parsed = parse_estimates(estimates, extraction.get("exposure_increment"))
+        parsed["key"] = hashlib.sha256(
+            json.dumps(parsed["raw"], sort_keys=True, default=str).encode()
+        ).hexdigest()
+        gold[t["corpus_id"]] = parsed
+    return gold
+
+
+def evaluate_run(results: list[dict], gold: dict[str, dict]) -> dict:
+    """Match and score one extraction run against the gold sets."""
+    n_gold = n_extracted = n_matched = 0
+    totals = {f: {"exact": 0, "tolerance": 0, "n": 0, "abs_error_sum": 0.0}
+              for f in NUMERIC_FIELDS + CATEGORICAL_FIELDS}
+
+    for r in results:
+        g = gold.get(r["corpus_id"])
+        if g is None:
+            continue
+        key = r.get("output_hash") or json.dumps(r.get("output"), sort_keys=True)
+        e = cached_estimates(key, r.get("output", {}).get("estimates"))
+        pairs = cached_match((g["key"], key), g, e)
+        n_gold += len(g["raw"])
+        n_extracted += len(e["raw"])
+        n_matched += len(pairs)
+        for field, s in score_pairs(g, e, pairs).items():
+            for stat, value in s.items():
+                totals[field][stat] += value
+
+    row = {
+        "n_abstracts": sum(1 for r in results if r["corpus_id"] in gold),
+        "n_gold_estimates": n_gold,
+        "n_extracted_estimates": n_extracted,
+        "n_matched": n_matched,
+        "recall": n_matched / n_gold if n_gold else float("nan"),
+        "precision": n_matched / n_extracted if n_extracted else float("nan"),
+    }
+    for field, t in totals.items():
+        row[f"{field}_exact_rate"] = t["exact"] / t["n"] if t["n"] else float("nan")
+        row[f"{field}_tolerance_rate"] = t["tolerance"] / t["n"] if t["n"] else float("nan")
+    for field in NUMERIC_FIELDS:
+        t = totals[field]
+        row[f"{field}_mae"] = t["abs_error_sum"] / t["n"] if t["n"] else float("nan")
+    return row
+
+
+def evaluate_extraction(
+    model_ids: list[str],
+    output_dir: str = OUTPUT_DIR,
+    gold_path: str = GOLD_EXTRACTION_PATH,
+) -> pd.DataFrame:
+    """Evaluate every model × run extraction against the gold standard."""
+    gold = load_gold_extraction(gold_path)
+    rows = []
+    for model_id in model_ids:
+        for run_id, results in sorted(load_run_results(output_dir, model_id, "extraction").items()):
+            rows.append({"model_id": model_id, "run_id": run_id, **evaluate_run(results, gold)})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extraction outputs vs gold standard")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--gold", default=GOLD_EXTRACTION_PATH)
+    parser.add_argument("--tables-dir", default=TABLES_DIR)
+    args = parser.parse_args()
+
+    if not load_gold_extraction(args.gold):
+        print("No completed gold extraction templates yet — nothing to score.")
+        raise SystemExit(0)
+
+    models = sorted(p.name for p in Path(args.output_dir).iterdir()
+                    if (p / "extraction").is_dir())
+    table = evaluate_extraction(models, output_dir=args.output_dir, gold_path=args.gold)
+
+    out = Path(args.tables_dir) / "extraction_vs_gold.csv"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    table.to_csv(out, index=False)
+    print(table.groupby("model_id")[["recall", "precision", "effect_estimate_tolerance_rate",
+                                     "effect_estimate_mae"]].mean().round(3).to_string())
+    print(f"\nSaved to {out}")
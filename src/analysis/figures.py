@@ -0,0 +1,293 @@
+"""
+Figure pipeline — forest plots, pooled-effect overlays and kappa heatmaps.
+
+Figures:
+  {model}/forest_run_XXX.png   studies and DL pooled effect of one run
+  {model}/pooled_overlay.png   pooled RR ± 95% CI of every run of the model
+  {model}/kappa_heatmap.png    pairwise Cohen's kappa between screening runs
+  pooled_overlay.png           all models' per-run pooled effects side by side
+
+Figure data are assembled once in the parent process from the precomputed
+arrays of the meta-analysis engine (one vectorized ``pool`` over every
+model × run) and the cached decision matrices. Each figure's data is hashed;
+figures whose hash matches analysis/figures/.figure_hashes.json and whose file
+exists are skipped. The rest are rendered in a process pool with the
+non-interactive Agg backend. ``render_figures_async`` runs the whole job in
+the background and returns a Future, so interactive sessions are not blocked.
+
+Usage:
+    from src.analysis.figures import render_figures
+    report = render_figures(["claude-sonnet-4-5", "llama3-8b"])
+
+    python -m src.analysis.figures [--jobs 4] [--force]
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from src.analysis.arrays import load_decision_matrix
+from src.analysis.permutation import load_corpus_ids, pairwise_kappa
+from src.meta_analysis.dataset import build_meta_dataset
+from src.meta_analysis.pooling import Z_95, pool
+
+OUTPUT_DIR = "data/raw_outputs"
+CORPUS_PATH = "data/corpus/corpus_500.json"
+FIGURES_DIR = "analysis/figures"
+HASH_FILE = ".figure_hashes.json"
+
+STYLE_VERSION = 1  # bump to re-render every figure after a styling change
+DPI = 150
+
+
+# ── Figure specs (parent process) ────────────────────────────
+
+def _hash_value(h, value):
+    if isinstance(value, dict):
+        for key in sorted(value):
+            h.update(str(key).encode())
+            _hash_value(h, value[key])
+    elif isinstance(value, np.ndarray) and value.dtype != object:
+        h.update(f"{value.dtype}{value.shape}".encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, np.ndarray):
+        h.update(json.dumps(value.tolist(), default=str).encode())
+    else:
+        h.update(json.dumps(value, sort_keys=True, default=str).encode())
+
+
+def spec_hash(kind: str, data: dict) -> str:
+    """Content hash of a figure's kind, style version and data."""
+    h = hashlib.sha256(f"{kind}|{STYLE_VERSION}".encode())
+    _hash_value(h, data)
+    return h.hexdigest()
+
+
+def figure_specs(
+    model_ids: list[str],
+    output_dir: str = OUTPUT_DIR,
+    corpus_path: str = CORPUS_PATH,
+) -> list[dict]:
+    """All figure specs: {"kind", "path" (relative to the figures dir), "data"}."""
+    specs = []
+    meta = build_meta_dataset(model_ids, output_dir)
+    pooled = pool(meta["y"], meta["v"], meta["mask"], "DL")
+    keys = meta["keys"]
+
+    for i, (model_id, run_id) in enumerate(zip(keys["model_id"], keys["run_id"])):
+        present = meta["mask"][i]
+        if not present.any():
+            continue
+        y, se = meta["y"][i, present], np.sqrt(meta["v"][i, present])
+        specs.append({"kind": "forest", "path": f"{model_id}/forest_run_{run_id:03d}.png", "data": {
+            "title": f"{model_id} — run {run_id}",
+            "labels": meta["corpus_ids"][i, present],
+            "y": y, "lo": y - Z_95 * se, "hi": y + Z_95 * se,
+            "pooled": np.array([pooled[k][i] for k in ("pooled_log", "ci_lower_log", "ci_upper_log")]),
+            "i2": float(pooled["i2"][i]),
+        }})
+
+    overlay = {}
+    for model_id in keys["model_id"].unique():
+        rows = np.flatnonzero((keys["model_id"] == model_id).to_numpy() & (pooled["k"] > 0))
+        if not len(rows):
+            continue
+        data = {
+            "title": f"{model_id} — pooled RR per run",
+            "run_ids": keys["run_id"].to_numpy()[rows],
+            "y": pooled["pooled_log"][rows],
+            "lo": pooled["ci_lower_log"][rows],
+            "hi": pooled["ci_upper_log"][rows],
+            "k": pooled["k"][rows],
+        }
+        overlay[model_id] = data
+        specs.append({"kind": "overlay", "path": f"{model_id}/pooled_overlay.png", "data": data})
+    if overlay:
+        specs.append({"kind": "models", "path": "pooled_overlay.png",
+                      "data": {"models": {m: {k: d[k] for k in ("run_ids", "y", "lo", "hi")}
+                                          for m, d in overlay.items()}}})
+
+    corpus_ids = load_corpus_ids(corpus_path) if Path(corpus_path).exists() else []
+    for model_id in model_ids:
+        if not corpus_ids or not (Path(output_dir) / model_id / "screening").is_dir():
+            continue
+        run_ids, decisions = load_decision_matrix(output_dir, model_id, corpus_ids)
+        if len(run_ids) < 2:
+            continue
+        specs.append({"kind": "heatmap", "path": f"{model_id}/kappa_heatmap.png", "data": {
+            "title": f"{model_id} — pairwise kappa (screening)",
+            "run_ids": np.array(run_ids),
+            "kappa": pairwise_kappa(decisions[None])[0],
+        }})
+    return specs
+
+
+# ── Rendering (worker processes) ─────────────────────────────
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _render_forest(plt, data: dict):
+    n = len(data["y"])
+    fig, ax = plt.subplots(figsize=(6, 1.5 + 0.22 * n))
+    pos = np.arange(n, 0, -1)
+    rr, lo, hi = np.exp(data["y"]), np.exp(data["lo"]), np.exp(data["hi"])
+    ax.errorbar(rr, pos, xerr=[rr - lo, hi - rr], fmt="s", color="0.25", ms=3, lw=0.8, capsize=0)
+    p, plo, phi = np.exp(data["pooled"])
+    ax.fill([plo, p, phi, p], [0, 0.3, 0, -0.3], color="tab:red")
+    ax.axvline(1.0, color="0.5", lw=0.8, ls="--")
+    ax.set_yticks(list(pos) + [0])
+    ax.set_yticklabels(list(data["labels"]) + [f"Pooled (I² = {data['i2']:.0%})"], fontsize=7)
+    ax.set_xscale("log")
+    ax.set_xlabel("RR per 10 µg/m³")
+    ax.set_title(data["title"], fontsize=9)
+    return fig
+
+
+def _render_overlay(plt, data: dict):
+    fig, ax = plt.subplots(figsize=(6, 1.2 + 0.25 * len(data["y"])))
+    pos = np.arange(len(data["y"]), 0, -1)
+    rr, lo, hi = np.exp(data["y"]), np.exp(data["lo"]), np.exp(data["hi"])
+    crosses = (lo <= 1) & (hi >= 1)
+    for sel, color in ((~crosses, "tab:blue"), (crosses, "tab:orange")):
+        if sel.any():
+            ax.errorbar(rr[sel], pos[sel], xerr=[rr[sel] - lo[sel], hi[sel] - rr[sel]],
+                        fmt="o", color=color, ms=4, lw=1, capsize=2)
+    ax.axvline(1.0, color="0.5", lw=0.8, ls="--")
+    ax.set_yticks(pos)
+    ax.set_yticklabels([f"run {r} (k={k})" for r, k in zip(data["run_ids"], data["k"])], fontsize=7)
+    ax.set_xlabel("Pooled RR per 10 µg/m³ (orange: CI crosses 1)")
+    ax.set_title(data["title"], fontsize=9)
+    return fig
+
+
+def _render_models(plt, data: dict):
+    models = data["models"]
+    fig, ax = plt.subplots(figsize=(7, 4))
+    for m, (model_id, d) in enumerate(models.items()):
+        x = m + np.linspace(-0.3, 0.3, len(d["y"])) if len(d["y"]) > 1 else np.array([float(m)])
+        rr = np.exp(d["y"])
+        ax.errorbar(x, rr, yerr=[rr - np.exp(d["lo"]), np.exp(d["hi"]) - rr],
+                    fmt="o", ms=3, lw=0.8, capsize=0, label=model_id)
+    ax.axhline(1.0, color="0.5", lw=0.8, ls="--")
+    ax.set_xticks(range(len(models)))
+    ax.set_xticklabels(list(models), fontsize=8)
+    ax.set_ylabel("Pooled RR per 10 µg/m³")
+    ax.set_title("Pooled effect across runs, by model", fontsize=9)
+    return fig
+
+
+def _render_heatmap(plt, data: dict):
+    kappa = data["kappa"]
+    fig, ax = plt.subplots(figsize=(5, 4.2))
+    finite = kappa[np.isfinite(kappa)]
+    im = ax.imshow(kappa, vmin=min(0.0, finite.min()) if len(finite) else 0.0, vmax=1.0, cmap="viridis")
+    ticks = np.arange(len(data["run_ids"]))
+    ax.set_xticks(ticks)
+    ax.set_yticks(ticks)
+    ax.set_xticklabels(data["run_ids"], fontsize=6)
+    ax.set_yticklabels(data["run_ids"], fontsize=6)
+    ax.set_xlabel("run")
+    ax.set_ylabel("run")
+    fig.colorbar(im, ax=ax, label="Cohen's kappa")
+    ax.set_title(data["title"], fontsize=9)
+    return fig
+
+
+_RENDERERS = {
+    "forest": _render_forest,
+    "overlay": _render_overlay,
+    "models": _render_models,
+    "heatmap": _render_heatmap,
+}
+
+
+def render_spec(spec: dict, path: str) -> str:
+    """Render one figure to path (worker entry point)."""
+    plt = _pyplot()
+    fig = _RENDERERS[spec["kind"]](plt, spec["data"])
+    fig.tight_layout()
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(path, dpi=DPI)
+    plt.close(fig)
+    return path
+
+
+# ── Pipeline ─────────────────────────────────────────────────
+
+def render_figures(
+    model_ids: list[str],
+    output_dir: str = OUTPUT_DIR,
+    corpus_path: str = CORPUS_PATH,
+    figures_dir: str = FIGURES_DIR,
+    jobs: int = 1,
+    force: bool = False,
+) -> dict[str, list[str]]:
+    """Render every figure whose data changed; returns {"rendered": [...], "skipped": [...]}."""
+    figures_dir = Path(figures_dir)
+    hash_path = figures_dir / HASH_FILE
+    recorded = json.loads(hash_path.read_text()) if hash_path.exists() else {}
+
+    todo = []
+    report = {"rendered": [], "skipped": []}
+    for spec in figure_specs(model_ids, output_dir, corpus_path):
+        digest = spec_hash(spec["kind"], spec["data"])
+        path = figures_dir / spec["path"]
+        if not force and recorded.get(spec["path"]) == digest and path.exists():
+            report["skipped"].append(spec["path"])
+        else:
+            todo.append((spec, str(path), digest))
+
+    if jobs > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            list(executor.map(render_spec, [t[0] for t in todo], [t[1] for t in todo]))
+    else:
+        for spec, path, _ in todo:
+            render_spec(spec, path)
+
+    for spec, _, digest in todo:
+        recorded[spec["path"]] = digest
+        report["rendered"].append(spec["path"])
+    if todo:
+        figures_dir.mkdir(parents=True, exist_ok=True)
+        tmp = hash_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(recorded, indent=2, sort_keys=True))
+        os.replace(tmp, hash_path)
+    return report
+
+
+def render_figures_async(model_ids: list[str], **kwargs) -> Future:
+    """render_figures in a background thread (its process pool does the work)."""
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(render_figures, model_ids, **kwargs)
+    executor.shutdown(wait=False)
+    return future
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Render forest plots, overlays and kappa heatmaps")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--figures-dir", default=FIGURES_DIR)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--force", action="store_true", help="Re-render even if data is unchanged")
+    args = parser.parse_args()
+
+    models = sorted(p.name for p in Path(args.output_dir).iterdir()
+                    if (p / "extraction").is_dir() or (p / "screening").is_dir())
+    start = time.monotonic()
+    report = render_figures(models, args.output_dir, args.corpus, args.figures_dir,
+                            jobs=args.jobs, force=args.force)
+    print(f"{len(report['rendered'])} rendered, {len(report['skipped'])} unchanged "
+          f"in {time.monotonic() - start:.1f}s → {args.figures_dir}")
@@ -0,0 +1,314 @@
+"""
+Incremental Metrics Store — running sufficient statistics per model × stage.
+
+Each completed screening run updates the store in O(abstracts) per stored run:
+  - per-abstract decision tallies (include / exclude / uncertain / missing)
+  - pairwise contingency tables against every previously stored run
+  - gold × decision confusion counts for the labeled subset
+
+Aggregates (flip rate, pairwise kappa, F1 vs gold) are then derived from the
+store alone, so the live summary is always current without rescanning
+data/raw_outputs.
+
+Usage:
+    from src.analysis.metrics_store import update_metrics_store, summarize_store
+    store = update_metrics_store(output_dir, model_id, "screening", run_id, results, corpus_ids)
+    summary = summarize_store(store)
+
+    # Backfill stores from existing raw outputs
+    python -m src.analysis.metrics_store --rebuild
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from src.analysis.arrays import (
+    GOLD_SCREENING_PATH,
+    MISSING,
+    N_CODES,
+    encode_decisions,
+    file_sha256,
+    load_gold_screening,
+    load_run_results,
+)
+from src.analysis.screening_eval import confusion_counts, rates_from_confusion
+
+STORE_VERSION = "1.0"
+STORE_FILENAME = "metrics_store.json"
+
+
+# ── Persistence ──────────────────────────────────────────────
+
+def store_path(output_dir: str, model_id: str, stage: str) -> Path:
+    """Location of the metrics store for one model × stage."""
+    return Path(output_dir) / model_id / stage / STORE_FILENAME
+
+
+def _new_store(model_id: str, stage: str) -> dict:
+    return {
+        "store_version": STORE_VERSION,
+        "model_id": model_id,
+        "stage": stage,
+        "corpus_ids": [],
+        "gold_sha256": "",
+        "runs": {},
+        "tallies": [],
+        "pairwise": {},
+        "updated": None,
+    }
+
+
+def load_store(output_dir: str, model_id: str, stage: str) -> dict:
+    """Load a metrics store, or return an empty one if none exists yet."""
+    path = store_path(output_dir, model_id, stage)
+    if not path.exists():
+        return _new_store(model_id, stage)
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_store(store: dict, output_dir: str):
+    """Write the store atomically (temp file + rename)."""
+    path = store_path(output_dir, store["model_id"], store["stage"])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(store, f, indent=1)
+    os.replace(tmp, path)
+
+
+# ── Incremental update ───────────────────────────────────────
+
+def _pair_key(a: int, b: int) -> str:
+    lo, hi = sorted((a, b))
+    return f"{lo}-{hi}"
+
+
+def _extend_corpus(store: dict, corpus_ids: list[str]):
+    """Append unseen corpus_ids; stored runs get MISSING for them."""
+    known = set(store["corpus_ids"])
+    new_ids = [cid for cid in corpus_ids if cid not in known]
+    if not new_ids:
+        return
+    store["corpus_ids"].extend(new_ids)
+    for run in store["runs"].values():
+        run["decisions"].extend([MISSING] * len(new_ids))
+    for _ in new_ids:
+        tally = [0] * N_CODES
+        tally[MISSING] = len(store["runs"])
+        store["tallies"].append(tally)
+    for key, table in store["pairwise"].items():
+        t = np.array(table)
+        t[MISSING, MISSING] += len(new_ids)
+        store["pairwise"][key] = t.tolist()
+
+
+def _confusion(decisions: np.ndarray, gold: np.ndarray) -> list[list[int]]:
+    """Gold (rows: include, exclude) × decision code (cols) counts."""
+    return confusion_counts(decisions, gold).tolist()
+
+
+def _refresh_gold(store: dict, gold_path: str):
+    """Recompute stored confusion counts if the gold standard file changed."""
+    digest = file_sha256(gold_path)
+    if digest == store["gold_sha256"] and all("confusion" in r for r in store["runs"].values()):
+        return
+    gold = load_gold_screening(store["corpus_ids"], gold_path)
+    for run in store["runs"].values():
+        run["confusion"] = _confusion(np.array(run["decisions"], dtype=np.int8), gold)
+    store["gold_sha256"] = digest
+
+
+def _remove_run(store: dict, run_id: int):
+    """Subtract a stored run's contribution (used when a run is redone)."""
+    key = str(run_id)
+    old = store["runs"].pop(key, None)
+    if old is None:
+        return
+    tallies = np.array(store["tallies"], dtype=np.int64)
+    tallies[np.arange(len(old["decisions"])), old["decisions"]] -= 1
+    store["tallies"] = tallies.tolist()
+    for pair in [k for k in store["pairwise"] if key in k.split("-")]:
+        del store["pairwise"][pair]
+
+
+def add_run(
+    store: dict,
+    run_id: int,
+    results: list[dict],
+    corpus_ids: list[str],
+    gold_path: str = GOLD_SCREENING_PATH,
+) -> dict:
+    """Fold one completed run into the store's sufficient statistics."""
+    _extend_corpus(store, corpus_ids)
+    _refresh_gold(store, gold_path)
+    _remove_run(store, run_id)
+
+    ids = store["corpus_ids"]
+    new = encode_decisions(results, ids).astype(np.int64)
+
+    # Pairwise contingency tables against all previous runs in one bincount
+    prev_ids = sorted(store["runs"], key=int)
+    if prev_ids:
+        prev = np.array([store["runs"][k]["decisions"] for k in prev_ids], dtype=np.int64)
+        offsets = np.arange(len(prev_ids))[:, None] * N_CODES * N_CODES
+        flat = (offsets + prev * N_CODES + new[None, :]).ravel()
+        tables = np.bincount(flat, minlength=len(prev_ids) * N_CODES * N_CODES)
+        tables = tables.reshape(len(prev_ids), N_CODES, N_CODES)
+        for k, table in zip(prev_ids, tables):
+            # Tables are stored as (lower run id) × (higher run id)
+            t = table if int(k) < run_id else table.T
+            store["pairwise"][_pair_key(int(k), run_id)] = t.tolist()
+
+    tallies = np.array(store["tallies"], dtype=np.int64).reshape(len(ids), N_CODES)
+    tallies[np.arange(len(ids)), new] += 1
+    store["tallies"] = tallies.tolist()
+
+    gold = load_gold_screening(ids, gold_path)
+    store["runs"][str(run_id)] = {
+        "decisions": new.tolist(),
+        "confusion": _confusion(new.astype(np.int8), gold),
+        "added": datetime.now(timezone.utc).isoformat(),
+    }
+    store["updated"] = datetime.now(timezone.utc).isoformat()
+    return store
+
+
+def update_metrics_store(
+    output_dir: str,
+    model_id: str,
+    stage: str,
+    run_id: int,
+    results: list[dict],
+    corpus_ids: list[str],
+    gold_path: str = GOLD_SCREENING_PATH,
+) -> dict:
+    """Load, update with one run, and persist the store. Returns the store."""
+    store = load_store(output_dir, model_id, stage)
+    add_run(store, run_id, results, corpus_ids, gold_path=gold_path)
+    save_store(store, output_dir)
+    return store
+
+
+# ── Summary ──────────────────────────────────────────────────
+
+def kappa_from_table(table) -> float:
+    """Cohen's kappa from a pairwise contingency table (missing codes dropped)."""
+    t = np.asarray(table, dtype=float)[:MISSING, :MISSING]
+    n = t.sum()
+    if n == 0:
+        return float("nan")
+    po = np.trace(t) / n
+    pe = float(t.sum(axis=1) @ t.sum(axis=0)) / (n * n)
+    if pe >= 1.0:
+        return 1.0
+    return float((po - pe) / (1 - pe))
+
+
+def screening_rates(confusion, policy: str = "include") -> dict:
+    """Per-run rates from a stored gold × decision table (see screening_eval)."""
+    rates = rates_from_confusion(np.asarray(confusion), policy=policy)
+    return {
+        "sensitivity": float(rates["sensitivity"]),
+        "specificity": float(rates["specificity"]),
+        "precision": float(rates["precision"]),
+        "f1": float(rates["f1"]),
+        "wss": float(rates["wss"]),
+        "n_labeled": int(np.asarray(confusion)[:, :MISSING].sum()),
+        "n_missing": int(rates["n_missing"]),
+    }
+
+
+def summarize_store(store: dict, policy: str = "include") -> dict:
+    """Current aggregate metrics derived from the store's sufficient statistics."""
+    tallies = np.array(store["tallies"], dtype=float).reshape(-1, N_CODES)
+    valid = tallies[:, :MISSING]
+    n_valid = valid.sum(axis=1)
+    n_distinct = (valid > 0).sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = valid / n_valid[:, None]
+        entropy = -np.nansum(np.where(p > 0, p * np.log2(p), 0.0), axis=1)
+
+    kappas = [kappa_from_table(t) for t in store["pairwise"].values()]
+    kappas = [k for k in kappas if not np.isnan(k)]
+
+    agreements = []
+    for t in store["pairwise"].values():
+        block = np.asarray(t, dtype=float)[:MISSING, :MISSING]
+        if block.sum():
+            agreements.append(np.trace(block) / block.sum())
+
+    n_abstracts = len(store["corpus_ids"])
+    return {
+        "model_id": store["model_id"],
+        "stage": store["stage"],
+        "n_runs": len(store["runs"]),
+        "run_ids": sorted(int(k) for k in store["runs"]),
+        "n_abstracts": n_abstracts,
+        "flip_rate": float((n_distinct > 1).sum() / n_abstracts) if n_abstracts else float("nan"),
+        "mean_decision_entropy_bits": float(entropy[n_valid > 0].mean()) if (n_valid > 0).any() else float("nan"),
+        "pairwise_kappa": {
+            "n_pairs": len(kappas),
+            "mean": float(np.mean(kappas)) if kappas else float("nan"),
+            "min": float(np.min(kappas)) if kappas else float("nan"),
+            "max": float(np.max(kappas)) if kappas else float("nan"),
+        },
+        "pairwise_agreement": float(np.mean(agreements)) if agreements else float("nan"),
+        "per_run": {
+            int(k): screening_rates(r["confusion"], policy=policy)
+            for k, r in sorted(store["runs"].items(), key=lambda kv: int(kv[0]))
+        },
+        "updated": store["updated"],
+    }
+
+
+# ── Backfill ─────────────────────────────────────────────────
+
+def rebuild_store(
+    output_dir: str,
+    model_id: str,
+    stage: str,
+    corpus_ids: list[str],
+    gold_path: str = GOLD_SCREENING_PATH,
+) -> Optional[dict]:
+    """Rebuild a store from the run directories already on disk."""
+    runs = load_run_results(output_dir, model_id, stage)
+    if not runs:
+        return None
+    store = _new_store(model_id, stage)
+    for run_id, results in sorted(runs.items()):
+        add_run(store, run_id, results, corpus_ids, gold_path=gold_path)
+    save_store(store, output_dir)
+    return store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Incremental screening metrics store")
+    parser.add_argument("--output-dir", default="data/raw_outputs")
+    parser.add_argument("--corpus", default="data/corpus/corpus_500.json")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Rebuild stores from existing run outputs")
+    args = parser.parse_args()
+
+    with open(args.corpus) as f:
+        ids = [a["corpus_id"] for a in json.load(f)["corpus"]]
+
+    for model_dir in sorted(p for p in Path(args.output_dir).iterdir() if p.is_dir()):
+        if args.rebuild:
+            store = rebuild_store(args.output_dir, model_dir.name, "screening", ids)
+        else:
+            store = load_store(args.output_dir, model_dir.name, "screening")
+        if not store or not store["runs"]:
+            continue
+        s = summarize_store(store)
+        f1s = [r["f1"] for r in s["per_run"].values()]
+        print(f"{s['model_id']:>20}: {s['n_runs']} runs | flip rate {s['flip_rate']:.3f} | "
+              f"kappa {s['pairwise_kappa']['mean']:.3f} | mean F1 {np.nanmean(f1s):.3f}")
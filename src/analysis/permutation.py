@@ -0,0 +1,366 @@
+"""
+Permutation tests for between-model reproducibility comparisons.
+
+Tests whether model A is more reproducible than model B on:
+  flip_rate   share of abstracts whose valid screening decision varies across runs
+  kappa       mean pairwise Cohen's kappa between runs (missing decisions dropped)
+  pooled_sd   SD across runs of the pooled DL log RR (per 10 µg/m³)
+
+The observed statistic is stat(A) − stat(B). Under the null the runs of both
+models are exchangeable, and two permutation schemes are supported:
+  runs        whole runs are reassigned between models
+  abstracts   run labels are permuted independently within each abstract
+              (stratified by abstract), creating synthetic runs
+
+Permutations are generated in batches as index arrays over the pooled runs and
+every statistic is evaluated for the whole batch with array operations. Chunks
+of batches run across processes, each seeded from a SeedSequence spawned by
+chunk index, so results are reproducible whatever the number of workers.
+Sampling stops once the Monte Carlo standard error of every p-value is below
+``mc_se_threshold`` (after ``min_permutations``) or at ``max_permutations``.
+
+Inputs are the cached arrays from src.analysis.arrays (decision matrices) and
+src.analysis.estimates (via the meta-analysis dataset).
+
+Usage:
+    from src.analysis.permutation import compare_models
+    summary, null = compare_models("claude-sonnet-4-5", "llama3-8b")
+
+    python -m src.analysis.permutation claude-sonnet-4-5 llama3-8b --scheme abstracts
+"""
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.arrays import MISSING, load_decision_matrix
+from src.analysis.estimates import load_estimates_table
+from src.meta_analysis.dataset import select_primary_estimates
+from src.meta_analysis.pooling import pool
+
+OUTPUT_DIR = "data/raw_outputs"
+CORPUS_PATH = "data/corpus/corpus_500.json"
+TABLES_DIR = "analysis/tables"
+
+STATISTICS = ("flip_rate", "kappa", "pooled_sd")
+SCHEMES = ("runs", "abstracts")
+DECISION_STATISTICS = ("flip_rate", "kappa")
+
+BATCH_SIZE = 100
+BATCHES_PER_CHUNK = 5
+CHUNKS_PER_ROUND = 4  # stopping is checked per round, independent of the worker count
+MIN_PERMUTATIONS = 1000
+MAX_PERMUTATIONS = 20000
+MC_SE_THRESHOLD = 0.005
+
+
+# ── Vectorized statistics ────────────────────────────────────
+# Each takes synthetic run arrays with a leading batch axis: (batch × runs × abstracts)
+
+def flip_rate(decisions: np.ndarray) -> np.ndarray:
+    """Share of abstracts with more than one distinct valid decision, per batch item."""
+    onehot = decisions[..., None] == np.arange(MISSING)
+    distinct = onehot.any(axis=1).sum(axis=-1)
+    return (distinct > 1).mean(axis=-1)
+
+
+def pairwise_kappa(decisions: np.ndarray) -> np.ndarray:
+    """Cohen's kappa between every pair of runs: (batch × runs × runs).
+
+    Each pair uses only abstracts where both runs gave a valid decision;
+    pairs with no overlap are NaN.
+    """
+    b, r, n_abs = decisions.shape
+    x = (decisions[..., None] == np.arange(MISSING)).astype(float)  # b × r × n × c
+    valid = x.sum(axis=-1)                                             # b × r × n
+    valid_t = valid.transpose(0, 2, 1)
+    # Batched matrix products (BLAS) for all run pairs at once
+    n = valid @ valid_t
+    flat = x.reshape(b, r, n_abs * MISSING)
+    agree = flat @ flat.transpose(0, 2, 1)
+    # Marginals of run r restricted to abstracts where run s is also valid: b × r × c × s
+    margin = x.transpose(0, 1, 3, 2).reshape(b, r * MISSING, n_abs) @ valid_t
+    margin = margin.reshape(b, r, MISSING, r)
+    expected = np.einsum("brcs,bscr->brs", margin, margin)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        po = agree / n
+        pe = expected / n ** 2
+        kappa = np.where(pe >= 1.0, 1.0, (po - pe) / (1 - pe))
+    return np.where(n > 0, kappa, np.nan)
+
+
+def mean_kappa(decisions: np.ndarray) -> np.ndarray:
+    """Mean pairwise Cohen's kappa across runs, per batch item."""
+    kappa = pairwise_kappa(decisions)
+    r = decisions.shape[1]
+    upper = np.triu(np.ones((r, r), dtype=bool), k=1)[None] & np.isfinite(kappa)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(upper, kappa, 0.0).sum(axis=(1, 2)) / upper.sum(axis=(1, 2))
+
+
+def pooled_sd(y: np.ndarray, v: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """SD across runs of the pooled DL log RR, per batch item."""
+    b, r, n = y.shape
+    pooled = pool(y.reshape(b * r, n), v.reshape(b * r, n), mask.reshape(b * r, n), "DL")["pooled_log"]
+    pooled = pooled.reshape(b, r)
+    with np.errstate(invalid="ignore"):
+        ok = np.isfinite(pooled)
+        k = ok.sum(axis=1)
+        mean = np.where(ok, pooled, 0.0).sum(axis=1) / k
+        ss = (np.where(ok, pooled - mean[:, None], 0.0) ** 2).sum(axis=1)
+        return np.where(k > 1, np.sqrt(ss / (k - 1)), np.nan)
+
+
+# ── Data ─────────────────────────────────────────────────────
+
+def load_corpus_ids(path: str = CORPUS_PATH) -> list[str]:
+    with open(path) as f:
+        return [a["corpus_id"] for a in json.load(f)["corpus"]]
+
+
+def estimate_arrays(
+    model_ids: list[str],
+    output_dir: str = OUTPUT_DIR,
+) -> dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Per model (runs × abstracts) y, v and mask of primary estimates.
+
+    Abstract columns are shared across the given models so runs of different
+    models can be exchanged abstract by abstract.
+    """
+    estimates, set_sizes = load_estimates_table(model_ids, output_dir)
+    studies = select_primary_estimates(estimates)
+    abstracts = sorted(set(studies["corpus_id"]))
+    col = {c: i for i, c in enumerate(abstracts)}
+
+    arrays = {}
+    for model_id in model_ids:
+        run_ids = sorted(set(set_sizes.loc[set_sizes["model_id"] == model_id, "run_id"]))
+        row = {r: i for i, r in enumerate(run_ids)}
+        y = np.zeros((len(run_ids), len(abstracts)))
+        v = np.ones((len(run_ids), len(abstracts)))
+        mask = np.zeros((len(run_ids), len(abstracts)), dtype=bool)
+        sub = studies[studies["model_id"] == model_id]
+        r_idx = sub["run_id"].map(row).to_numpy(dtype=int)
+        c_idx = sub["corpus_id"].map(col).to_numpy(dtype=int)
+        y[r_idx, c_idx] = sub["yi"].to_numpy()
+        v[r_idx, c_idx] = sub["vi"].to_numpy()
+        mask[r_idx, c_idx] = True
+        arrays[model_id] = (y, v, mask)
+    return arrays
+
+
+# ── Permutation engine ───────────────────────────────────────
+
+def _permutation_indices(
+    rng: np.random.Generator, batch: int, n_runs: int, n_abstracts: int, scheme: str,
+) -> np.ndarray:
+    """(batch × abstracts × pooled runs) permuted run indices."""
+    if scheme == "runs":
+        keys = rng.random((batch, 1, n_runs))
+        return np.broadcast_to(np.argsort(keys, axis=-1), (batch, n_abstracts, n_runs))
+    return np.argsort(rng.random((batch, n_abstracts, n_runs)), axis=-1)
+
+
+def _take(arr: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """Synthetic runs: arr[idx[b, n, j], n] → (batch × runs × abstracts)."""
+    n = np.arange(arr.shape[1])[None, :, None]
+    return arr[idx, n].transpose(0, 2, 1)
+
+
+def _evaluate(data: dict, idx: dict[str, np.ndarray], statistics: tuple[str, ...]) -> dict[str, np.ndarray]:
+    """stat(first n_a synthetic runs) − stat(rest) for every batch item."""
+    out = {}
+    for name in statistics:
+        n_a = data["n_a"][name]
+        if name in DECISION_STATISTICS:
+            d = data["decisions"]
+            i = idx[name]
+            fn = flip_rate if name == "flip_rate" else mean_kappa
+            out[name] = fn(_take(d, i[..., :n_a])) - fn(_take(d, i[..., n_a:]))
+        else:
+            y, v, mask = data["estimates"]
+            i = idx[name]
+            a = pooled_sd(_take(y, i[..., :n_a]), _take(v, i[..., :n_a]), _take(mask, i[..., :n_a]))
+            b = pooled_sd(_take(y, i[..., n_a:]), _take(v, i[..., n_a:]), _take(mask, i[..., n_a:]))
+            out[name] = a - b
+    return out
+
+
+def _run_chunk(data: dict, statistics: tuple[str, ...], scheme: str,
+               seed: np.random.SeedSequence, n_batches: int, batch_size: int) -> dict[str, np.ndarray]:
+    """Null statistics for one chunk of permutation batches (worker entry point)."""
+    rng = np.random.default_rng(seed)
+    chunks = {name: [] for name in statistics}
+    for _ in range(n_batches):
+        idx = {}
+        for name in statistics:
+            pooled = data["decisions"] if name in DECISION_STATISTICS else data["estimates"][0]
+            idx[name] = _permutation_indices(rng, batch_size, pooled.shape[0], pooled.shape[1], scheme)
+        for name, values in _evaluate(data, idx, statistics).items():
+            chunks[name].append(values)
+    return {name: np.concatenate(v) for name, v in chunks.items()}
+
+
+def _p_value(null: np.ndarray, observed: float) -> tuple[float, float, int]:
+    """Two-sided permutation p-value with the +1 correction, its MC SE, and n used."""
+    ok = null[np.isfinite(null)]
+    n = len(ok)
+    if n == 0 or not np.isfinite(observed):
+        return float("nan"), float("nan"), n
+    extreme = int(np.sum(np.abs(ok) >= abs(observed) - 1e-12))
+    p = (extreme + 1) / (n + 1)
+    return p, float(np.sqrt(p * (1 - p) / (n + 1))), n
+
+
+def permutation_test(
+    data: dict,
+    statistics: tuple[str, ...],
+    scheme: str = "runs",
+    seed: int = 42,
+    batch_size: int = BATCH_SIZE,
+    min_permutations: int = MIN_PERMUTATIONS,
+    max_permutations: int = MAX_PERMUTATIONS,
+    mc_se_threshold: float = MC_SE_THRESHOLD,
+    n_jobs: int = 1,
+) -> dict[str, dict]:
+    """Run the permutation test on prepared pooled arrays (see prepare_comparison).
+
+    Returns {statistic: {observed, p_value, mc_se, n_permutations, null}}.
+    """
+    if scheme not in SCHEMES:
+        raise ValueError(f"Unknown scheme: {scheme} (expected one of {SCHEMES})")
+
+    identity = {}
+    for name in statistics:
+        pooled = data["decisions"] if name in DECISION_STATISTICS else data["estimates"][0]
+        runs, abstracts = pooled.shape
+        identity[name] = np.broadcast_to(np.arange(runs), (1, abstracts, runs))
+    observed = {k: float(v[0]) for k, v in _evaluate(data, identity, statistics).items()}
+
+    root = np.random.SeedSequence(seed)
+    chunk_size = BATCHES_PER_CHUNK * batch_size
+    null = {name: [] for name in statistics}
+    n_done = 0
+    chunk_index = 0
+    executor = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+    try:
+        while n_done < max_permutations:
+            n_chunks = CHUNKS_PER_ROUND
+            seeds = [np.random.SeedSequence(root.entropy, spawn_key=(chunk_index + i,))
+                     for i in range(n_chunks)]
+            chunk_index += n_chunks
+            args = (data, statistics, scheme)
+            if executor:
+                results = list(executor.map(
+                    _run_chunk, *zip(*[(*args, s, BATCHES_PER_CHUNK, batch_size) for s in seeds])
+                ))
+            else:
+                results = [_run_chunk(*args, s, BATCHES_PER_CHUNK, batch_size) for s in seeds]
+            for result in results:
+                for name, values in result.items():
+                    null[name].append(values)
+            n_done += chunk_size * n_chunks
+
+            if n_done >= min_permutations:
+                errors = [_p_value(np.concatenate(null[name]), observed[name])[1] for name in statistics]
+                if all(not np.isfinite(e) or e < mc_se_threshold for e in errors):
+                    break
+    finally:
+        if executor:
+            executor.shutdown()
+
+    out = {}
+    for name in statistics:
+        values = np.concatenate(null[name])
+        p, se, n = _p_value(values, observed[name])
+        out[name] = {"observed": observed[name], "p_value": p, "mc_se": se,
+                     "n_permutations": n, "null": values}
+    return out
+
+
+def prepare_comparison(
+    model_a: str,
+    model_b: str,
+    statistics: tuple[str, ...] = STATISTICS,
+    output_dir: str = OUTPUT_DIR,
+    corpus_path: str = CORPUS_PATH,
+) -> dict:
+    """Pooled run arrays of both models (A's runs first) for the requested statistics."""
+    data = {"n_a": {}, "decisions": None, "estimates": None}
+    if any(s in DECISION_STATISTICS for s in statistics):
+        corpus_ids = load_corpus_ids(corpus_path)
+        _, da = load_decision_matrix(output_dir, model_a, corpus_ids)
+        _, db = load_decision_matrix(output_dir, model_b, corpus_ids)
+        data["decisions"] = np.concatenate([da, db])
+        for s in DECISION_STATISTICS:
+            data["n_a"][s] = len(da)
+    if "pooled_sd" in statistics:
+        arrays = estimate_arrays([model_a, model_b], output_dir)
+        data["estimates"] = tuple(np.concatenate([a, b]) for a, b in zip(arrays[model_a], arrays[model_b]))
+        data["n_a"]["pooled_sd"] = len(arrays[model_a][0])
+    return data
+
+
+def compare_models(
+    model_a: str,
+    model_b: str,
+    statistics: tuple[str, ...] = STATISTICS,
+    scheme: str = "runs",
+    output_dir: str = OUTPUT_DIR,
+    corpus_path: str = CORPUS_PATH,
+    **kwargs,
+) -> tuple[pd.DataFrame, dict[str, np.ndarray]]:
+    """Permutation tests of model A vs model B.
+
+    Returns (summary table with one row per statistic, {statistic: null distribution}).
+    """
+    data = prepare_comparison(model_a, model_b, statistics, output_dir, corpus_path)
+    results = permutation_test(data, statistics, scheme=scheme, **kwargs)
+    rows = []
+    for name, r in results.items():
+        finite = r["null"][np.isfinite(r["null"])]
+        rows.append({
+            "model_a": model_a, "model_b": model_b, "statistic": name, "scheme": scheme,
+            "observed_diff": r["observed"], "p_value": r["p_value"], "mc_se": r["mc_se"],
+            "n_permutations": r["n_permutations"],
+            "null_mean": float(finite.mean()) if len(finite) else float("nan"),
+            "null_sd": float(finite.std(ddof=1)) if len(finite) > 1 else float("nan"),
+            "null_q025": float(np.quantile(finite, 0.025)) if len(finite) else float("nan"),
+            "null_q975": float(np.quantile(finite, 0.975)) if len(finite) else float("nan"),
+        })
+    return pd.DataFrame(rows), {name: r["null"] for name, r in results.items()}
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Permutation tests between two models")
+    parser.add_argument("model_a")
+    parser.add_argument("model_b")
+    parser.add_argument("--statistics", nargs="+", default=list(STATISTICS), choices=STATISTICS)
+    parser.add_argument("--scheme", default="runs", choices=SCHEMES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-permutations", type=int, default=MAX_PERMUTATIONS)
+    parser.add_argument("--mc-se", type=float, default=MC_SE_THRESHOLD)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--tables-dir", default=TABLES_DIR)
+    args = parser.parse_args()
+
+    summary, null = compare_models(
+        args.model_a, args.model_b, tuple(args.statistics), args.scheme,
+        output_dir=args.output_dir, corpus_path=args.corpus, seed=args.seed,
+        max_permutations=args.max_permutations, mc_se_threshold=args.mc_se, n_jobs=args.jobs,
+    )
+    tables_dir = Path(args.tables_dir)
+    tables_dir.mkdir(parents=True, exist_ok=True)
+    stem = f"permutation_{args.model_a}_vs_{args.model_b}_{args.scheme}"
+    summary.to_csv(tables_dir / f"{stem}.csv", index=False)
+    np.savez_compressed(tables_dir / f"{stem}_null.npz", **null)
+    print(summary[["statistic", "observed_diff", "p_value", "mc_se", "n_permutations"]].to_string(index=False))
+    print(f"\nSaved to {tables_dir / stem}.csv (+ _null.npz)")
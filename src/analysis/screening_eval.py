@@ -0,0 +1,155 @@
+"""
+Screening Evaluation — model decisions vs the screening gold standard.
+
+Gold labels and every model × run decision vector are aligned by corpus_id
+into integer arrays once (see src.analysis.arrays); confusion matrices and
+derived rates for all model × run combinations are then computed in a single
+batched operation.
+
+Abstracts with a null ``final_label`` are left out of every metric. Failed
+calls (missing decisions) are reported but never counted as include/exclude.
+``uncertain`` decisions follow one of UNCERTAIN_POLICIES:
+  - "include": forwarded to full-text review (counted as positive)
+  - "exclude": counted as negative
+  - "drop":    left out of the confusion matrix
+
+Usage:
+    from src.analysis.screening_eval import evaluate_screening
+    table = evaluate_screening(["claude-sonnet-4-5", "llama3-8b"], policy="include")
+
+    python -m src.analysis.screening_eval --policy include
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.arrays import (
+    DECISION_CODES,
+    GOLD_CLASSES,
+    GOLD_SCREENING_PATH,
+    MISSING,
+    N_CODES,
+    load_decision_tensor,
+    load_gold_screening,
+)
+
+OUTPUT_DIR = "data/raw_outputs"
+CORPUS_PATH = "data/corpus/corpus_500.json"
+TABLES_DIR = "analysis/tables"
+
+UNCERTAIN_POLICIES = ("include", "exclude", "drop")
+
+_INC = DECISION_CODES["include"]
+_EXC = DECISION_CODES["exclude"]
+_UNC = DECISION_CODES["uncertain"]
+
+
+def confusion_counts(decisions: np.ndarray, gold: np.ndarray) -> np.ndarray:
+    """Gold × decision counts for any batch of decision vectors.
+
+    Args:
+        decisions: int array (..., n_abstracts) of decision codes
+        gold: int array (n_abstracts,) of gold codes (UNLABELED < 0)
+
+    Returns:
+        int64 array (..., 2, N_CODES): rows gold include/exclude, cols decision code
+    """
+    decision_onehot = decisions[..., None] == np.arange(N_CODES)
+    gold_onehot = (gold[:, None] == np.arange(len(GOLD_CLASSES))).astype(np.int64)
+    return np.einsum("...nc,ng->...gc", decision_onehot.astype(np.int64), gold_onehot)
+
+
+def rates_from_confusion(counts: np.ndarray, policy: str = "include") -> dict[str, np.ndarray]:
+    """Sensitivity, specificity, precision, F1 and WSS from gold × decision counts.
+
+    Works elementwise over any leading batch shape of ``counts`` (..., 2, N_CODES).
+    Undefined ratios (zero denominators) are NaN.
+    """
+    if policy not in UNCERTAIN_POLICIES:
+        raise ValueError(f"Unknown uncertain policy: {policy}")
+    c = np.asarray(counts, dtype=float)
+    pos = [_INC, _UNC] if policy == "include" else [_INC]
+    neg = [_EXC, _UNC] if policy == "exclude" else [_EXC]
+
+    tp = c[..., 0, pos].sum(-1)
+    fn = c[..., 0, neg].sum(-1)
+    fp = c[..., 1, pos].sum(-1)
+    tn = c[..., 1, neg].sum(-1)
+    n = tp + fn + fp + tn
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sensitivity = tp / (tp + fn)
+        specificity = tn / (tn + fp)
+        precision = tp / (tp + fp)
+        f1 = 2 * tp / (2 * tp + fp + fn)
+        # Work saved over sampling: share of records screened out minus recall loss
+        wss = (tn + fn) / n - (1 - sensitivity)
+
+    return {
+        "tp": tp, "fp": fp, "tn": tn, "fn": fn,
+        "n_evaluated": n,
+        "n_uncertain": c[..., :, _UNC].sum(-1),
+        "n_missing": c[..., :, MISSING].sum(-1),
+        "sensitivity": sensitivity,
+        "specificity": specificity,
+        "precision": precision,
+        "f1": f1,
+        "wss": wss,
+    }
+
+
+def evaluate_screening(
+    model_ids: list[str],
+    policy: str = "include",
+    output_dir: str = OUTPUT_DIR,
+    corpus_path: str = CORPUS_PATH,
+    gold_path: str = GOLD_SCREENING_PATH,
+) -> pd.DataFrame:
+    """Evaluate every model × run against the gold standard in one batch.
+
+    Returns a tidy table with one row per (model_id, run_id).
+    """
+    with open(corpus_path) as f:
+        corpus_ids = [a["corpus_id"] for a in json.load(f)["corpus"]]
+
+    gold = load_gold_screening(corpus_ids, gold_path)
+    run_ids, decisions, present = load_decision_tensor(output_dir, model_ids, corpus_ids)
+    rates = rates_from_confusion(confusion_counts(decisions, gold), policy=policy)
+
+    m_idx, r_idx = np.nonzero(present)
+    table = pd.DataFrame({
+        "model_id": [model_ids[m] for m in m_idx],
+        "run_id": [run_ids[r] for r in r_idx],
+        "policy": policy,
+    })
+    for name, values in rates.items():
+        table[name] = values[m_idx, r_idx]
+    for name in ("tp", "fp", "tn", "fn", "n_evaluated", "n_uncertain", "n_missing"):
+        table[name] = table[name].astype(int)
+    return table
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Screening decisions vs gold standard")
+    parser.add_argument("--policy", choices=UNCERTAIN_POLICIES, default="include",
+                        help="How to count 'uncertain' decisions")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--tables-dir", default=TABLES_DIR)
+    args = parser.parse_args()
+
+    models = sorted(p.name for p in Path(args.output_dir).iterdir()
+                    if (p / "screening").is_dir())
+    table = evaluate_screening(models, policy=args.policy, output_dir=args.output_dir)
+
+    out = Path(args.tables_dir) / f"screening_vs_gold_{args.policy}.csv"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    table.to_csv(out, index=False)
+
+    print(table.groupby("model_id")[["sensitivity", "specificity", "precision", "f1", "wss"]]
+          .mean().round(3).to_string())
+    print(f"\nSaved to {out}")
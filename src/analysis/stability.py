@@ -0,0 +1,171 @@
+"""
+Cross-run numeric stability of extracted effect estimates (RQ2).
+
+For every model × abstract × aligned estimate slot, summarizes the
+distribution of effect_estimate, ci_lower and ci_upper across runs:
+coefficient of variation, range, and the share of runs reporting the modal
+value. Per model × abstract it also counts the runs whose estimate set size
+differs from the modal size.
+
+All statistics are grouped reductions (bincount / reduceat over a sorted
+group key) on the flat estimates table from src.analysis.estimates, so every
+model and run is processed in one pass. With ``normalized=True`` the
+statistics are computed on estimates rescaled to per 10 µg/m³ (see
+src.extraction.normalize) instead of the values as reported.
+
+Usage:
+    from src.analysis.stability import estimate_stability
+    table = estimate_stability(["claude-sonnet-4-5", "gemini-2.5-pro"])
+
+    python -m src.analysis.stability [--normalized]
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.estimates import load_estimates_table
+from src.analysis.extraction_eval import NUMERIC_FIELDS
+
+OUTPUT_DIR = "data/raw_outputs"
+TABLES_DIR = "analysis/tables"
+
+NORMALIZED_FIELDS = ("effect_norm", "ci_lower_norm", "ci_upper_norm")
+
+MODE_DECIMALS = 6  # values are rounded before counting the modal value
+
+
+def grouped_stats(group: np.ndarray, values: np.ndarray, n_groups: int) -> dict[str, np.ndarray]:
+    """Count, mean, SD, CV, min, max, range and modal share of values per group.
+
+    Args:
+        group: int array of group indices in [0, n_groups)
+        values: float array aligned to group; NaNs are ignored
+        n_groups: number of groups
+
+    Returns:
+        dict of float arrays of length n_groups (NaN where a group has no values)
+    """
+    ok = ~np.isnan(values)
+    g, x = group[ok], values[ok]
+
+    n = np.bincount(g, minlength=n_groups).astype(float)
+    lo = np.full(n_groups, np.nan)
+    hi = np.full(n_groups, np.nan)
+    modal_share = np.full(n_groups, np.nan)
+    if len(x):
+        order = np.lexsort((x, g))
+        g_sorted = g[order]
+        x_sorted = x[order]
+        starts = np.flatnonzero(np.r_[True, g_sorted[1:] != g_sorted[:-1]])
+        present = g_sorted[starts]
+        lo[present] = np.minimum.reduceat(x_sorted, starts)
+        hi[present] = np.maximum.reduceat(x_sorted, starts)
+
+        # Modal share: longest run of equal (rounded) values within each group
+        xr = np.round(x_sorted, MODE_DECIMALS)
+        run_starts = np.flatnonzero(
+            np.r_[True, (g_sorted[1:] != g_sorted[:-1]) | (xr[1:] != xr[:-1])]
+        )
+        run_lengths = np.diff(np.r_[run_starts, len(xr)])
+        run_groups = g_sorted[run_starts]
+        group_run_starts = np.flatnonzero(np.r_[True, run_groups[1:] != run_groups[:-1]])
+        longest = np.maximum.reduceat(run_lengths, group_run_starts)
+        modal_share[run_groups[group_run_starts]] = longest / n[run_groups[group_run_starts]]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Moments of values shifted by the group minimum, so groups of identical
+        # values get an SD of exactly 0
+        d = x - lo[g]
+        mean_d = np.bincount(g, weights=d, minlength=n_groups) / n
+        ss = np.bincount(g, weights=(d - mean_d[g]) ** 2, minlength=n_groups)
+        mean = lo + mean_d
+        sd = np.where(n > 1, np.sqrt(ss / (n - 1)), np.nan)
+        cv = sd / np.abs(mean)
+
+    return {
+        "n": n, "mean": mean, "sd": sd, "cv": cv,
+        "min": lo, "max": hi, "range": hi - lo, "modal_share": modal_share,
+    }
+
+
+def set_size_changes(set_sizes: pd.DataFrame) -> pd.DataFrame:
+    """Per model × abstract: runs, modal set size, and runs deviating from it."""
+    changed = (set_sizes["n_estimates"] != set_sizes["modal_n_estimates"]).to_numpy()
+    keys = set_sizes[["model_id", "corpus_id"]]
+    codes, uniques = pd.MultiIndex.from_frame(keys).factorize()
+    n_groups = len(uniques)
+    return pd.DataFrame({
+        "model_id": uniques.get_level_values(0),
+        "corpus_id": uniques.get_level_values(1),
+        "n_runs": np.bincount(codes, minlength=n_groups),
+        "modal_n_estimates": set_sizes.groupby(codes)["modal_n_estimates"].first().to_numpy(),
+        "n_runs_set_size_changed": np.bincount(codes, weights=changed, minlength=n_groups).astype(int),
+    })
+
+
+def estimate_stability(
+    model_ids: list[str],
+    output_dir: str = OUTPUT_DIR,
+    normalized: bool = False,
+) -> pd.DataFrame:
+    """Stability of each aligned estimate slot across runs, for all models at once.
+
+    Columns are prefixed by the reported field names either way; with
+    ``normalized`` the values are the per-10 µg/m³ rescaled estimates and
+    slots without a usable normalization are dropped.
+    """
+    estimates, set_sizes = load_estimates_table(model_ids, output_dir)
+    aligned = estimates[estimates["slot"] >= 0]
+    if normalized:
+        aligned = aligned[aligned["norm_ok"]]
+
+    keys = aligned[["model_id", "corpus_id", "slot"]]
+    codes, uniques = pd.MultiIndex.from_frame(keys).factorize()
+    n_groups = len(uniques)
+
+    table = pd.DataFrame({
+        "model_id": uniques.get_level_values(0),
+        "corpus_id": uniques.get_level_values(1),
+        "slot": uniques.get_level_values(2),
+    })
+    first = aligned.groupby(codes)[["effect_measure", "lag", "outcome_specific"]].first()
+    table = pd.concat([table, first.reset_index(drop=True)], axis=1)
+
+    sources = NORMALIZED_FIELDS if normalized else NUMERIC_FIELDS
+    for field, source in zip(NUMERIC_FIELDS, sources):
+        stats = grouped_stats(codes, aligned[source].to_numpy(dtype=float), n_groups)
+        for name, values in stats.items():
+            table[f"{field}_{name}"] = values
+
+    sizes = set_size_changes(set_sizes)
+    return table.merge(sizes, on=["model_id", "corpus_id"], how="left")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cross-run stability of extracted estimates")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--tables-dir", default=TABLES_DIR)
+    parser.add_argument("--normalized", action="store_true",
+                        help="Use estimates rescaled to per 10 µg/m³")
+    args = parser.parse_args()
+
+    models = sorted(p.name for p in Path(args.output_dir).iterdir()
+                    if (p / "extraction").is_dir())
+    table = estimate_stability(models, output_dir=args.output_dir, normalized=args.normalized)
+
+    name = "extraction_stability_normalized.csv" if args.normalized else "extraction_stability.csv"
+    out = Path(args.tables_dir) / name
+    out.parent.mkdir(parents=True, exist_ok=True)
+    table.to_csv(out, index=False)
+
+    summary = table.groupby("model_id").agg(
+        slots=("slot", "size"),
+        median_cv=("effect_estimate_cv", "median"),
+        unstable_slots=("effect_estimate_modal_share", lambda s: int((s < 1).sum())),
+    )
+    print(summary.to_string())
+    print(f"\nSaved to {out}")
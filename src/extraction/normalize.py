@@ -0,0 +1,207 @@
+"""
+Exposure-increment normalization for extracted estimates.
+
+The extraction schema stores ``exposure_increment`` as free text
+("per 10 µg/m³", "per IQR (7.2 µg/m³)", "30 vs 20 µg/m³"). Pooling needs every
+ratio estimate on a common increment, so this stage:
+
+  1. parses each distinct increment string once with a compiled grammar
+     (memoized), yielding an increment in µg/m³ and a status flag;
+  2. rescales log-effects and log-CI bounds to TARGET_INCREMENT_UGM3 in
+     vectorized form: log(RR_target) = log(RR) × target / increment.
+
+Status flags:
+  ok                  parsed, mass-concentration increment in µg/m³
+  iqr_without_value   "per IQR" with no numeric IQR given
+  unsupported_unit    ppb, ppm, AQI units, particle counts, ..., with or
+                      without a number ("per unit AQI", "per IQR (2088 p/cm3)",
+                      or an IQR value in a unit the grammar does not know)
+  unparsed            free text the grammar does not recognize
+  missing             null / "not specified"
+
+Usage:
+    from src.extraction.normalize import normalize_estimates
+    table = normalize_estimates(estimates_table)
+"""
+
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+# Labeling guide: "Record per 10 µg/m³ — convert if different increment used"
+TARGET_INCREMENT_UGM3 = 10.0
+
+RATIO_MEASURES = ("rr", "or", "hr", "irr")
+# Percent-scale measures (compared via _measure_key): % change, excess risk
+PERCENT_MEASURES = (
+    "pc", "er", "excess_risk", "percent_change", "percent_increase",
+    "percentage_change", "percentage_increase",
+)
+
+_UNIT_FACTORS = {"ugm3": 1.0, "mgm3": 1000.0}
+
+
+class Increment(NamedTuple):
+    value_ugm3: Optional[float]
+    status: str
+
+
+# ── Grammar ──────────────────────────────────────────────────
+
+_NUMBER = r"\d+(?:,\d{3})*(?:[.,]\d+)?"
+_UNIT = (
+    r"(?:(?P<ugm3>[µμu]g\s*/\s*m(?:3|³|\^3)?)"
+    r"|(?P<mgm3>mg\s*/\s*m(?:3|³|\^3)?)"
+    r"|(?P<other>ppb|ppm|(?:n|p|pt|#|particles?)\s*/\s*cm(?:3|³)?|(?:-?\s*)?units?\b|aqi))"
+)
+
+_IQR = re.compile(
+    r"^(?:per\s+)?(?:an?\s+|one\s+)?(?:iqr|inter[\s-]?quartile(?:\s+range)?)\b"
+    r"(?:\s*(?:increase|increment|change))?"
+    rf"(?:\s*[\(\[=:,]?\s*(?:of\s+|=\s*)?(?P<value>{_NUMBER})\s*{_UNIT})?",
+    re.IGNORECASE,
+)
+_CONTRAST = re.compile(
+    rf"^(?P<high>{_NUMBER})\s*(?:{_UNIT.replace('?P<', '?P<high_')}\s*)?"
+    rf"(?:vs\.?|versus)\s*(?P<low>{_NUMBER})\s*{_UNIT}",
+    re.IGNORECASE,
+)
+_PER_VALUE = re.compile(
+    rf"^(?:per\s+)?(?:an?\s+)?(?:increase\s+of\s+)?(?P<value>{_NUMBER})[\s-]*{_UNIT}",
+    re.IGNORECASE,
+)
+# A unit with no number: "per µg/m³", "per unit AQI"
+_PER_UNIT = re.compile(rf"^(?:per\s+)?(?:an?\s+|one\s+)?{_UNIT}", re.IGNORECASE)
+# An IQR value whose unit is not in _UNIT: "per IQR (12 mm)"
+_IQR_OTHER_VALUE = re.compile(rf"^\s*[\(\[=:,]?\s*(?:of\s+|=\s*)?{_NUMBER}\s*[^\s\)\]]")
+_MISSING = re.compile(
+    r"^(?:per\s+)?(?:|none|null|n/?a|not\s+(?:specified|reported|stated)|unknown)$", re.IGNORECASE
+)
+
+
+def _to_float(number: str) -> float:
+    """'10,166' → 10166.0; '7,2' → 7.2; '12.4' → 12.4."""
+    if re.fullmatch(r"\d+(?:,\d{3})+(?:\.\d+)?", number):
+        number = number.replace(",", "")
+    return float(number.replace(",", "."))
+
+
+def _measure_key(measure) -> str:
+    """'Percentage change' → 'percentage_change'; None → ''."""
+    if measure is None or measure != measure:
+        return ""
+    return re.sub(r"[^0-9a-z]+", "_", str(measure).lower()).strip("_")
+
+
+def _unit_status(match: re.Match, value: float) -> Increment:
+    for unit, factor in _UNIT_FACTORS.items():
+        if match.group(unit):
+            if value <= 0:
+                return Increment(None, "unparsed")
+            return Increment(value * factor, "ok")
+    return Increment(None, "unsupported_unit")
+
+
+@lru_cache(maxsize=None)
+def parse_increment(text: Optional[str]) -> Increment:
+    """Parse a free-text exposure increment (memoized per distinct string)."""
+    if text is None:
+        return Increment(None, "missing")
+    s = re.sub(r"[\s_]+", " ", str(text)).strip()
+    if _MISSING.match(s):
+        return Increment(None, "missing")
+
+    m = _IQR.match(s)
+    if m:
+        if m.group("value") is None:
+            if _IQR_OTHER_VALUE.match(s[m.end():]):
+                return Increment(None, "unsupported_unit")
+            return Increment(None, "iqr_without_value")
+        return _unit_status(m, _to_float(m.group("value")))
+
+    m = _CONTRAST.match(s)
+    if m:
+        return _unit_status(m, _to_float(m.group("high")) - _to_float(m.group("low")))
+
+    m = _PER_VALUE.match(s)
+    if m:
+        return _unit_status(m, _to_float(m.group("value")))
+
+    m = _PER_UNIT.match(s)
+    if m:
+        return _unit_status(m, 1.0)
+
+    return Increment(None, "unparsed")
+
+
+# ── Vectorized rescaling ─────────────────────────────────────
+
+def rescale_log_effects(
+    effect: np.ndarray,
+    lower: np.ndarray,
+    upper: np.ndarray,
+    increment_ugm3: np.ndarray,
+    target: float = TARGET_INCREMENT_UGM3,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Rescale ratio estimates to a common increment on the log scale.
+
+    Returns (log_effect, log_lower, log_upper); NaN wherever a value or the
+    increment is missing or non-positive.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = target / np.asarray(increment_ugm3, dtype=float)
+        out = []
+        for x in (effect, lower, upper):
+            x = np.asarray(x, dtype=float)
+            out.append(np.where(x > 0, np.log(np.where(x > 0, x, 1.0)), np.nan) * factor)
+    return out[0], out[1], out[2]
+
+
+def normalize_estimates(
+    table: pd.DataFrame,
+    target: float = TARGET_INCREMENT_UGM3,
+) -> pd.DataFrame:
+    """Add normalized columns to a flat estimates table.
+
+    Expects effect_measure, effect_estimate, ci_lower, ci_upper and
+    exposure_increment columns. Adds:
+        increment_ugm3, increment_status,
+        log_effect, log_ci_lower, log_ci_upper   (per ``target`` µg/m³)
+        effect_norm, ci_lower_norm, ci_upper_norm,
+        norm_ok   (ratio measure, parsed increment, finite values)
+    """
+    out = table.copy()
+    increments = out["exposure_increment"].astype(object).where(out["exposure_increment"].notna(), None)
+    parsed = {s: parse_increment(s) for s in pd.unique(increments)}
+    out["increment_ugm3"] = np.array(
+        [parsed[s].value_ugm3 if parsed[s].value_ugm3 is not None else np.nan for s in increments],
+        dtype=float,
+    )
+    out["increment_status"] = [parsed[s].status for s in increments]
+
+    measure = np.array([_measure_key(m) for m in out["effect_measure"]], dtype=object)
+    values = [out[c].to_numpy(dtype=float) for c in ("effect_estimate", "ci_lower", "ci_upper")]
+
+    # Labeling guide: "% change" converts to RR = 1 + %change / 100
+    is_percent = np.isin(measure, PERCENT_MEASURES)
+    values = [np.where(is_percent, 1.0 + v / 100.0, v) for v in values]
+    is_ratio = np.isin(measure, RATIO_MEASURES) | is_percent
+
+    log_effect, log_lower, log_upper = rescale_log_effects(
+        *values, out["increment_ugm3"].to_numpy(), target=target
+    )
+    log_effect = np.where(is_ratio, log_effect, np.nan)
+    log_lower = np.where(is_ratio, log_lower, np.nan)
+    log_upper = np.where(is_ratio, log_upper, np.nan)
+
+    out["log_effect"] = log_effect
+    out["log_ci_lower"] = log_lower
+    out["log_ci_upper"] = log_upper
+    out["effect_norm"] = np.exp(log_effect)
+    out["ci_lower_norm"] = np.exp(log_lower)
+    out["ci_upper_norm"] = np.exp(log_upper)
+    out["norm_ok"] = np.isfinite(log_effect) & np.isfinite(log_lower) & np.isfinite(log_upper)
+    return out
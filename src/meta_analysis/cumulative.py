@@ -0,0 +1,286 @@
+"""
+Cumulative (by publication year) and subgroup meta-analysis.
+
+Cumulative: within every model × run dataset, studies are ordered by the
+corpus publication year (ties by corpus_id) and the pooled DerSimonian-Laird
+effect is reported after each study is added. The fixed-effect sums, Cochran's
+Q and the DL tau² of every prefix come from cumulative sums over the ordered
+studies (Q from sums of w, wy, wy², with y centered per dataset to avoid
+cancellation). The random-effects step re-weights each prefix with its own
+tau², which is done for all prefixes at once on a lower-triangular
+(prefix × study) weight array rather than by n separate meta-analyses.
+
+Subgroups: pooled DL effects per model × run × subgroup value (study country
+and population), from grouped sums (bincount over a combined dataset ×
+subgroup key), plus the between-subgroup Q test per dataset.
+
+Usage:
+    from src.meta_analysis.cumulative import cumulative_meta_analysis, subgroup_meta_analysis
+    cumulative = cumulative_meta_analysis(["claude-sonnet-4-5"])
+
+    python -m src.meta_analysis.cumulative
+"""
+
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from src.analysis.estimates import load_estimates_table
+from src.meta_analysis.dataset import pack_meta_arrays, select_primary_estimates
+from src.meta_analysis.pooling import Z_95
+
+OUTPUT_DIR = "data/raw_outputs"
+CORPUS_PATH = "data/corpus/corpus_500.json"
+TABLES_DIR = "analysis/tables"
+
+SUBGROUP_DIMENSIONS = ("country", "population")
+
+_COUNTRY_ALIASES = {
+    "usa": "United States", "us": "United States", "u.s.": "United States",
+    "u.s.a.": "United States", "united states of america": "United States",
+    "uk": "United Kingdom", "england": "United Kingdom", "scotland": "United Kingdom",
+    "wales": "United Kingdom", "prc": "China", "p.r. china": "China",
+    "republic of korea": "South Korea", "korea": "South Korea",
+}
+
+
+def country_of(location: Optional[str]) -> Optional[str]:
+    """Country from a free-text 'City, Country' location ('Beijing, China' → 'China')."""
+    if not location or not str(location).strip():
+        return None
+    country = str(location).split(",")[-1].strip().rstrip(".")
+    return _COUNTRY_ALIASES.get(country.lower(), country)
+
+
+def load_corpus_years(path: str = CORPUS_PATH) -> dict[str, float]:
+    """corpus_id → publication year (NaN where missing or unparseable)."""
+    with open(path) as f:
+        corpus = json.load(f)["corpus"]
+    years = {}
+    for a in corpus:
+        try:
+            years[a["corpus_id"]] = float(str(a.get("year", ""))[:4])
+        except ValueError:
+            years[a["corpus_id"]] = float("nan")
+    return years
+
+
+def load_studies(
+    model_ids: list[str],
+    output_dir: str = OUTPUT_DIR,
+    corpus_path: str = CORPUS_PATH,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Primary estimates with year, country and population, plus all run keys."""
+    estimates, set_sizes = load_estimates_table(model_ids, output_dir)
+    studies = select_primary_estimates(estimates)
+    years = load_corpus_years(corpus_path)
+    studies["year"] = studies["corpus_id"].map(years).astype(float)
+    studies["country"] = studies["study_location"].map(country_of)
+    keys = set_sizes[["model_id", "run_id"]].drop_duplicates().sort_values(["model_id", "run_id"])
+    return studies, keys.reset_index(drop=True)
+
+
+# ── Cumulative ───────────────────────────────────────────────
+
+def cumulative_pool(y: np.ndarray, v: np.ndarray, mask: np.ndarray) -> dict[str, np.ndarray]:
+    """DL pooled effect after each study, for every row of padded arrays.
+
+    Studies must be left-packed in the order they are added. Returns
+    (rows × width) arrays; entry [i, j] is the meta-analysis of the first
+    j + 1 studies of row i (NaN beyond the row's study count).
+    """
+    mask = np.asarray(mask, dtype=bool)
+    w = np.where(mask, 1.0 / np.where(mask, v, 1.0), 0.0)
+    yc = np.where(mask, y - y[:, :1], 0.0)  # Q is shift-invariant
+
+    k = np.cumsum(mask, axis=1)
+    sw = np.cumsum(w, axis=1)
+    swy = np.cumsum(w * yc, axis=1)
+    swy2 = np.cumsum(w * yc ** 2, axis=1)
+    sw2 = np.cumsum(w ** 2, axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        q = np.maximum(swy2 - swy ** 2 / sw, 0.0)
+        c = sw - sw2 / sw
+        df = k - 1
+        tau2 = np.where(df > 0, np.maximum((q - df) / c, 0.0), 0.0)
+
+        # RE weights of every study i within every prefix j (i <= j)
+        tri = np.tril(np.ones((y.shape[1], y.shape[1]), dtype=bool))
+        w_re = np.where(tri[None] & mask[:, None, :], 1.0 / (v[:, None, :] + tau2[:, :, None]), 0.0)
+        sw_re = w_re.sum(axis=2)
+        mu = (w_re * np.where(mask, y, 0.0)[:, None, :]).sum(axis=2) / sw_re
+        se = np.sqrt(1.0 / sw_re)
+        i2 = np.where(df > 0, tau2 / (tau2 + df / c), np.nan)
+
+    lo = mu - Z_95 * se
+    hi = mu + Z_95 * se
+    valid = mask
+    nan = np.nan
+    return {
+        "k": np.where(valid, k, 0),
+        "tau2": np.where(valid, tau2, nan),
+        "i2": np.where(valid, i2, nan),
+        "q": np.where(valid, q, nan),
+        "pooled_log": np.where(valid, mu, nan),
+        "se": np.where(valid, se, nan),
+        "pooled_rr": np.where(valid, np.exp(mu), nan),
+        "ci_lower": np.where(valid, np.exp(lo), nan),
+        "ci_upper": np.where(valid, np.exp(hi), nan),
+        "ci_crosses_null": valid & (lo <= 0) & (hi >= 0),
+    }
+
+
+def cumulative_meta_analysis(
+    model_ids: list[str],
+    output_dir: str = OUTPUT_DIR,
+    corpus_path: str = CORPUS_PATH,
+) -> pd.DataFrame:
+    """Cumulative-by-year DL meta-analysis for every model × run dataset.
+
+    One row per dataset × step; ``step`` is the number of studies pooled and
+    ``corpus_id`` / ``year`` identify the study added at that step.
+    """
+    studies, keys = load_studies(model_ids, output_dir, corpus_path)
+    studies = studies.sort_values(["model_id", "run_id", "year", "corpus_id"], na_position="last")
+    data = pack_meta_arrays(studies, keys)
+    result = cumulative_pool(data["y"], data["v"], data["mask"])
+
+    row, col = np.nonzero(data["mask"])
+    years = dict(zip(data["studies"]["corpus_id"], data["studies"]["year"]))
+    table = data["keys"].iloc[row].reset_index(drop=True)
+    table["step"] = col + 1
+    table["corpus_id"] = data["corpus_ids"][row, col]
+    table["year"] = table["corpus_id"].map(years)
+    for name, values in result.items():
+        table[name] = values[row, col]
+    return table
+
+
+# ── Subgroups ────────────────────────────────────────────────
+
+def subgroup_pool(
+    y: np.ndarray, v: np.ndarray, dataset: np.ndarray, subgroup: np.ndarray,
+    n_datasets: int, n_subgroups: int,
+) -> dict[str, np.ndarray]:
+    """DL pooled effect per (dataset, subgroup) cell from grouped sums.
+
+    Args:
+        y, v: flat study effects and variances
+        dataset, subgroup: int codes per study
+
+    Returns (n_datasets × n_subgroups) arrays plus per-dataset between-subgroup
+    Q, df and p-value (random-effects subgroup means, separate tau² per cell).
+    """
+    cell = dataset * n_subgroups + subgroup
+    n_cells = n_datasets * n_subgroups
+
+    def sums(weights):
+        return np.bincount(cell, weights=weights, minlength=n_cells)
+
+    # Center y per cell on one of its studies so Q is computed without cancellation
+    anchor = np.zeros(n_cells)
+    anchor[cell] = y
+    yc = y - anchor[cell]
+
+    w = 1.0 / v
+    k = np.bincount(cell, minlength=n_cells)
+    sw, swy, swy2, sw2 = sums(w), sums(w * yc), sums(w * yc ** 2), sums(w ** 2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        q = np.maximum(swy2 - swy ** 2 / sw, 0.0)
+        df = k - 1
+        c = sw - sw2 / sw
+        tau2 = np.where(df > 0, np.maximum((q - df) / c, 0.0), 0.0)
+        w_re = 1.0 / (v + tau2[cell])
+        sw_re = sums(w_re)
+        mu = sums(w_re * y) / sw_re
+        se = np.sqrt(1.0 / sw_re)
+        i2 = np.where(df > 0, tau2 / (tau2 + df / c), np.nan)
+
+        # Between-subgroup heterogeneity over the cells of each dataset
+        present = k > 0
+        wg = np.where(present, sw_re, 0.0).reshape(n_datasets, n_subgroups)
+        mg = np.where(present, mu, 0.0).reshape(n_datasets, n_subgroups)
+        overall = (wg * mg).sum(axis=1) / wg.sum(axis=1)
+        q_between = (wg * (mg - overall[:, None]) ** 2).sum(axis=1)
+        df_between = present.reshape(n_datasets, n_subgroups).sum(axis=1) - 1
+
+    shape = (n_datasets, n_subgroups)
+    lo, hi = mu - Z_95 * se, mu + Z_95 * se
+    return {
+        "k": k.reshape(shape),
+        "tau2": np.where(present, tau2, np.nan).reshape(shape),
+        "i2": i2.reshape(shape),
+        "q": np.where(present, q, np.nan).reshape(shape),
+        "pooled_log": mu.reshape(shape),
+        "se": se.reshape(shape),
+        "pooled_rr": np.exp(mu).reshape(shape),
+        "ci_lower": np.exp(lo).reshape(shape),
+        "ci_upper": np.exp(hi).reshape(shape),
+        "ci_crosses_null": ((lo <= 0) & (hi >= 0)).reshape(shape),
+        "q_between": q_between,
+        "df_between": df_between,
+        "p_between": np.where(df_between > 0,
+                              stats.chi2.sf(q_between, np.maximum(df_between, 1)), np.nan),
+    }
+
+
+def subgroup_meta_analysis(
+    model_ids: list[str],
+    output_dir: str = OUTPUT_DIR,
+    corpus_path: str = CORPUS_PATH,
+    dimensions: tuple[str, ...] = SUBGROUP_DIMENSIONS,
+) -> pd.DataFrame:
+    """Subgroup DL meta-analyses for every model × run dataset and dimension.
+
+    Studies with no value for a dimension form the subgroup "unknown".
+    """
+    studies, keys = load_studies(model_ids, output_dir, corpus_path)
+    index = pd.MultiIndex.from_frame(keys)
+    dataset = index.get_indexer(pd.MultiIndex.from_frame(studies[["model_id", "run_id"]]))
+    y = studies["yi"].to_numpy(dtype=float)
+    v = studies["vi"].to_numpy(dtype=float)
+
+    frames = []
+    for dimension in dimensions:
+        values = studies[dimension].fillna("unknown").astype(str)
+        codes, labels = pd.factorize(values, sort=True)
+        result = subgroup_pool(y, v, dataset, codes, len(keys), len(labels))
+
+        d, g = np.nonzero(result["k"] > 0)
+        frame = keys.iloc[d].reset_index(drop=True)
+        frame["dimension"] = dimension
+        frame["subgroup"] = np.asarray(labels)[g]
+        for name, arr in result.items():
+            frame[name] = arr[d, g] if arr.ndim == 2 else arr[d]
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cumulative and subgroup meta-analysis")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--tables-dir", default=TABLES_DIR)
+    args = parser.parse_args()
+
+    models = sorted(p.name for p in Path(args.output_dir).iterdir()
+                    if (p / "extraction").is_dir())
+    tables_dir = Path(args.tables_dir)
+    tables_dir.mkdir(parents=True, exist_ok=True)
+
+    cumulative = cumulative_meta_analysis(models, args.output_dir, args.corpus)
+    cumulative.to_csv(tables_dir / "meta_cumulative.csv", index=False)
+    subgroups = subgroup_meta_analysis(models, args.output_dir, args.corpus)
+    subgroups.to_csv(tables_dir / "meta_subgroups.csv", index=False)
+
+    final = cumulative.sort_values("step").groupby(["model_id", "run_id"]).tail(1)
+    print(final.groupby("model_id")[["k", "pooled_rr", "i2"]].mean().round(4).to_string())
+    print(f"\n{len(cumulative)} cumulative rows → {tables_dir / 'meta_cumulative.csv'}")
+    print(f"{len(subgroups)} subgroup rows → {tables_dir / 'meta_subgroups.csv'}")
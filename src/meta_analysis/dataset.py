@@ -0,0 +1,112 @@
+"""
+Meta-analysis datasets — one primary estimate per study per model × run.
+
+Starts from the normalized flat estimates table (src.analysis.estimates) and,
+for every model × run × abstract, picks the estimate that enters pooling using
+the labeling guide's preference rules:
+
+  1. usable normalization (ratio measure, increment in µg/m³, finite CI)
+  2. all-respiratory outcome over specific conditions
+  3. lag 0-1 over other lags
+  4. otherwise the first estimate the model reported (the primary one)
+
+The selected studies are then packed into padded (meta-analysis × study)
+arrays of log RR per 10 µg/m³ and its variance from the 95% CI, the input
+format of src.meta_analysis.pooling.
+
+Usage:
+    from src.meta_analysis.dataset import build_meta_dataset
+    data = build_meta_dataset(["claude-sonnet-4-5", "llama3-8b"])
+    data["y"], data["v"], data["mask"]
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.estimates import load_estimates_table
+from src.analysis.extraction_eval import normalize_label, normalize_lag
+from src.meta_analysis.pooling import Z_95
+
+OUTPUT_DIR = "data/raw_outputs"
+
+PREFERRED_OUTCOME = "all_respiratory"
+PREFERRED_LAG = "0-1"
+
+
+def select_primary_estimates(estimates: pd.DataFrame) -> pd.DataFrame:
+    """One row per model × run × abstract: the estimate that enters pooling."""
+    usable = estimates[estimates["norm_ok"]].reset_index(drop=True)
+    if usable.empty:
+        return usable.assign(yi=pd.Series(dtype=float), vi=pd.Series(dtype=float))
+
+    codes, _ = pd.MultiIndex.from_frame(usable[["model_id", "run_id", "corpus_id"]]).factorize()
+    outcome_rank = np.array([normalize_label(o) != PREFERRED_OUTCOME for o in usable["outcome_specific"]])
+    lag_rank = np.array([normalize_lag(lag) != PREFERRED_LAG for lag in usable["lag"]])
+    order = np.lexsort((np.arange(len(usable)), lag_rank, outcome_rank, codes))
+    first = order[np.r_[True, codes[order][1:] != codes[order][:-1]]]
+
+    primary = usable.iloc[np.sort(first)].reset_index(drop=True)
+    se = (primary["log_ci_upper"] - primary["log_ci_lower"]) / (2 * Z_95)
+    primary["yi"] = primary["log_effect"]
+    primary["vi"] = se ** 2
+    return primary[primary["vi"] > 0].reset_index(drop=True)
+
+
+def pack_meta_arrays(studies: pd.DataFrame, keys: pd.DataFrame) -> dict:
+    """Pack selected studies into padded arrays, one row per entry of ``keys``.
+
+    Args:
+        studies: output of select_primary_estimates
+        keys: DataFrame of (model_id, run_id) meta-analyses, in output order
+
+    Returns:
+        dict with keys (the DataFrame), y, v, mask, corpus_ids (object array,
+        None where padded) and studies
+    """
+    keys = keys.reset_index(drop=True)
+    index = pd.MultiIndex.from_frame(keys[["model_id", "run_id"]])
+    row = index.get_indexer(pd.MultiIndex.from_frame(studies[["model_id", "run_id"]]))
+    keep = row >= 0
+    studies = studies[keep].reset_index(drop=True)
+    row = row[keep]
+
+    # Column = position of the study within its meta-analysis
+    order = np.argsort(row, kind="stable")
+    starts = np.r_[0, np.cumsum(np.bincount(row, minlength=len(keys)))[:-1]]
+    col = np.empty(len(row), dtype=int)
+    col[order] = np.arange(len(row)) - starts[row[order]]
+
+    width = int(col.max()) + 1 if len(col) else 0
+    y = np.zeros((len(keys), width))
+    v = np.ones((len(keys), width))
+    mask = np.zeros((len(keys), width), dtype=bool)
+    corpus_ids = np.full((len(keys), width), None, dtype=object)
+    y[row, col] = studies["yi"].to_numpy()
+    v[row, col] = studies["vi"].to_numpy()
+    mask[row, col] = True
+    corpus_ids[row, col] = studies["corpus_id"].to_numpy()
+    return {"keys": keys, "y": y, "v": v, "mask": mask, "corpus_ids": corpus_ids, "studies": studies}
+
+
+def build_meta_dataset(
+    model_ids: list[str],
+    output_dir: str = OUTPUT_DIR,
+    corpus_ids: Optional[list[str]] = None,
+) -> dict:
+    """Padded meta-analysis arrays for every model × run extraction.
+
+    Runs that yielded no usable study still get a (k = 0) row, so the number
+    of studies entering each meta-analysis can be compared across runs.
+
+    Args:
+        model_ids: models to include
+        output_dir: raw outputs directory
+        corpus_ids: restrict pooling to these abstracts (e.g. screened includes)
+    """
+    estimates, set_sizes = load_estimates_table(model_ids, output_dir)
+    if corpus_ids is not None:
+        estimates = estimates[estimates["corpus_id"].isin(corpus_ids)]
+    keys = set_sizes[["model_id", "run_id"]].drop_duplicates().sort_values(["model_id", "run_id"])
+    return pack_meta_arrays(select_primary_estimates(estimates), keys)
@@ -0,0 +1,247 @@
+"""
+Random-effects pooling, vectorized across many meta-analyses.
+
+Every function works on padded 2-D arrays: row i is one meta-analysis, column j
+one study slot, and ``mask[i, j]`` marks slots holding a study. Effects are on
+the log scale (log RR) with within-study variances ``v``.
+
+Between-study variance estimators:
+  DL    DerSimonian-Laird (closed form; the protocol's primary estimator)
+  REML  restricted maximum likelihood (safeguarded Newton)
+  PM    Paule-Mandel (Newton iteration on the generalized Q equation)
+
+The iterative estimators update every meta-analysis at once and stop each row
+individually through a per-row convergence mask; rows that hit MAX_ITER are
+reported with converged=False. The Hartung-Knapp adjustment replaces the
+normal-theory CI with a t-based one using the weighted residual variance.
+
+Usage:
+    from src.meta_analysis.pooling import pool
+    result = pool(y, v, mask, estimator="REML", hartung_knapp=True)
+"""
+
+import numpy as np
+from scipy import stats
+
+ESTIMATORS = ("DL", "REML", "PM")
+MAX_ITER = 100
+TOL = 1e-10
+STEP_HALVINGS = 20
+Z_95 = stats.norm.ppf(0.975)
+
+
+def _prepare(y: np.ndarray, v: np.ndarray, mask: np.ndarray):
+    mask = np.asarray(mask, dtype=bool) & np.isfinite(y) & np.isfinite(v) & (v > 0)
+    y = np.where(mask, y, 0.0)
+    v = np.where(mask, v, 1.0)
+    return y, v, mask
+
+
+def _weighted(y: np.ndarray, v: np.ndarray, mask: np.ndarray, tau2: np.ndarray):
+    """Weights, weighted mean and residuals for given tau² (one per row)."""
+    w = np.where(mask, 1.0 / (v + tau2[:, None]), 0.0)
+    sw = w.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mu = (w * y).sum(axis=1) / sw
+    r = np.where(mask, y - mu[:, None], 0.0)
+    return w, sw, mu, r
+
+
+# ── Heterogeneity estimators ─────────────────────────────────
+
+def fixed_effect(y: np.ndarray, v: np.ndarray, mask: np.ndarray) -> dict[str, np.ndarray]:
+    """Inverse-variance fixed effect, Cochran's Q and the DL scaling constant C."""
+    y, v, mask = _prepare(y, v, mask)
+    k = mask.sum(axis=1)
+    w, sw, mu, r = _weighted(y, v, mask, np.zeros(len(y)))
+    q = (w * r ** 2).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        c = sw - (w ** 2).sum(axis=1) / sw
+        se = np.sqrt(1.0 / sw)
+    return {"k": k, "mu": mu, "se": se, "q": q, "c": c}
+
+
+def tau2_dl(y: np.ndarray, v: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """DerSimonian-Laird tau² (0 for k < 2)."""
+    fe = fixed_effect(y, v, mask)
+    df = fe["k"] - 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        tau2 = (fe["q"] - df) / fe["c"]
+    return np.where((df > 0) & np.isfinite(tau2), np.maximum(tau2, 0.0), 0.0)
+
+
+def _reml_loglik(y: np.ndarray, v: np.ndarray, mask: np.ndarray, tau2: np.ndarray) -> np.ndarray:
+    """Restricted log-likelihood (up to a constant) per row."""
+    w, sw, _, r = _weighted(y, v, mask, tau2)
+    log_var = np.where(mask, np.log(v + tau2[:, None]), 0.0)
+    return -0.5 * (log_var.sum(axis=1) + np.log(sw) + (w * r ** 2).sum(axis=1))
+
+
+def tau2_reml(
+    y: np.ndarray, v: np.ndarray, mask: np.ndarray,
+    max_iter: int = MAX_ITER, tol: float = TOL,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """REML tau² by Newton / Fisher-scoring steps with step halving, from DL.
+
+    Returns (tau2, converged, iterations).
+    """
+    y, v, mask = _prepare(y, v, mask)
+    k = mask.sum(axis=1)
+    tau2 = tau2_dl(y, v, mask)
+    active = k > 1
+    converged = ~active
+    iterations = np.zeros(len(y), dtype=int)
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        w, sw, _, r = _weighted(y[active], v[active], mask[active], tau2[active])
+        sw2 = (w ** 2).sum(axis=1)
+        # Derivatives of the restricted likelihood (×2) via P = W - W11'W / sum(w):
+        # score = y'P²y - tr(P), Fisher info = tr(P²), observed = 2 y'P³y - tr(P²)
+        tr_p = sw - sw2 / sw
+        tr_p2 = sw2 - 2 * (w ** 3).sum(axis=1) / sw + (sw2 / sw) ** 2
+        score = (w ** 2 * r ** 2).sum(axis=1) - tr_p
+        yp3y = (w ** 3 * r ** 2).sum(axis=1) - (w ** 2 * r).sum(axis=1) ** 2 / sw
+        observed = 2 * yp3y - tr_p2
+        # Newton where the likelihood is locally concave, Fisher scoring elsewhere
+        step = score / np.where(observed > 0, observed, tr_p2)
+
+        # Step halving wherever the full step lowers the restricted likelihood
+        current = _reml_loglik(y[active], v[active], mask[active], tau2[active])
+        for _ in range(STEP_HALVINGS):
+            new = np.maximum(tau2[active] + step, 0.0)
+            worse = _reml_loglik(y[active], v[active], mask[active], new) < current - 1e-12
+            if not worse.any():
+                break
+            step = np.where(worse, step / 2, step)
+        done = np.abs(new - tau2[active]) <= tol * np.maximum(1.0, new)
+
+        idx = np.flatnonzero(active)
+        tau2[idx] = new
+        iterations[idx] += 1
+        converged[idx[done]] = True
+        active[idx[done]] = False
+    return tau2, converged, iterations
+
+
+def tau2_pm(
+    y: np.ndarray, v: np.ndarray, mask: np.ndarray,
+    max_iter: int = MAX_ITER, tol: float = TOL,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Paule-Mandel tau²: root of Q(tau²) = k - 1, by Newton steps from 0.
+
+    Q(tau²) is decreasing and convex, so Newton from the left approaches the
+    root monotonically. Rows with Q(0) <= k - 1 keep tau² = 0.
+
+    Returns (tau2, converged, iterations).
+    """
+    y, v, mask = _prepare(y, v, mask)
+    k = mask.sum(axis=1)
+    df = k - 1
+    tau2 = np.zeros(len(y))
+    fe = fixed_effect(y, v, mask)
+    active = (df > 0) & (fe["q"] > df)
+    converged = ~active
+    iterations = np.zeros(len(y), dtype=int)
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        w, _, _, r = _weighted(y[active], v[active], mask[active], tau2[active])
+        f = (w * r ** 2).sum(axis=1) - df[active]
+        slope = -(w ** 2 * r ** 2).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            new = np.maximum(tau2[active] - f / slope, 0.0)
+        new = np.where(np.isfinite(new), new, tau2[active])
+        done = np.abs(new - tau2[active]) <= tol * np.maximum(1.0, new)
+
+        idx = np.flatnonzero(active)
+        tau2[idx] = new
+        iterations[idx] += 1
+        converged[idx[done]] = True
+        active[idx[done]] = False
+    return tau2, converged, iterations
+
+
+# ── Pooling ──────────────────────────────────────────────────
+
+def pool(
+    y: np.ndarray,
+    v: np.ndarray,
+    mask: np.ndarray,
+    estimator: str = "DL",
+    hartung_knapp: bool = False,
+) -> dict[str, np.ndarray]:
+    """Random-effects pooled estimate for every row.
+
+    Returns arrays (one value per meta-analysis): k, tau2, i2, q, q_pvalue,
+    pooled_log, se, ci_lower_log, ci_upper_log, pooled_rr, ci_lower, ci_upper,
+    ci_crosses_null, converged, iterations. Rows with k = 0 are NaN, with
+    ci_crosses_null and converged False.
+    """
+    if estimator not in ESTIMATORS:
+        raise ValueError(f"Unknown estimator: {estimator} (expected one of {ESTIMATORS})")
+    y, v, mask = _prepare(np.asarray(y, dtype=float), np.asarray(v, dtype=float), mask)
+    fe = fixed_effect(y, v, mask)
+    k = fe["k"]
+    df = k - 1
+
+    if estimator == "DL":
+        tau2 = tau2_dl(y, v, mask)
+        converged = np.ones(len(y), dtype=bool)
+        iterations = np.zeros(len(y), dtype=int)
+    elif estimator == "REML":
+        tau2, converged, iterations = tau2_reml(y, v, mask)
+    else:
+        tau2, converged, iterations = tau2_pm(y, v, mask)
+
+    w, sw, mu, r = _weighted(y, v, mask, tau2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if hartung_knapp:
+            se = np.sqrt((w * r ** 2).sum(axis=1) / (df * sw))
+            crit = stats.t.ppf(0.975, np.where(df > 0, df, np.nan))
+        else:
+            se = np.sqrt(1.0 / sw)
+            crit = np.full(len(y), Z_95)
+        # Higgins & Thompson I² with the typical within-study variance (k-1)/C
+        typical = df / fe["c"]
+        i2 = np.where(df > 0, tau2 / (tau2 + typical), np.nan)
+
+    lo = mu - crit * se
+    hi = mu + crit * se
+    empty = k == 0
+    tau2 = np.where(empty, np.nan, tau2)
+    se = np.where(empty, np.nan, se)
+    converged = converged & ~empty
+    return {
+        "k": k,
+        "tau2": tau2,
+        "i2": i2,
+        "q": np.where(empty, np.nan, fe["q"]),
+        "q_pvalue": np.where(df > 0, stats.chi2.sf(fe["q"], np.maximum(df, 1)), np.nan),
+        "pooled_log": mu,
+        "se": se,
+        "ci_lower_log": lo,
+        "ci_upper_log": hi,
+        "pooled_rr": np.exp(mu),
+        "ci_lower": np.exp(lo),
+        "ci_upper": np.exp(hi),
+        "ci_crosses_null": (lo <= 0) & (hi >= 0),
+        "converged": converged,
+        "iterations": iterations,
+    }
+
+
+def leave_one_out(
+    y: np.ndarray, v: np.ndarray, mask: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Expand each meta-analysis into its leave-one-study-out variants.
+
+    Returns (y, v, mask, parent_row, omitted_slot) with one row per
+    (meta-analysis, present study), ready to pass to ``pool``.
+    """
+    parent, omitted = np.nonzero(np.asarray(mask, dtype=bool))
+    loo_mask = np.asarray(mask, dtype=bool)[parent].copy()
+    loo_mask[np.arange(len(parent)), omitted] = False
+    return y[parent], v[parent], loo_mask, parent, omitted
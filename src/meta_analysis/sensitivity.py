@@ -0,0 +1,99 @@
+"""
+Meta-analysis sensitivity grid (RQ3).
+
+The protocol's primary analysis is DerSimonian-Laird random effects
+(configs/experiment.yaml). This runner evaluates every model × run
+meta-analysis under each heterogeneity estimator (DL, REML, Paule-Mandel),
+with and without the Hartung-Knapp adjustment, and optionally every
+leave-one-study-out variant. Each configuration is one vectorized ``pool``
+call over all meta-analyses, so the grid costs a handful of array passes.
+
+Output is a single tidy table: one row per model × run × estimator ×
+adjustment × omitted study (omitted_corpus_id is empty for the full analysis).
+
+Usage:
+    from src.meta_analysis.sensitivity import run_sensitivity_grid
+    grid = run_sensitivity_grid(["claude-sonnet-4-5", "llama3-8b"])
+
+    python -m src.meta_analysis.sensitivity [--no-loo]
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.meta_analysis.dataset import build_meta_dataset
+from src.meta_analysis.pooling import ESTIMATORS, leave_one_out, pool
+
+OUTPUT_DIR = "data/raw_outputs"
+TABLES_DIR = "analysis/tables"
+
+
+def sensitivity_grid(
+    data: dict,
+    estimators: tuple[str, ...] = ESTIMATORS,
+    hartung_knapp: tuple[bool, ...] = (False, True),
+    loo: bool = True,
+) -> pd.DataFrame:
+    """Evaluate the estimator × adjustment (× leave-one-out) grid on packed arrays."""
+    keys, y, v, mask = data["keys"], data["y"], data["v"], data["mask"]
+    variants = [(keys, y, v, mask, np.full(len(keys), None, dtype=object))]
+    if loo and mask.any():
+        ly, lv, lmask, parent, omitted = leave_one_out(y, v, mask)
+        variants.append((
+            keys.iloc[parent].reset_index(drop=True), ly, lv, lmask,
+            data["corpus_ids"][parent, omitted],
+        ))
+
+    frames = []
+    for estimator in estimators:
+        for hk in hartung_knapp:
+            for vkeys, vy, vv, vmask, omitted in variants:
+                frame = vkeys.copy()
+                frame["estimator"] = estimator
+                frame["hartung_knapp"] = hk
+                frame["omitted_corpus_id"] = omitted
+                for name, values in pool(vy, vv, vmask, estimator, hk).items():
+                    frame[name] = values
+                frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def run_sensitivity_grid(
+    model_ids: list[str],
+    output_dir: str = OUTPUT_DIR,
+    loo: bool = True,
+) -> pd.DataFrame:
+    """Sensitivity grid for every model × run meta-analysis."""
+    return sensitivity_grid(build_meta_dataset(model_ids, output_dir), loo=loo)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Meta-analysis estimator sensitivity grid")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--tables-dir", default=TABLES_DIR)
+    parser.add_argument("--no-loo", action="store_true", help="Skip leave-one-study-out variants")
+    args = parser.parse_args()
+
+    models = sorted(p.name for p in Path(args.output_dir).iterdir()
+                    if (p / "extraction").is_dir())
+    grid = run_sensitivity_grid(models, output_dir=args.output_dir, loo=not args.no_loo)
+
+    out = Path(args.tables_dir) / "meta_sensitivity.csv"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    grid.to_csv(out, index=False)
+
+    full = grid[grid["omitted_corpus_id"].isna()]
+    summary = full.groupby(["model_id", "estimator", "hartung_knapp"]).agg(
+        runs=("run_id", "size"),
+        mean_k=("k", "mean"),
+        sd_pooled_log=("pooled_log", "std"),
+        ci_crosses_null_rate=("ci_crosses_null", "mean"),
+        # Empty meta-analyses (k = 0) report converged False; they did not fail to converge
+        not_converged=("converged", lambda s: int((~s & (full.loc[s.index, "k"] > 0)).sum())),
+    )
+    print(summary.round(4).to_string())
+    print(f"\n{len(grid)} rows saved to {out}")
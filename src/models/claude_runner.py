@@ -11,6 +11,8 @@ import time
 import urllib.request
 from typing import Optional
 
+from src.utils import tracing
+
 API_URL = "https://api.anthropic.com/v1/messages"
 DEFAULT_MODEL = "claude-sonnet-4-5-20250929"
 API_VERSION = "2023-06-01"
@@ -55,8 +57,9 @@ def run_inference(
     )
 
     t0 = time.time()
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        result = json.loads(resp.read().decode())
+    with tracing.span("http.request", provider="anthropic", api_model=model):
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            result = json.loads(resp.read().decode())
     duration_ms = (time.time() - t0) * 1000
 
     # Extract text from content blocks
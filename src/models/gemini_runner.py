@@ -14,6 +14,8 @@ import time
 import urllib.request
 from typing import Optional
 
+from src.utils import tracing
+
 API_BASE = "https://generativelanguage.googleapis.com/v1beta/models"
 DEFAULT_MODEL = "gemini-2.5-pro"
 
@@ -57,8 +59,9 @@ def run_inference(
     )
 
     t0 = time.time()
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        result = json.loads(resp.read().decode())
+    with tracing.span("http.request", provider="google", api_model=model):
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            result = json.loads(resp.read().decode())
     duration_ms = (time.time() - t0) * 1000
 
     # Extract text from candidates
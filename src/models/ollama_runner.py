@@ -11,6 +11,8 @@ import urllib.request
 import urllib.parse
 from typing import Optional
 
+from src.utils import tracing
+
 
 DEFAULT_ENDPOINT = "http://localhost:11434"
 DEFAULT_MODEL = "llama3:8b"
@@ -53,8 +55,9 @@ def run_inference(
     )
 
     t0 = time.time()
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        result = json.loads(resp.read().decode())
+    with tracing.span("http.request", provider="ollama", api_model=model):
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            result = json.loads(resp.read().decode())
     duration_ms = (time.time() - t0) * 1000
 
     return {
@@ -63,6 +66,11 @@ def run_inference(
         "provider": "ollama",
         "inference_duration_ms": round(duration_ms, 1),
         "model_duration_ns": result.get("total_duration"),
+        # Model load + prompt evaluation is the server-side time to first token
+        "ttft_ms": (
+            round(((result.get("load_duration") or 0) + result["prompt_eval_duration"]) / 1e6, 1)
+            if result.get("prompt_eval_duration") is not None else None
+        ),
         "prompt_eval_count": result.get("prompt_eval_count"),
         "eval_count": result.get("eval_count"),
         "done_reason": result.get("done_reason"),
@@ -8,9 +8,37 @@ adapted for evidence synthesis pipelines.
 import hashlib
 import json
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Optional
 
+from src.provenance.merkle import write_tree
+from src.provenance.sketch import QuantileSketch
+
+CALL_HASH_SCHEME = 2
+
+
+def template_digest(prompt: str) -> str:
+    """SHA-256 of a prompt template, identifying the prompt version a call used."""
+    return _template_digest(prompt).hex()
+
+
+@lru_cache(maxsize=64)
+def _template_digest(prompt: str) -> bytes:
+    return hashlib.sha256(prompt.encode()).digest()
+
+
+@lru_cache(maxsize=64, typed=True)  # typed: 0 and 0.0 serialize differently
+def _settings_digest(prompt: str, model_id: str, temperature: float, seed: Optional[int]) -> bytes:
+    # Per-run half of a v2 call hash; computed once per template and settings
+    fields = {
+        "template": _template_digest(prompt).hex(),
+        "model_id": model_id,
+        "temperature": temperature,
+        "seed": seed,
+    }
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).digest()
+
 
 def compute_call_hash(
     prompt: str,
@@ -18,17 +46,29 @@ def compute_call_hash(
     model_id: str,
     temperature: float,
     seed: Optional[int] = None,
+    scheme: int = CALL_HASH_SCHEME,
 ) -> str:
-    """Compute SHA-256 hash of a single LLM call's inputs."""
-    fields = {
-        "prompt": prompt,
-        "input_text": input_text,
-        "model_id": model_id,
-        "temperature": temperature,
-        "seed": seed,
-    }
-    canonical = json.dumps(fields, sort_keys=True, ensure_ascii=True)
-    return hashlib.sha256(canonical.encode()).hexdigest()
+    """Compute SHA-256 hash of a single LLM call's inputs.
+
+    Scheme 2 combines a digest of the template and settings (memoized, so it
+    is computed once per run) with a digest of the call's input text.
+    Scheme 1 hashes the canonical JSON of all fields and is kept so runs
+    recorded under it can still be verified.
+    """
+    if scheme == 1:
+        fields = {
+            "prompt": prompt,
+            "input_text": input_text,
+            "model_id": model_id,
+            "temperature": temperature,
+            "seed": seed,
+        }
+        canonical = json.dumps(fields, sort_keys=True, ensure_ascii=True)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+    if scheme != 2:
+        raise ValueError(f"Unknown call hash scheme: {scheme}")
+    settings = _settings_digest(prompt, model_id, temperature, seed)
+    return hashlib.sha256(b"v2" + settings + hashlib.sha256(input_text.encode()).digest()).hexdigest()
 
 
 def compute_output_hash(output_text: str) -> str:
@@ -45,6 +85,8 @@ def create_call_record(
     stage: str,
     run_id: int,
     inference_result: dict,
+    template_digest: Optional[str] = None,
+    call_hash_scheme: int = CALL_HASH_SCHEME,
 ) -> dict:
     """Create a provenance record for a single LLM call."""
     return {
@@ -54,9 +96,15 @@ def create_call_record(
         "model_id": model_id,
         "provider": provider,
         "call_hash": call_hash,
+        "call_hash_scheme": call_hash_scheme,
+        "template_digest": template_digest,
         "output_hash": output_hash,
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "inference_duration_ms": inference_result.get("inference_duration_ms"),
+        "ttft_ms": inference_result.get("ttft_ms"),
+        "attempts": inference_result.get("attempts"),
+        "throttle_wait_ms": inference_result.get("throttle_wait_ms"),
+        "backoff_wait_ms": inference_result.get("backoff_wait_ms"),
         "input_tokens": inference_result.get("input_tokens") or inference_result.get("prompt_eval_count"),
         "output_tokens": inference_result.get("output_tokens") or inference_result.get("eval_count"),
         "stop_reason": (
@@ -67,6 +115,61 @@ def create_call_record(
     }
 
 
+def _timing_summary(latency: QuantileSketch, ttft: QuantileSketch, totals: dict) -> dict:
+    seconds = totals["timed_ms"] / 1000
+    return {
+        "latency_ms": latency.summary(),
+        "ttft_ms": ttft.summary() if ttft.count else None,
+        "input_tokens_per_sec": round(totals["input_tokens"] / seconds, 1) if seconds else None,
+        "output_tokens_per_sec": round(totals["output_tokens"] / seconds, 1) if seconds else None,
+        "retries": totals["retries"],
+        "throttle_wait_ms": round(totals["throttle_wait_ms"], 1),
+        "backoff_wait_ms": round(totals["backoff_wait_ms"], 1),
+        "totals": totals,
+        "sketches": {"latency_ms": latency.to_dict(), "ttft_ms": ttft.to_dict()},
+    }
+
+
+def timing_stats(call_records: list[dict]) -> dict:
+    """Tail latency, time to first token, token throughput and retry/wait totals.
+
+    throttle_wait_ms sums rate-limit waits (429 backoff and call_delay);
+    backoff_wait_ms sums the sleeps before retrying errors and unparseable output.
+
+    Percentiles come from mergeable sketches stored alongside the summary, so
+    merge_timing can combine runs without their call records.
+    """
+    latency = QuantileSketch().update(r.get("inference_duration_ms") for r in call_records)
+    ttft = QuantileSketch().update(r.get("ttft_ms") for r in call_records)
+    totals = {"input_tokens": 0, "output_tokens": 0, "timed_ms": 0.0, "retries": 0,
+              "throttle_wait_ms": 0.0, "backoff_wait_ms": 0.0}
+    for r in call_records:
+        # Throughput only over calls that report both tokens and a duration
+        if r.get("inference_duration_ms") and r.get("input_tokens") is not None and r.get("output_tokens") is not None:
+            totals["input_tokens"] += r["input_tokens"]
+            totals["output_tokens"] += r["output_tokens"]
+            totals["timed_ms"] += r["inference_duration_ms"]
+        totals["retries"] += max((r.get("attempts") or 1) - 1, 0)
+        totals["throttle_wait_ms"] += r.get("throttle_wait_ms") or 0.0
+        totals["backoff_wait_ms"] += r.get("backoff_wait_ms") or 0.0
+    totals["timed_ms"] = round(totals["timed_ms"], 1)
+    return _timing_summary(latency, ttft, totals)
+
+
+def merge_timing(timings: list[dict]) -> dict:
+    """Combine timing_stats of several runs as if computed over all their calls."""
+    latency, ttft = QuantileSketch(), QuantileSketch()
+    totals = {"input_tokens": 0, "output_tokens": 0, "timed_ms": 0.0, "retries": 0,
+              "throttle_wait_ms": 0.0, "backoff_wait_ms": 0.0}
+    for t in timings:
+        latency.merge(QuantileSketch.from_dict(t["sketches"]["latency_ms"]))
+        ttft.merge(QuantileSketch.from_dict(t["sketches"]["ttft_ms"]))
+        for key in totals:
+            # Run cards from before backoff_wait_ms was split out lack it
+            totals[key] += t["totals"].get(key, 0)
+    return _timing_summary(latency, ttft, totals)
+
+
 def create_run_card(
     run_id: int,
     model_id: str,
@@ -88,6 +191,10 @@ def create_run_card(
         "|".join(all_output_hashes).encode()
     ).hexdigest()
 
+    templates = sorted({r["template_digest"] for r in call_records if r.get("template_digest")})
+    # A topped-up run can mix schemes; records without the field predate scheme 2
+    schemes = sorted({r.get("call_hash_scheme", 1) for r in call_records})
+
     durations = [r["inference_duration_ms"] for r in call_records if r["inference_duration_ms"]]
     total_duration = sum(durations) if durations else 0
 
@@ -111,10 +218,13 @@ def create_run_card(
             "failed_calls": failed_calls,
             "total_duration_ms": round(total_duration, 1),
             "mean_duration_ms": round(total_duration / len(durations), 1) if durations else 0,
+            "timing": timing_stats(call_records),
         },
         "provenance": {
             "aggregate_output_hash": aggregate_hash,
             "hash_algorithm": "sha256",
+            "call_hash_schemes": schemes,
+            "template_digests": templates,
         },
     }
 
@@ -128,10 +238,17 @@ def save_run_outputs(
     call_records: list[dict],
     run_card: dict,
 ):
-    """Save all outputs for a single run to disk."""
+    """Save all outputs for a single run to disk.
+
+    Also writes the run's Merkle tree (merkle_tree.bin) and records its root
+    in the run card's provenance block.
+    """
     base = Path(output_dir) / model_id / stage / f"run_{run_id:03d}"
     base.mkdir(parents=True, exist_ok=True)
 
+    # Save Merkle tree over call records (see src.provenance.merkle)
+    run_card.setdefault("provenance", {})["merkle_root"] = write_tree(str(base), call_records)
+
     # Save results
     with open(base / "results.json", "w", encoding="utf-8") as f:
         json.dump(results, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,270 @@
+"""
+Experiment-wide append-only provenance ledger.
+
+Run cards are ordinary files that a redone run overwrites. The ledger keeps a
+permanent record alongside them: every completed call and every saved run
+card is appended to one JSONL file as an entry that carries the hash of the
+previous entry, so rewriting, reordering or dropping any entry breaks the
+chain from that point on.
+
+Entries are {"seq", "prev", "kind", "time", "data", "hash"}, where hash is the
+SHA-256 of the canonical JSON of the other fields. Appends are group-committed:
+concurrent appenders queue their entries, one of them writes the whole queue
+and fsyncs once, and all of them return once their entry is durable. Each
+commit holds an exclusive flock on the ledger and chains its batch onto the
+tail it re-reads under that lock, so several processes can append to one
+ledger without forking the chain. After each commit the head (last seq and
+hash) is written to a small side file, so a ledger cut back to an earlier,
+still-consistent entry is detected as truncated.
+
+Usage:
+    from src.provenance.ledger import Ledger, verify_ledger
+    with Ledger("data/raw_outputs/ledger.jsonl") as ledger:
+        ledger.append("call", call_record)
+    report = verify_ledger("data/raw_outputs/ledger.jsonl")
+
+    python -m src.provenance.ledger data/raw_outputs/ledger.jsonl
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+LEDGER_FILE = "ledger.jsonl"
+GENESIS = "0" * 64
+
+
+def entry_hash(entry: dict) -> str:
+    body = {k: entry[k] for k in ("seq", "prev", "kind", "time", "data")}
+    return hashlib.sha256(json.dumps(body, sort_keys=True, separators=(",", ":"),
+                                     ensure_ascii=False).encode()).hexdigest()
+
+
+def head_path(path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + ".head")
+
+
+def _last_line(path: Path) -> Optional[bytes]:
+    """Final line of a file, read backwards from the end."""
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return None
+        f.seek(end - 1)
+        if f.read(1) != b"\n":
+            raise ValueError(f"{path} ends with a partial entry; run verify_ledger")
+        pos, tail = end - 1, b""
+        while pos > 0 and b"\n" not in tail:
+            step = min(4096, pos)
+            pos -= step
+            f.seek(pos)
+            tail = f.read(step) + tail
+        return tail.rsplit(b"\n", 1)[-1]
+
+
+# ── Appending ────────────────────────────────────────────────
+
+class Ledger:
+    """Thread- and process-safe appender with group-commit fsync.
+
+    Args:
+        path: JSONL file (created with its parent directory if missing);
+            an existing ledger is continued from its last entry
+        fsync: fsync each commit (disable only for tests and benchmarks)
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = Path(path)
+        self.fsync = fsync
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "ab", buffering=0)
+        self._seq, self._head, self._size = 0, GENESIS, 0
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            self._read_tail()
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._cond = threading.Condition()
+        self._pending: list[dict] = []
+        self._queued = 0
+        self._durable = 0
+        self._committing = False
+        self.commits = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def head(self) -> dict:
+        """Last entry this appender has seen committed (by any process)."""
+        return {"seq": self._seq, "hash": self._head}
+
+    def append(self, kind: str, data: dict, wait: bool = True) -> dict:
+        """Queue an entry; with wait, return it once it is chained and on disk.
+
+        seq, prev and hash are filled in when the entry is committed, since
+        another process may extend the ledger in the meantime. If the commit
+        fails the error is raised and the entry stays queued for the next one.
+        """
+        with self._cond:
+            entry = {"kind": kind, "time": datetime.now(timezone.utc).isoformat(), "data": data}
+            self._pending.append(entry)
+            self._queued += 1
+            if wait:
+                self._wait_durable(self._queued)
+        return entry
+
+    def flush(self):
+        """Commit every queued entry."""
+        with self._cond:
+            self._wait_durable(self._queued)
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def _wait_durable(self, count: int):
+        # Called with the lock held. The first waiter becomes the committer for
+        # everything queued so far; the rest wait for it and are usually covered.
+        # count is this appender's running number of queued entries.
+        while self._durable < count:
+            if self._committing:
+                self._cond.wait()
+                continue
+            batch, self._pending = self._pending, []
+            last = self._queued
+            self._committing = True
+            self._cond.release()
+            committed = False
+            try:
+                self._commit(batch)
+                committed = True
+            finally:
+                self._cond.acquire()
+                self._committing = False
+                if committed:
+                    self._durable = last
+                else:
+                    # Requeue so the next committer retries these entries
+                    # rather than reporting them durable
+                    self._pending[:0] = batch
+                self._cond.notify_all()
+
+    def _read_tail(self):
+        """Continue from the ledger's last entry if it grew since our last commit."""
+        size = os.fstat(self._file.fileno()).st_size
+        if size != self._size:
+            line = _last_line(self.path)
+            if line:
+                last = json.loads(line)
+                self._seq, self._head = last["seq"], last["hash"]
+            self._size = size
+
+    def _commit(self, batch: list[dict]):
+        # Under the file lock nobody else can append, so the tail read here is
+        # the one this batch chains onto.
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            self._read_tail()
+            seq, head, lines = self._seq, self._head, []
+            for entry in batch:
+                seq += 1
+                entry.update(seq=seq, prev=head)
+                entry["hash"] = head = entry_hash(entry)
+                ordered = {k: entry[k] for k in ("seq", "prev", "kind", "time", "data", "hash")}
+                lines.append(json.dumps(ordered, ensure_ascii=False).encode() + b"\n")
+            data = memoryview(b"".join(lines))
+            try:
+                written = 0
+                while written < len(data):
+                    written += self._file.write(data[written:])
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+                tmp = head_path(self.path).with_suffix(".tmp")
+                with open(tmp, "w") as f:
+                    json.dump({"seq": seq, "hash": head}, f)
+                os.replace(tmp, head_path(self.path))
+            except BaseException:
+                # Drop any partial batch; the entries are retried in full
+                os.ftruncate(self._file.fileno(), self._size)
+                raise
+            self._seq, self._head = seq, head
+            self._size += len(data)
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self.commits += 1
+
+
+# ── Verifying ────────────────────────────────────────────────
+
+def verify_ledger(path: str) -> dict:
+    """Check the whole chain in one pass.
+
+    Returns {"ok", "entries", "head", "error"}; error names the first line
+    that is malformed, out of sequence, not chained to its predecessor or
+    whose hash does not match its content, or reports truncation when the
+    ledger ends before the recorded head.
+    """
+    report = {"ok": False, "entries": 0, "head": GENESIS, "error": None}
+    prev, seq = GENESIS, 0
+    with open(path, "rb") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.endswith(b"\n"):
+                report["error"] = f"line {lineno}: partial entry (truncated write)"
+                return report
+            try:
+                entry = json.loads(line)
+                recomputed = entry_hash(entry)
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                report["error"] = f"line {lineno}: malformed entry ({e})"
+                return report
+            if entry["seq"] != seq + 1:
+                report["error"] = f"line {lineno}: seq {entry['seq']} follows {seq}"
+                return report
+            if entry["prev"] != prev:
+                report["error"] = f"line {lineno}: not chained to the previous entry"
+                return report
+            if entry.get("hash") != recomputed:
+                report["error"] = f"line {lineno}: hash does not match content"
+                return report
+            prev, seq = recomputed, entry["seq"]
+            report["entries"], report["head"] = seq, prev
+
+    head_file = head_path(path)
+    if head_file.exists():
+        with open(head_file) as f:
+            recorded = json.load(f)
+        if recorded["seq"] > seq:
+            report["error"] = f"truncated: ledger ends at seq {seq}, head records seq {recorded['seq']}"
+            return report
+        if recorded["seq"] == seq and recorded["hash"] != prev:
+            report["error"] = "ledger head does not match the recorded head"
+            return report
+    report["ok"] = True
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Verify a provenance ledger's hash chain")
+    parser.add_argument("path", nargs="?", default=f"data/raw_outputs/{LEDGER_FILE}")
+    args = parser.parse_args()
+
+    report = verify_ledger(args.path)
+    if report["ok"]:
+        print(f"OK: {report['entries']} entries, head {report['head'][:16]}")
+    else:
+        print(f"FAIL after {report['entries']} good entries: {report['error']}")
+    sys.exit(0 if report["ok"] else 1)
@@ -0,0 +1,295 @@
+"""
+Merkle trees over a run's call records.
+
+The run card's aggregate_output_hash proves two runs are identical but not
+where they differ. Each run also stores a Merkle tree whose leaves are its
+call records ordered by corpus_id, so that:
+  - two runs are compared by walking both trees from the root and descending
+    only into differing subtrees: k changed abstracts cost O(k log n) node
+    reads, and the tree files are memory-mapped rather than loaded
+  - a single call is shown to belong to a run with a log₂(n)-hash proof
+    checked against the merkle_root in the run card
+
+Leaves hash corpus_id, call_hash and output_hash with a 0x00 prefix; internal
+nodes hash their two children with a 0x01 prefix. A node without a sibling is
+carried up to the next level unchanged.
+
+File layout (merkle_tree.bin): a fixed header (magic, version, leaf count,
+key-block length, SHA-256 of the key block), the newline-separated sorted
+corpus_ids, then every level's 32-byte digests from the leaves up to the root.
+
+Usage:
+    from src.provenance.merkle import diff_trees, load_tree
+    diff = diff_trees(load_tree(run_a_dir), load_tree(run_b_dir))
+
+    python -m src.provenance.merkle --diff data/raw_outputs/m/screening/run_001 data/raw_outputs/m/screening/run_002
+    python -m src.provenance.merkle --prove data/raw_outputs/m/screening/run_001 ABS-0042
+    python -m src.provenance.merkle --backfill data/raw_outputs   # older runs (see backfill_trees)
+"""
+
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Optional
+
+TREE_FILE = "merkle_tree.bin"
+MAGIC = b"MRKL"
+FORMAT_VERSION = 1
+DIGEST_SIZE = 32
+
+_HEADER = struct.Struct(">4sHII32s")
+_LEAF_PREFIX = b"\x00"
+_NODE_PREFIX = b"\x01"
+
+
+# ── Hashing ──────────────────────────────────────────────────
+
+def leaf_hash(record: dict) -> bytes:
+    payload = f"{record['corpus_id']}\x1f{record['call_hash']}\x1f{record['output_hash']}"
+    return hashlib.sha256(_LEAF_PREFIX + payload.encode()).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(_NODE_PREFIX + left + right).digest()
+
+
+def _level_sizes(n_leaves: int) -> list[int]:
+    sizes = [n_leaves]
+    while sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    return sizes
+
+
+# ── Building ─────────────────────────────────────────────────
+
+def build_tree(call_records: list[dict]) -> bytes:
+    """Serialized Merkle tree over call records ordered by corpus_id."""
+    ordered = sorted(call_records, key=lambda r: r["corpus_id"])
+    keys = [r["corpus_id"] for r in ordered]
+    if len(set(keys)) != len(keys):
+        raise ValueError("call records contain duplicate corpus_ids")
+
+    level = [leaf_hash(r) for r in ordered]
+    levels = [level]
+    while len(level) > 1:
+        level = [node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+                 for i in range(0, len(level), 2)]
+        levels.append(level)
+
+    key_block = "\n".join(keys).encode()
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(keys), len(key_block),
+                          hashlib.sha256(key_block).digest())
+    return header + key_block + b"".join(b"".join(lvl) for lvl in levels)
+
+
+def write_tree(run_dir: str, call_records: list[dict]) -> str:
+    """Write merkle_tree.bin into a run directory; returns the hex root."""
+    blob = build_tree(call_records)
+    with open(Path(run_dir) / TREE_FILE, "wb") as f:
+        f.write(blob)
+    return MerkleTree(blob).root_hex
+
+
+def backfill_trees(output_dir: str) -> dict[str, str]:
+    """Write trees for runs saved before Merkle trees existed; returns {run_dir: root}.
+
+    The root is also recorded in the run card's provenance block, flagged
+    merkle_backfilled: it is computed from the call records as they are on
+    disk now, so unlike a root written at save time it attests nothing about
+    the records when the run finished.
+    """
+    roots = {}
+    for records_path in sorted(Path(output_dir).glob("*/*/run_*/call_records.json")):
+        run_dir = records_path.parent
+        card_path = run_dir / "run_card.json"
+        card = json.loads(card_path.read_text(encoding="utf-8")) if card_path.exists() else None
+        if (run_dir / TREE_FILE).exists() and (card is None or "merkle_root" in card.get("provenance", {})):
+            continue
+        with open(records_path) as f:
+            root = write_tree(str(run_dir), json.load(f))
+        if card is not None:
+            card.setdefault("provenance", {}).update(merkle_root=root, merkle_backfilled=True)
+            tmp = card_path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(card, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, card_path)
+        roots[str(run_dir)] = root
+    return roots
+
+
+# ── Reading ──────────────────────────────────────────────────
+
+class MerkleTree:
+    """Read-only view of a serialized tree; digests are sliced from the buffer on demand."""
+
+    def __init__(self, buffer):
+        magic, version, n, key_len, key_digest = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"not a version {FORMAT_VERSION} Merkle tree file")
+        self._buf = buffer
+        self.n_leaves = n
+        self.key_digest = key_digest
+        self._key_offset = _HEADER.size
+        self._key_len = key_len
+        self._keys = None
+
+        self.level_sizes = _level_sizes(n) if n else []
+        self._offsets = []
+        offset = _HEADER.size + key_len
+        for size in self.level_sizes:
+            self._offsets.append(offset)
+            offset += size * DIGEST_SIZE
+
+    @classmethod
+    def from_file(cls, path: str) -> "MerkleTree":
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @property
+    def depth(self) -> int:
+        return len(self.level_sizes)
+
+    @property
+    def root(self) -> Optional[bytes]:
+        return self.node(self.depth - 1, 0) if self.n_leaves else None
+
+    @property
+    def root_hex(self) -> Optional[str]:
+        return self.root.hex() if self.n_leaves else None
+
+    @property
+    def keys(self) -> list[str]:
+        """Sorted corpus_ids, decoded on first use."""
+        if self._keys is None:
+            block = bytes(self._buf[self._key_offset:self._key_offset + self._key_len])
+            self._keys = block.decode().split("\n") if self.n_leaves else []
+        return self._keys
+
+    def node(self, level: int, index: int) -> bytes:
+        start = self._offsets[level] + index * DIGEST_SIZE
+        return bytes(self._buf[start:start + DIGEST_SIZE])
+
+    def index_of(self, corpus_id: str) -> int:
+        i = bisect.bisect_left(self.keys, corpus_id)
+        if i == len(self.keys) or self.keys[i] != corpus_id:
+            raise KeyError(corpus_id)
+        return i
+
+
+def load_tree(run_dir: str) -> MerkleTree:
+    """A run's stored tree, or one built from call_records.json for older runs."""
+    path = Path(run_dir) / TREE_FILE
+    if path.exists():
+        return MerkleTree.from_file(str(path))
+    with open(Path(run_dir) / "call_records.json") as f:
+        return MerkleTree(build_tree(json.load(f)))
+
+
+# ── Diffing ──────────────────────────────────────────────────
+
+def diff_trees(a: MerkleTree, b: MerkleTree) -> dict:
+    """Corpus_ids whose call records differ between two runs.
+
+    When both runs cover the same corpus_ids (equal key digests), only
+    subtrees whose hashes differ are visited. Otherwise leaves are aligned by
+    corpus_id, which reads every leaf digest but still no call records.
+
+    Returns {"changed", "only_a", "only_b", "nodes_visited"}.
+    """
+    if a.key_digest == b.key_digest and a.n_leaves == b.n_leaves:
+        changed, visited = [], 0
+        if a.n_leaves:
+            stack = [(a.depth - 1, 0)]
+            while stack:
+                level, index = stack.pop()
+                visited += 1
+                if a.node(level, index) == b.node(level, index):
+                    continue
+                if level == 0:
+                    changed.append(index)
+                    continue
+                # Push the right child first so leaves come out in key order
+                for child in (2 * index + 1, 2 * index):
+                    if child < a.level_sizes[level - 1]:
+                        stack.append((level - 1, child))
+        return {"changed": [a.keys[i] for i in changed], "only_a": [], "only_b": [],
+                "nodes_visited": visited}
+
+    index_b = {key: i for i, key in enumerate(b.keys)}
+    changed, only_a = [], []
+    for i, key in enumerate(a.keys):
+        j = index_b.pop(key, None)
+        if j is None:
+            only_a.append(key)
+        elif a.node(0, i) != b.node(0, j):
+            changed.append(key)
+    return {"changed": changed, "only_a": only_a, "only_b": sorted(index_b),
+            "nodes_visited": a.n_leaves + b.n_leaves}
+
+
+# ── Inclusion proofs ─────────────────────────────────────────
+
+def inclusion_proof(tree: MerkleTree, corpus_id: str) -> dict:
+    """Sibling hashes from a call's leaf up to the root."""
+    index = tree.index_of(corpus_id)
+    leaf = tree.node(0, index)
+    path = []
+    i = index
+    for level in range(tree.depth - 1):
+        sibling = i ^ 1
+        if sibling < tree.level_sizes[level]:
+            path.append({"side": "left" if sibling < i else "right",
+                         "hash": tree.node(level, sibling).hex()})
+        i //= 2
+    return {"corpus_id": corpus_id, "index": index, "leaf": leaf.hex(),
+            "path": path, "root": tree.root_hex}
+
+
+def verify_proof(record: dict, proof: dict, root: str) -> bool:
+    """Check that a call record hashes up to the given root along the proof path."""
+    digest = leaf_hash(record)
+    for step in proof["path"]:
+        sibling = bytes.fromhex(step["hash"])
+        digest = node_hash(sibling, digest) if step["side"] == "left" else node_hash(digest, sibling)
+    return digest.hex() == root
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Merkle-tree provenance for run outputs")
+    parser.add_argument("--diff", nargs=2, metavar="RUN_DIR", help="Corpus_ids whose calls differ")
+    parser.add_argument("--prove", nargs=2, metavar=("RUN_DIR", "CORPUS_ID"),
+                        help="Print and check an inclusion proof for one call")
+    parser.add_argument("--backfill", metavar="OUTPUT_DIR",
+                        help="Write merkle_tree.bin and record merkle_root for runs under a raw_outputs directory")
+    args = parser.parse_args()
+
+    if args.backfill:
+        for run_dir, root in backfill_trees(args.backfill).items():
+            print(f"  {run_dir}: {root[:16]} (backfilled)")
+
+    if args.diff:
+        tree_a, tree_b = (load_tree(d) for d in args.diff)
+        diff = diff_trees(tree_a, tree_b)
+        print(f"{len(diff['changed'])} changed, {len(diff['only_a'])} only in A, "
+              f"{len(diff['only_b'])} only in B ({diff['nodes_visited']} nodes visited)")
+        for key in diff["changed"]:
+            print(f"  ~ {key}")
+        for key in diff["only_a"]:
+            print(f"  - {key}")
+        for key in diff["only_b"]:
+            print(f"  + {key}")
+
+    if args.prove:
+        run_dir, corpus_id = args.prove
+        tree = load_tree(run_dir)
+        proof = inclusion_proof(tree, corpus_id)
+        with open(Path(run_dir) / "call_records.json") as f:
+            record = next(r for r in json.load(f) if r["corpus_id"] == corpus_id)
+        print(json.dumps(proof, indent=2))
+        print(f"verified: {verify_proof(record, proof, tree.root_hex)}")
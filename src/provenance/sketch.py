@@ -0,0 +1,127 @@
+"""
+Mergeable streaming quantile sketch for call latencies.
+
+A relative-error sketch (DDSketch, Masson et al. 2019): each positive value
+falls into the logarithmic bucket ⌈log_γ(x)⌉ with γ = (1 + α) / (1 − α), and
+a quantile is answered from the bucket counts with relative error at most α.
+Sketches with the same α merge by adding bucket counts, so run cards can
+store a sketch and experiment-level summaries combine them exactly as if all
+samples had been added to one sketch, without keeping the samples.
+
+Usage:
+    from src.provenance.sketch import QuantileSketch
+    sketch = QuantileSketch()
+    for ms in durations:
+        sketch.add(ms)
+    sketch.quantile(0.99)
+
+    total = QuantileSketch.from_dict(card_a_sketch).merge(QuantileSketch.from_dict(card_b_sketch))
+"""
+
+import math
+from collections import Counter
+from typing import Iterable, Optional
+
+RELATIVE_ACCURACY = 0.01
+SUMMARY_QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch with relative accuracy α."""
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Counter = Counter()
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, weight: int = 1) -> "QuantileSketch":
+        if value < 0:
+            raise ValueError("QuantileSketch only accepts non-negative values")
+        if value == 0:
+            self.zero_count += weight
+        else:
+            self.bins[math.ceil(math.log(value) / self._log_gamma)] += weight
+        self.count += weight
+        self.sum += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        return self
+
+    def update(self, values: Iterable[Optional[float]]) -> "QuantileSketch":
+        """Add every value that is not None."""
+        for v in values:
+            if v is not None:
+                self.add(v)
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Fold another sketch into this one (in place)."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        self.bins.update(other.bins)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile q ∈ [0, 1]; None for an empty sketch."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                # Bucket midpoint in the relative sense, clamped to observed range
+                estimate = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def summary(self, digits: int = 1) -> dict:
+        """{"count", "p50", "p90", "p99", "max", "mean"}, rounded."""
+        def r(v):
+            return round(v, digits) if v is not None else None
+        return {"count": self.count,
+                **{name: r(self.quantile(q)) for name, q in SUMMARY_QUANTILES.items()},
+                "max": r(self.max if self.count else None), "mean": r(self.mean)}
+
+    # ── Serialization ────────────────────────────────────────
+
+    def to_dict(self) -> dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "zero_count": self.zero_count,
+            "bins": {str(k): v for k, v in sorted(self.bins.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuantileSketch":
+        sketch = cls(data["relative_accuracy"])
+        sketch.bins = Counter({int(k): v for k, v in data["bins"].items()})
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        if data["count"]:
+            sketch.min, sketch.max = data["min"], data["max"]
+        return sketch
@@ -0,0 +1,262 @@
+"""
+Verify stored run outputs against their provenance hashes.
+
+For every run directory under raw_outputs, in a process pool:
+  - recompute each call's output hash from the output_text stored in
+    results.json (runs saved before output text was stored are counted as
+    unverifiable, not as failures) and check it against results.json and
+    call_records.json
+  - rebuild the run card's aggregate_output_hash and, when present, its
+    merkle_root and merkle_tree.bin
+  - recompute each call_hash from the current corpus, the stage's prompt
+    template and the run card's temperature/seed, so edits to either after a
+    run was made are reported
+
+Verification is incremental: each run's report is stored with a fingerprint
+of its files (size, mtime) and of the corpus and prompts, and runs whose
+fingerprint is unchanged reuse their stored report.
+
+Usage:
+    from src.provenance.verify import verify_outputs
+    report = verify_outputs("data/raw_outputs", jobs=8)
+
+    python -m src.provenance.verify              # verify runs changed since the last check
+    python -m src.provenance.verify --force      # re-verify everything
+    python -m src.provenance.verify --template configs/prompts/screening.txt  # runs using a prompt
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from src.provenance.hasher import compute_call_hash, compute_output_hash, template_digest
+from src.provenance.merkle import TREE_FILE, MerkleTree, build_tree
+
+OUTPUT_DIR = "data/raw_outputs"
+CORPUS_PATH = "data/corpus/corpus_500.json"
+PROMPT_PATHS = {
+    "screening": "configs/prompts/screening.txt",
+    "extraction": "configs/prompts/extraction.txt",
+}
+STATE_FILE = ".verify_state.json"
+RUN_FILES = ("results.json", "call_records.json", "run_card.json", TREE_FILE)
+
+_CONTEXT: dict = {}
+
+
+# ── Inputs ───────────────────────────────────────────────────
+
+def load_context(corpus_path: str = CORPUS_PATH, prompt_paths: Optional[dict] = None) -> dict:
+    """Corpus inputs and prompt templates as the runners hash them, plus their fingerprint."""
+    prompt_paths = prompt_paths or PROMPT_PATHS
+    with open(corpus_path) as f:
+        corpus = {a["corpus_id"]: f"{a['title']}\n{a['abstract']}" for a in json.load(f)["corpus"]}
+    prompts = {}
+    for stage, path in prompt_paths.items():
+        with open(path) as f:
+            prompts[stage] = f.read()
+    key = hashlib.sha256(json.dumps([corpus, prompts], sort_keys=True).encode()).hexdigest()
+    return {"corpus": corpus, "prompts": prompts, "key": key}
+
+
+def run_fingerprint(run_dir: Path) -> list:
+    """[name, size, mtime_ns] of each provenance file present in a run directory."""
+    fingerprint = []
+    for name in RUN_FILES:
+        path = run_dir / name
+        if path.exists():
+            st = path.stat()
+            fingerprint.append([name, st.st_size, st.st_mtime_ns])
+    return fingerprint
+
+
+# ── Verifying one run ────────────────────────────────────────
+
+def _call_hash_matches(record: dict, context: dict, config: dict) -> bool:
+    prompt = context["prompts"].get(record["stage"])
+    input_text = context["corpus"][record["corpus_id"]]
+    temperature = config.get("temperature", 0.0)
+    # Records written before hash schemes were versioned use scheme 1
+    scheme = record.get("call_hash_scheme", 1)
+    # Run cards store the configured temperature; a missing one was hashed as 0.0
+    for t in (temperature, float(temperature or 0.0)):
+        if compute_call_hash(prompt, input_text, record["model_id"], t, config.get("seed"),
+                             scheme=scheme) == record["call_hash"]:
+            return True
+    return False
+
+
+def verify_run(run_dir: str, context: Optional[dict] = None) -> dict:
+    """Check one run directory; returns a report with "ok" and the mismatching corpus_ids."""
+    context = context or _CONTEXT
+    run_dir = Path(run_dir)
+    report = {
+        "run": str(run_dir), "ok": False, "calls": 0, "errors": [],
+        "outputs_checked": 0, "outputs_unverifiable": 0, "output_mismatches": [],
+        "record_mismatches": [], "call_hash_mismatches": [], "unknown_corpus_ids": [],
+        "aggregate_ok": None, "merkle_ok": None,
+    }
+    try:
+        with open(run_dir / "results.json") as f:
+            results = json.load(f)
+        with open(run_dir / "call_records.json") as f:
+            records = json.load(f)
+        with open(run_dir / "run_card.json") as f:
+            card = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        report["errors"].append(f"{type(e).__name__}: {e}")
+        return report
+
+    report["calls"] = len(records)
+    record_hashes = {r["corpus_id"]: r["output_hash"] for r in records}
+
+    # Output hashes from stored output text
+    for res in results:
+        cid = res["corpus_id"]
+        if "output_text" in res:
+            report["outputs_checked"] += 1
+            if compute_output_hash(res["output_text"]) != res["output_hash"]:
+                report["output_mismatches"].append(cid)
+        else:
+            report["outputs_unverifiable"] += 1
+        if record_hashes.get(cid) != res["output_hash"]:
+            report["record_mismatches"].append(cid)
+    report["record_mismatches"] += sorted(set(record_hashes) - {r["corpus_id"] for r in results})
+
+    # Aggregate hash and Merkle root
+    provenance = card.get("provenance", {})
+    aggregate = hashlib.sha256("|".join(sorted(r["output_hash"] for r in records)).encode()).hexdigest()
+    report["aggregate_ok"] = aggregate == provenance.get("aggregate_output_hash")
+    tree_path = run_dir / TREE_FILE
+    if "merkle_root" in provenance or tree_path.exists():
+        try:
+            root = MerkleTree(build_tree(records)).root_hex
+            stored = [provenance.get("merkle_root")] if "merkle_root" in provenance else []
+            if tree_path.exists():
+                stored.append(MerkleTree.from_file(str(tree_path)).root_hex)
+            report["merkle_ok"] = all(s == root for s in stored)
+        except (ValueError, KeyError) as e:
+            report["errors"].append(f"merkle: {e}")
+
+    # Call hashes against the current corpus and prompts
+    config = card.get("config", {})
+    for r in records:
+        if r["corpus_id"] not in context["corpus"]:
+            report["unknown_corpus_ids"].append(r["corpus_id"])
+        elif not _call_hash_matches(r, context, config):
+            report["call_hash_mismatches"].append(r["corpus_id"])
+
+    report["ok"] = not (report["errors"] or report["output_mismatches"] or report["record_mismatches"]
+                        or report["call_hash_mismatches"] or report["unknown_corpus_ids"]
+                        or report["aggregate_ok"] is False or report["merkle_ok"] is False)
+    return report
+
+
+def _init_worker(context: dict):
+    global _CONTEXT
+    _CONTEXT = context
+
+
+# ── Verifying the tree ───────────────────────────────────────
+
+def verify_outputs(
+    output_dir: str = OUTPUT_DIR,
+    corpus_path: str = CORPUS_PATH,
+    prompt_paths: Optional[dict] = None,
+    jobs: int = 1,
+    force: bool = False,
+) -> dict:
+    """Verify every run under output_dir that changed since its last check.
+
+    Returns {"verified": [reports], "skipped": [reports], "failed": [run paths]}.
+    Reports of skipped runs are the stored ones, so "failed" covers all runs.
+    """
+    context = load_context(corpus_path, prompt_paths)
+    state_path = Path(output_dir) / STATE_FILE
+    state = {}
+    if state_path.exists() and not force:
+        with open(state_path) as f:
+            state = json.load(f)
+
+    run_dirs = sorted(p.parent for p in Path(output_dir).glob("*/*/run_*/run_card.json"))
+    fingerprints = {str(d): {"files": run_fingerprint(d), "context": context["key"]} for d in run_dirs}
+    stale = [d for d in run_dirs if state.get(str(d), {}).get("fingerprint") != fingerprints[str(d)]]
+    skipped = [state[str(d)]["report"] for d in run_dirs if d not in stale]
+
+    if jobs > 1 and len(stale) > 1:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(context,)) as executor:
+            verified = list(executor.map(verify_run, map(str, stale)))
+    else:
+        verified = [verify_run(str(d), context) for d in stale]
+
+    new_state = {str(d): state[str(d)] for d in run_dirs if d not in stale}
+    for report in verified:
+        new_state[report["run"]] = {"fingerprint": fingerprints[report["run"]], "report": report}
+    tmp = state_path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(new_state, f, indent=1, sort_keys=True)
+    os.replace(tmp, state_path)
+
+    failed = [r["run"] for r in verified + skipped if not r["ok"]]
+    return {"verified": verified, "skipped": skipped, "failed": sorted(failed)}
+
+
+def runs_using_template(output_dir: str, prompt: str) -> list[str]:
+    """Run directories whose calls used this prompt template, from run cards alone.
+
+    Only runs recorded under call hash scheme 2 list their template digests.
+    """
+    digest = template_digest(prompt)
+    runs = []
+    for card_path in sorted(Path(output_dir).glob("*/*/run_*/run_card.json")):
+        with open(card_path) as f:
+            if digest in json.load(f).get("provenance", {}).get("template_digests", []):
+                runs.append(str(card_path.parent))
+    return runs
+
+
+def print_report(report: dict):
+    for r in report["verified"] + report["skipped"]:
+        if r["ok"]:
+            continue
+        print(f"  FAIL {r['run']}")
+        for e in r["errors"]:
+            print(f"       error: {e}")
+        for field in ("output_mismatches", "record_mismatches", "call_hash_mismatches", "unknown_corpus_ids"):
+            if r[field]:
+                print(f"       {field}: {len(r[field])} ({', '.join(r[field][:5])}"
+                      f"{', ...' if len(r[field]) > 5 else ''})")
+        if r["aggregate_ok"] is False:
+            print("       aggregate_output_hash does not match call records")
+        if r["merkle_ok"] is False:
+            print("       merkle_root does not match call records")
+    unverifiable = sum(r["outputs_unverifiable"] for r in report["verified"] + report["skipped"])
+    print(f"{len(report['verified'])} runs verified, {len(report['skipped'])} unchanged, "
+          f"{len(report['failed'])} failed"
+          + (f" ({unverifiable} outputs without stored text)" if unverifiable else ""))
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Verify provenance hashes of stored run outputs")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--force", action="store_true", help="Re-verify runs whose files are unchanged")
+    parser.add_argument("--template", metavar="PROMPT_FILE", help="List runs that used this prompt and exit")
+    args = parser.parse_args()
+
+    if args.template:
+        with open(args.template) as f:
+            for run in runs_using_template(args.output_dir, f.read()):
+                print(run)
+        sys.exit(0)
+
+    report = verify_outputs(args.output_dir, args.corpus, jobs=args.jobs, force=args.force)
+    print_report(report)
+    sys.exit(1 if report["failed"] else 0)
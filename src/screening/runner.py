@@ -17,10 +17,12 @@ from typing import Optional
 
 import jsonschema
 
+from src.utils import tracing
 from src.provenance.hasher import (
     compute_call_hash,
     compute_output_hash,
     create_call_record,
+    template_digest,
 )
 
 
@@ -102,42 +104,54 @@ def _run_single_screening(
         kwargs["max_output_tokens"] = model_config.get("max_output_tokens", 8192)
         kwargs["seed"] = model_config.get("seed", 42)
 
+    # Attempt count and sleeps, reported with the call for run-card timing stats:
+    # throttle_wait_ms for rate limits (429), backoff_wait_ms for other retries
+    retry = {"attempts": 0, "throttle_wait_ms": 0.0, "backoff_wait_ms": 0.0}
     for attempt in range(max_retries + 1):
+        retry["attempts"] += 1
         try:
-            result = runner.run_inference(**kwargs)
-            parsed = _extract_json(result["output_text"])
+            with tracing.span("inference", attempt=retry["attempts"]):
+                result = runner.run_inference(**kwargs)
+            with tracing.span("json.extract"):
+                parsed = _extract_json(result["output_text"])
 
             if parsed is None:
                 if attempt < max_retries:
-                    time.sleep(1)
+                    with tracing.span("retry.sleep", reason="json_parse_failed"):
+                        time.sleep(1)
+                    retry["backoff_wait_ms"] += 1000
                     continue
-                return {"error": "json_parse_failed", "raw": result["output_text"]}, result, False
+                return {"error": "json_parse_failed", "raw": result["output_text"]}, {**result, **retry}, False
 
             # Validate against schema
             valid = True
             if schema:
-                try:
-                    jsonschema.validate(parsed, schema)
-                except jsonschema.ValidationError as e:
-                    parsed["_validation_error"] = str(e.message)
-                    valid = False
+                with tracing.span("schema.validate"):
+                    try:
+                        jsonschema.validate(parsed, schema)
+                    except jsonschema.ValidationError as e:
+                        parsed["_validation_error"] = str(e.message)
+                        valid = False
 
-            return parsed, result, valid
+            return parsed, {**result, **retry}, valid
 
         except Exception as e:
             err_msg = str(e)
             # Don't retry on billing/auth errors — abort immediately
             if "credit balance" in err_msg or "billing" in err_msg.lower():
-                return {"error": err_msg, "fatal": True}, {}, False
+                return {"error": err_msg, "fatal": True}, retry, False
             if attempt < max_retries:
                 wait = 2 ** (attempt + 1)
-                if "429" in err_msg:
+                rate_limited = "429" in err_msg
+                if rate_limited:
                     wait = max(wait, 5)  # longer wait for rate limits
-                time.sleep(wait)
+                with tracing.span("retry.sleep", reason="rate_limit" if rate_limited else "error", wait_s=wait):
+                    time.sleep(wait)
+                retry["throttle_wait_ms" if rate_limited else "backoff_wait_ms"] += wait * 1000
                 continue
-            return {"error": err_msg}, {}, False
+            return {"error": err_msg}, retry, False
 
-    return {"error": "max_retries_exceeded"}, {}, False
+    return {"error": "max_retries_exceeded"}, retry, False
 
 
 def run_screening(
@@ -147,6 +161,7 @@ def run_screening(
     prompt_template: str,
     schema: Optional[dict] = None,
     progress_callback=None,
+    ledger=None,
 ) -> tuple[list[dict], list[dict], dict]:
     """
     Run screening for all abstracts in the corpus.
@@ -158,6 +173,7 @@ def run_screening(
         prompt_template: Screening prompt (with {title} and {abstract} placeholders)
         schema: Optional JSON schema for validation
         progress_callback: Optional callable(current, total) for progress
+        ledger: Optional provenance Ledger; each call record is appended as it completes
 
     Returns:
         (results, call_records, stats)
@@ -178,56 +194,68 @@ def run_screening(
     call_delay = model_config.get("call_delay", 0)
 
     for i, article in enumerate(corpus):
-        if call_delay > 0 and i > 0:
-            time.sleep(call_delay)
-
-        # Format prompt with article data
-        prompt = prompt_template.replace("{title}", article["title"])
-        prompt = prompt.replace("{abstract}", article["abstract"])
-
-        parsed, raw_result, valid = _run_single_screening(
-            runner=runner,
-            prompt=prompt,
-            title=article["title"],
-            abstract=article["abstract"],
-            model_config=model_config,
-            schema=schema,
-        )
-
-        # Compute provenance hashes
-        call_hash = compute_call_hash(
-            prompt=prompt_template,
-            input_text=f"{article['title']}\n{article['abstract']}",
-            model_id=model_id,
-            temperature=model_config.get("temperature", 0.0),
-            seed=model_config.get("seed"),
-        )
-        output_hash = compute_output_hash(raw_result.get("output_text", ""))
-
-        # Create call record
-        record = create_call_record(
-            corpus_id=article["corpus_id"],
-            call_hash=call_hash,
-            output_hash=output_hash,
-            model_id=model_id,
-            provider=provider,
-            stage="screening",
-            run_id=run_id,
-            inference_result=raw_result,
-        )
-        call_records.append(record)
-
-        # Build result entry
-        result_entry = {
-            "corpus_id": article["corpus_id"],
-            "pmid": article["pmid"],
-            "run_id": run_id,
-            "model_id": model_id,
-            "output": parsed,
-            "valid": valid,
-            "output_hash": output_hash,
-        }
-        results.append(result_entry)
+        with tracing.span("call", model=model_id, run=run_id, stage="screening", corpus_id=article["corpus_id"]):
+            delay_ms = 0.0
+            if call_delay > 0 and i > 0:
+                with tracing.span("throttle.delay"):
+                    time.sleep(call_delay)
+                delay_ms = call_delay * 1000
+
+            # Format prompt with article data
+            with tracing.span("prompt.build"):
+                prompt = prompt_template.replace("{title}", article["title"])
+                prompt = prompt.replace("{abstract}", article["abstract"])
+
+            parsed, raw_result, valid = _run_single_screening(
+                runner=runner,
+                prompt=prompt,
+                title=article["title"],
+                abstract=article["abstract"],
+                model_config=model_config,
+                schema=schema,
+            )
+            raw_result["throttle_wait_ms"] = round(raw_result.get("throttle_wait_ms", 0.0) + delay_ms, 1)
+
+            # Compute provenance hashes
+            with tracing.span("hash"):
+                call_hash = compute_call_hash(
+                    prompt=prompt_template,
+                    input_text=f"{article['title']}\n{article['abstract']}",
+                    model_id=model_id,
+                    temperature=model_config.get("temperature", 0.0),
+                    seed=model_config.get("seed"),
+                )
+                output_hash = compute_output_hash(raw_result.get("output_text", ""))
+
+            # Create call record
+            record = create_call_record(
+                corpus_id=article["corpus_id"],
+                call_hash=call_hash,
+                output_hash=output_hash,
+                model_id=model_id,
+                provider=provider,
+                stage="screening",
+                run_id=run_id,
+                inference_result=raw_result,
+                template_digest=template_digest(prompt_template),
+            )
+            call_records.append(record)
+            if ledger is not None:
+                with tracing.span("ledger.append"):
+                    ledger.append("call", record)
+
+            # Build result entry
+            result_entry = {
+                "corpus_id": article["corpus_id"],
+                "pmid": article["pmid"],
+                "run_id": run_id,
+                "model_id": model_id,
+                "output": parsed,
+                "valid": valid,
+                "output_hash": output_hash,
+                "output_text": raw_result.get("output_text", ""),
+            }
+            results.append(result_entry)
 
         if "error" not in parsed:
             successful += 1
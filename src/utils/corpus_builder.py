@@ -6,15 +6,41 @@ Heuristic classification based on inclusion/exclusion criteria:
   - Clearly Exclude (100): Reviews, PM10-only, mortality-only, cardiovascular, non-English
   - Ambiguous (300): Partial matches — borderline exposure, outcome, or design
 
+Classification scans each article's text once with a combined pattern of all
+criteria (see scan_criteria); large candidate sets can be classified in a
+process pool with classify_many.
+
+Near-duplicates (errata, duplicate publications, conference versions) are
+collapsed before classification with MinHash/LSH (src/utils/near_duplicates.py);
+the clusters found are reported in the corpus metadata.
+
+corpus_ids come from a persistent PMID → corpus_id map (corpus_ids.json), so
+an abstract keeps its ID across rebuilds and updates. Update mode fetches only
+records added to PubMed since the last build, classifies the new articles,
+appends them with fresh IDs and records the change in corpus_versions.json;
+existing run outputs stay valid and only the new abstracts need LLM calls.
+
 Usage:
     python -m src.utils.corpus_builder
+    python -m src.utils.corpus_builder --update            # since the last build
+    python -m src.utils.corpus_builder --update --mindate 2025/01/01
 """
 
 import json
+import os
 import re
 import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime, timezone
+from typing import Optional
+
+from src.utils.near_duplicates import DEFAULT_THRESHOLD, drop_near_duplicates
+
+CORPUS_PATH = "data/corpus/corpus_500.json"
+ID_MAP_PATH = "data/corpus/corpus_ids.json"
+VERSIONS_PATH = "data/corpus/corpus_versions.json"
 
 # ── Keyword patterns for classification ──────────────────────────
 
@@ -82,6 +108,80 @@ PAT_CARDIOVASCULAR = re.compile(
 )
 
 
+# ── Single-pass criteria scan ────────────────────────────────
+
+# Criteria matched against title + abstract only
+TEXT_PATTERNS = {
+    "pm25": PAT_PM25,
+    "pm10": PAT_PM10_ONLY,
+    "respiratory": PAT_RESPIRATORY,
+    "hospitalization": PAT_HOSPITALIZATION,
+    "mortality": PAT_MORTALITY,
+    "effect": PAT_EFFECT,
+    "animal": PAT_ANIMAL,
+    "cardiovascular": PAT_CARDIOVASCULAR,
+}
+# Criteria matched against title + abstract + publication types + MeSH terms
+FULL_TEXT_PATTERNS = {
+    "timeseries": PAT_TIMESERIES,
+    "review": PAT_REVIEW,
+}
+CRITERIA_PATTERNS = {**TEXT_PATTERNS, **FULL_TEXT_PATTERNS}
+
+
+_ESCAPE_OR_RUN = re.compile(r"\\.|[^\\]+", re.DOTALL)
+
+
+def _lower_pattern(pattern: re.Pattern) -> str:
+    """Source of a case-insensitive pattern, lowercased outside escapes.
+
+    Escapes keep their case: \\S, \\W, \\D and \\B mean something different
+    from \\s, \\w, \\d and \\b.
+    """
+    if not pattern.flags & re.IGNORECASE:
+        raise ValueError(f"criteria pattern is not case-insensitive: {pattern.pattern!r}")
+    return _ESCAPE_OR_RUN.sub(lambda m: m.group() if m.group().startswith("\\") else m.group().lower(),
+                              pattern.pattern)
+
+
+@lru_cache(maxsize=None)
+def _combined_pattern(names: tuple[str, ...]) -> re.Pattern:
+    """One alternation of named groups over lowercased text.
+
+    The text is lowercased once per article and the patterns are lowercased to
+    match, which avoids re.IGNORECASE and lets the regex engine use literal
+    prefixes to skip ahead.
+    """
+    return re.compile("|".join(f"(?P<{n}>{_lower_pattern(CRITERIA_PATTERNS[n])})" for n in names))
+
+
+def scan_criteria(text: str, full_text: str) -> dict[str, bool]:
+    """Which criteria patterns occur, in one left-to-right scan of full_text.
+
+    full_text must start with text. At each position the alternation reports
+    only its first matching criterion, so after a hit the scan resumes at the
+    start of that match without the criterion found. A text-only criterion
+    whose earliest match runs past the end of text is re-checked on text alone.
+    """
+    lowered = full_text.lower()
+    text_end = len(text.lower())
+    remaining = tuple(CRITERIA_PATTERNS)
+    found = {}
+    pos = 0
+    while remaining:
+        m = _combined_pattern(remaining).search(lowered, pos)
+        if m is None:
+            break
+        name = m.lastgroup
+        pos = m.start()
+        if name in TEXT_PATTERNS and m.end() > text_end:
+            found[name] = bool(TEXT_PATTERNS[name].search(text))
+        else:
+            found[name] = True
+        remaining = tuple(n for n in remaining if n != name)
+    return {n: found.get(n, False) for n in CRITERIA_PATTERNS}
+
+
 def classify_abstract(article: dict) -> dict:
     """
     Classify an article as include/exclude/ambiguous.
@@ -91,18 +191,19 @@ def classify_abstract(article: dict) -> dict:
     pub_types = " ".join(article.get("pub_types", []))
     mesh = " ".join(article.get("mesh_terms", []))
     full_text = f"{text} {pub_types} {mesh}"
+    found = scan_criteria(text, full_text)
 
     # Score each criterion
-    has_pm25 = bool(PAT_PM25.search(text))
-    has_pm10_only = bool(PAT_PM10_ONLY.search(text)) and not has_pm25
-    has_respiratory = bool(PAT_RESPIRATORY.search(text))
-    has_hospitalization = bool(PAT_HOSPITALIZATION.search(text))
-    has_mortality_only = bool(PAT_MORTALITY.search(text)) and not has_hospitalization
-    has_timeseries = bool(PAT_TIMESERIES.search(full_text))
-    has_effect = bool(PAT_EFFECT.search(text))
-    is_review = bool(PAT_REVIEW.search(full_text)) or "Review" in pub_types
-    is_animal = bool(PAT_ANIMAL.search(text))
-    has_cardiovascular = bool(PAT_CARDIOVASCULAR.search(text)) and not has_respiratory
+    has_pm25 = found["pm25"]
+    has_pm10_only = found["pm10"] and not has_pm25
+    has_respiratory = found["respiratory"]
+    has_hospitalization = found["hospitalization"]
+    has_mortality_only = found["mortality"] and not has_hospitalization
+    has_timeseries = found["timeseries"]
+    has_effect = found["effect"]
+    is_review = found["review"] or "Review" in pub_types
+    is_animal = found["animal"]
+    has_cardiovascular = found["cardiovascular"] and not has_respiratory
 
     # Inclusion score (0-5)
     inclusion_score = sum([
@@ -150,6 +251,98 @@ def classify_abstract(article: dict) -> dict:
     }
 
 
+def classify_many(articles: list[dict], jobs: int = 1, chunksize: int = 256) -> list[dict]:
+    """classify_abstract over many articles, in a process pool when jobs > 1."""
+    if jobs <= 1 or len(articles) <= chunksize:
+        return [classify_abstract(art) for art in articles]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(classify_abstract, articles, chunksize=chunksize))
+
+
+# ── Stable corpus IDs ────────────────────────────────────────
+
+def _id_number(corpus_id: str) -> int:
+    return int(corpus_id.split("-")[1])
+
+
+def load_id_map(id_map_path: str = ID_MAP_PATH, corpus_path: str = CORPUS_PATH) -> dict[str, str]:
+    """PMID → corpus_id map; seeded from an existing corpus when no map was saved yet."""
+    path = Path(id_map_path)
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)["ids"]
+    if Path(corpus_path).exists():
+        with open(corpus_path) as f:
+            return {art["pmid"]: art["corpus_id"] for art in json.load(f)["corpus"]}
+    return {}
+
+
+def save_id_map(id_map: dict[str, str], id_map_path: str = ID_MAP_PATH):
+    path = Path(id_map_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"updated": datetime.now(timezone.utc).isoformat(),
+                   "ids": dict(sorted(id_map.items(), key=lambda kv: _id_number(kv[1])))}, f, indent=2)
+
+
+def assign_corpus_ids(pmids: list[str], id_map: dict[str, str]) -> list[str]:
+    """Each PMID's existing corpus_id, or the next unused one (recorded in id_map)."""
+    next_number = max((_id_number(cid) for cid in id_map.values()), default=0) + 1
+    for pmid in pmids:
+        if pmid not in id_map:
+            id_map[pmid] = f"ABS-{next_number:04d}"
+            next_number += 1
+    return [id_map[pmid] for pmid in pmids]
+
+
+def _corpus_entry(art: dict, category: str, corpus_id: str) -> dict:
+    # Compute content hash for provenance
+    content_str = f"{art['pmid']}|{art['title']}|{art['abstract']}"
+    content_hash = hashlib.sha256(content_str.encode()).hexdigest()[:16]
+
+    return {
+        "corpus_id": corpus_id,
+        "pmid": art["pmid"],
+        "title": art["title"],
+        "abstract": art["abstract"],
+        "authors": art.get("authors", []),
+        "journal": art.get("journal", ""),
+        "year": art.get("year", ""),
+        "doi": art.get("doi", ""),
+        "gold_category": category,
+        "classification": {
+            "inclusion_score": art["_classification"]["inclusion_score"],
+            "criteria_met": art["_classification"]["criteria"],
+            "exclusion_reasons": art["_classification"]["exclusion_reasons"],
+        },
+        "content_hash": content_hash,
+    }
+
+
+def raw_fetch_date(paths: list[str]) -> Optional[str]:
+    """Date (YYYY/MM/DD) the oldest existing raw PubMed dump was written, or None.
+
+    The dumps are written when their fetch completes, so this is the date an
+    update has to search from; records added while a build sat on old dumps
+    are then still picked up.
+    """
+    mtimes = [Path(p).stat().st_mtime for p in paths if Path(p).exists()]
+    if not mtimes:
+        return None
+    return datetime.fromtimestamp(min(mtimes), timezone.utc).strftime("%Y/%m/%d")
+
+
+def record_version(entry: dict, versions_path: str = VERSIONS_PATH):
+    """Append a version diff ({"version", "added", "removed", ...}) to the version log."""
+    path = Path(versions_path)
+    versions = json.loads(path.read_text()) if path.exists() else []
+    versions.append(entry)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(versions, indent=2))
+
+
+# ── Build ────────────────────────────────────────────────────
+
 def build_corpus(
     broad_path: str = "data/corpus/raw/pubmed_broad.json",
     design_path: str = "data/corpus/raw/pubmed_design.json",
@@ -158,8 +351,21 @@ def build_corpus(
     target_include: int = 100,
     target_exclude: int = 100,
     target_ambiguous: int = 300,
+    jobs: int = 1,
+    id_map_path: str = ID_MAP_PATH,
+    versions_path: str = VERSIONS_PATH,
+    near_duplicate_threshold: Optional[float] = DEFAULT_THRESHOLD,
 ):
-    """Build the final 500-abstract corpus."""
+    """Build the final 500-abstract corpus.
+
+    Articles already in the PMID → corpus_id map keep their IDs; new ones get
+    the next unused ID. Rebuilding over an existing corpus keeps its version
+    unless the set of corpus_ids changed, in which case the minor version is
+    bumped and the added/removed IDs are logged against the previous version.
+    Near-duplicate clusters (title + abstract shingle Jaccard ≥
+    near_duplicate_threshold; None disables) are collapsed to one article,
+    preferring one that already has a corpus_id.
+    """
     print("=== Corpus Builder ===\n")
 
     # Load all sources
@@ -189,13 +395,23 @@ def build_corpus(
 
     print(f"Total unique articles: {len(articles_by_pmid)}")
 
+    # Collapse near-duplicates
+    id_map = load_id_map(id_map_path, output_path)
+    clusters = []
+    if near_duplicate_threshold:
+        kept, clusters = drop_near_duplicates(list(articles_by_pmid.values()), near_duplicate_threshold,
+                                              protected=set(id_map))
+        articles_by_pmid = {art["pmid"]: art for art in kept}
+        print(f"Near-duplicates: {len(clusters)} clusters, "
+              f"{sum(len(c['drop']) for c in clusters)} articles dropped")
+
     # Classify all
     includes = []
     excludes = []
     ambiguous = []
 
-    for pmid, art in articles_by_pmid.items():
-        classification = classify_abstract(art)
+    candidates = list(articles_by_pmid.values())
+    for art, classification in zip(candidates, classify_many(candidates, jobs=jobs)):
         art["_classification"] = classification
 
         cat = classification["category"]
@@ -268,39 +484,38 @@ def build_corpus(
     print(f"  TOTAL:     {total} / {target_include + target_exclude + target_ambiguous}")
 
     # Build final corpus
-    corpus = []
-    for idx, (category_list, category_label) in enumerate([
-        (selected_includes, "include"),
-        (selected_excludes, "exclude"),
-        (selected_ambiguous, "ambiguous"),
-    ]):
-        for art in category_list:
-            # Compute content hash for provenance
-            content_str = f"{art['pmid']}|{art['title']}|{art['abstract']}"
-            content_hash = hashlib.sha256(content_str.encode()).hexdigest()[:16]
-
-            corpus.append({
-                "corpus_id": f"ABS-{len(corpus) + 1:04d}",
-                "pmid": art["pmid"],
-                "title": art["title"],
-                "abstract": art["abstract"],
-                "authors": art.get("authors", []),
-                "journal": art.get("journal", ""),
-                "year": art.get("year", ""),
-                "doi": art.get("doi", ""),
-                "gold_category": category_label,
-                "classification": {
-                    "inclusion_score": art["_classification"]["inclusion_score"],
-                    "criteria_met": art["_classification"]["criteria"],
-                    "exclusion_reasons": art["_classification"]["exclusion_reasons"],
-                },
-                "content_hash": content_hash,
-            })
+    selected = [
+        (art, category_label)
+        for category_list, category_label in [
+            (selected_includes, "include"),
+            (selected_excludes, "exclude"),
+            (selected_ambiguous, "ambiguous"),
+        ]
+        for art in category_list
+    ]
+    corpus_ids = assign_corpus_ids([art["pmid"] for art, _ in selected], id_map)
+    corpus = [_corpus_entry(art, label, cid) for (art, label), cid in zip(selected, corpus_ids)]
+
+    # Diff against the corpus being replaced
+    previous_version, previous_ids = None, []
+    if Path(output_path).exists():
+        with open(output_path) as f:
+            previous = json.load(f)
+        previous_version = previous["metadata"].get("version", "1.0")
+        previous_ids = [a["corpus_id"] for a in previous["corpus"]]
+    kept_ids, new_ids = set(previous_ids), {a["corpus_id"] for a in corpus}
+    added = [a["corpus_id"] for a in corpus if a["corpus_id"] not in kept_ids]
+    removed = [cid for cid in previous_ids if cid not in new_ids]
+    if previous_version is None:
+        version = "1.0"
+    else:
+        version = _next_version(previous_version) if added or removed else previous_version
 
     # Metadata
     metadata = {
         "created": datetime.now(timezone.utc).isoformat(),
-        "version": "1.0",
+        "last_fetched": raw_fetch_date([broad_path, design_path, exclude_path]),
+        "version": version,
         "total": len(corpus),
         "composition": {
             "include": len(selected_includes),
@@ -313,6 +528,7 @@ def build_corpus(
             "pubmed_exclude": exclude_path,
         },
         "classification_method": "heuristic_keyword_matching_v1",
+        "near_duplicates": {"threshold": near_duplicate_threshold, "clusters": clusters},
         "note": "Gold standard labels are PRELIMINARY (heuristic). "
                 "Final labels require dual-human review.",
     }
@@ -327,6 +543,16 @@ def build_corpus(
     with open(out, "w", encoding="utf-8") as f:
         json.dump(output, f, indent=2, ensure_ascii=False)
 
+    save_id_map(id_map, id_map_path)
+    record_version({
+        "version": version,
+        "previous_version": previous_version,
+        "created": metadata["created"],
+        "mode": "build",
+        "added": added,
+        "removed": removed,
+    }, versions_path)
+
     print(f"\nCorpus saved to {output_path}")
     print(f"SHA-256: {hashlib.sha256(json.dumps(output, sort_keys=True).encode()).hexdigest()[:16]}")
 
@@ -340,5 +566,131 @@ def build_corpus(
     return output
 
 
+# ── Incremental update ───────────────────────────────────────
+
+def fetch_new_candidates(mindate: str, api_key: Optional[str] = None, cache=None) -> list[dict]:
+    """Articles added to PubMed since mindate for every corpus query, tagged with _source."""
+    from src.utils.pubmed_fetch import QUERY_BROAD, QUERY_DESIGN, fetch_multi_query
+    from src.utils import pubmed_fetch_exclude as ex
+
+    queries = [("broad", QUERY_BROAD, None), ("design", QUERY_DESIGN, None)]
+    queries += [("exclude_candidates", query, None) for _, query, _ in ex.QUERIES]
+    articles = fetch_multi_query(queries, api_key=api_key, cache=cache, mindate=mindate)
+    for art in articles:
+        art["_source"] = "+".join(art["matched_queries"])
+    return articles
+
+
+def _next_version(version: str) -> str:
+    major, minor = (version.split(".") + ["0"])[:2]
+    return f"{major}.{int(minor) + 1}"
+
+
+def update_corpus(
+    corpus_path: str = CORPUS_PATH,
+    mindate: Optional[str] = None,
+    new_articles: Optional[list[dict]] = None,
+    api_key: Optional[str] = None,
+    cache=None,
+    jobs: int = 1,
+    id_map_path: str = ID_MAP_PATH,
+    versions_path: str = VERSIONS_PATH,
+    near_duplicate_threshold: Optional[float] = DEFAULT_THRESHOLD,
+) -> dict:
+    """Append articles added since the last build; existing entries and IDs are untouched.
+
+    Candidates are fetched with mindate (default: the corpus's last_fetched
+    date, i.e. when its PubMed records were fetched) unless new_articles is
+    given. Only PMIDs not already in the corpus are classified; each gets the
+    next corpus_id. Returns the version diff.
+    """
+    with open(corpus_path) as f:
+        output = json.load(f)
+    metadata, corpus = output["metadata"], output["corpus"]
+    known = {art["pmid"] for art in corpus}
+    today = datetime.now(timezone.utc).strftime("%Y/%m/%d")
+
+    fetched = new_articles is None
+    if fetched:
+        # The build time says nothing about when the raw records were fetched
+        mindate = (mindate or metadata.get("last_fetched")
+                   or raw_fetch_date(list(metadata.get("sources", {}).values())))
+        if not mindate:
+            raise ValueError("Corpus metadata has no last_fetched date and its raw PubMed files are gone; "
+                             "pass --mindate (the date the raw files were fetched)")
+        print(f"=== Corpus Update (records added since {mindate}) ===\n")
+        new_articles = fetch_new_candidates(mindate, api_key=api_key, cache=cache)
+    candidates = [art for art in {a["pmid"]: a for a in new_articles}.values() if art["pmid"] not in known]
+    print(f"New candidates: {len(candidates)} (of {len(new_articles)} fetched)")
+
+    # Drop candidates that near-duplicate the corpus or each other
+    clusters = []
+    if near_duplicate_threshold and candidates:
+        kept, clusters = drop_near_duplicates(corpus + candidates, near_duplicate_threshold, protected=known)
+        kept_pmids = {art["pmid"] for art in kept}
+        candidates = [art for art in candidates if art["pmid"] in kept_pmids]
+        if clusters:
+            print(f"Near-duplicates: {sum(len(c['drop']) for c in clusters)} candidates dropped")
+
+    id_map = load_id_map(id_map_path, corpus_path)
+    added = []
+    corpus_ids = assign_corpus_ids([art["pmid"] for art in candidates], id_map)
+    for art, classification, corpus_id in zip(candidates, classify_many(candidates, jobs=jobs), corpus_ids):
+        art["_classification"] = classification
+        entry = _corpus_entry(art, classification["category"], corpus_id)
+        corpus.append(entry)
+        added.append(entry["corpus_id"])
+
+    previous = metadata.get("version", "1.0")
+    if added:
+        metadata["version"] = _next_version(previous)
+        metadata["updated"] = datetime.now(timezone.utc).isoformat()
+        metadata["total"] = len(corpus)
+        metadata["composition"] = {
+            cat: sum(a["gold_category"] == cat for a in corpus) for cat in ("include", "exclude", "ambiguous")
+        }
+    if fetched:
+        metadata["last_fetched"] = today
+
+    with open(corpus_path, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2, ensure_ascii=False)
+    save_id_map(id_map, id_map_path)
+
+    diff = {
+        "version": metadata["version"],
+        "previous_version": previous,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "mode": "update",
+        "mindate": mindate,
+        "added": added,
+        "removed": [],
+        "near_duplicates": clusters,
+    }
+    record_version(diff, versions_path)
+
+    print(f"Added {len(added)} abstracts → version {metadata['version']} ({len(corpus)} total)")
+    if added:
+        print("New abstracts need gold-standard labels before they enter the evaluation")
+    return diff
+
+
 if __name__ == "__main__":
-    build_corpus()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Classify candidates and build the 500-abstract corpus")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes for classification")
+    parser.add_argument("--update", action="store_true",
+                        help="Append articles added to PubMed since the last build")
+    parser.add_argument("--mindate", default=None,
+                        help="With --update: fetch records added since this date (YYYY/MM/DD)")
+    parser.add_argument("--near-dup-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Jaccard similarity for near-duplicate clusters (0 disables)")
+    args = parser.parse_args()
+
+    if args.update:
+        from src.utils.pubmed_cache import PubmedCache
+        update_corpus(mindate=args.mindate, api_key=os.environ.get("NCBI_API_KEY"), cache=PubmedCache(),
+                      jobs=args.jobs, near_duplicate_threshold=args.near_dup_threshold)
+    else:
+        build_corpus(jobs=args.jobs, near_duplicate_threshold=args.near_dup_threshold)
@@ -0,0 +1,225 @@
+"""
+Near-duplicate abstract detection with MinHash + locality-sensitive hashing.
+
+Exact copies are caught by PMID and content_hash; errata, duplicate
+publications and conference versions are not. Each article's title + abstract
+is reduced to word shingles, summarized by a MinHash signature, and the
+signatures are split into LSH bands. Only articles sharing a band bucket are
+compared, so the cost grows with the number of candidate pairs rather than
+with all n² pairs. Candidates whose shingle-set Jaccard similarity reaches the
+threshold are joined with union-find into clusters.
+
+Usage:
+    from src.utils.near_duplicates import find_near_duplicates
+    clusters = find_near_duplicates(articles, threshold=0.8)
+
+    python -m src.utils.near_duplicates data/corpus/raw/pubmed_broad.json --threshold 0.7
+"""
+
+import json
+import re
+import zlib
+from collections import defaultdict
+from typing import Optional
+
+import numpy as np
+
+NUM_PERM = 128
+SHINGLE_SIZE = 3  # words
+DEFAULT_THRESHOLD = 0.8
+FN_WEIGHT = 0.95  # relative cost of a missed pair vs an extra candidate in lsh_params
+SEED = 1
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_SHINGLE_BASE = np.uint64(1_000_003)
+
+
+# ── Signatures ───────────────────────────────────────────────
+
+def shingles(text: str, k: int = SHINGLE_SIZE) -> np.ndarray:
+    """Unique 32-bit hashes of the k-word shingles of normalized text.
+
+    Words are hashed once (CRC-32) and each shingle's hash is a polynomial
+    combination of its word hashes, so no shingle strings are built.
+    """
+    words = _TOKEN.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    h = np.fromiter(map(zlib.crc32, map(str.encode, words)), dtype=np.uint64, count=len(words))
+    n = max(len(words) - k + 1, 1)
+    grams = h[:n].copy()
+    with np.errstate(over="ignore"):
+        for j in range(1, min(k, len(words))):
+            grams = grams * _SHINGLE_BASE + h[j:j + n]
+    # Fold to 32 bits for the multiply-shift MinHash family
+    return np.unique((grams ^ (grams >> np.uint64(32))) & np.uint64(0xFFFFFFFF))
+
+
+def _hash_params(num_perm: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)  # odd multipliers
+    b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signatures(shingle_sets: list[np.ndarray], num_perm: int = NUM_PERM, seed: int = SEED) -> np.ndarray:
+    """(n, num_perm) uint32 signatures using multiply-shift hashes (a·x + b) >> 32."""
+    a, b = _hash_params(num_perm, seed)
+    sigs = np.full((len(shingle_sets), num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        for i, s in enumerate(shingle_sets):
+            if len(s):
+                sigs[i] = ((s[:, None] * a[None, :] + b[None, :]) >> np.uint64(32)).min(axis=0)
+    return sigs
+
+
+# ── LSH ──────────────────────────────────────────────────────
+
+def _collision_probability(s: np.ndarray, bands: int, rows: int) -> np.ndarray:
+    return 1 - (1 - s ** rows) ** bands
+
+
+def lsh_params(threshold: float, num_perm: int = NUM_PERM, fn_weight: float = FN_WEIGHT) -> tuple[int, int]:
+    """(bands, rows) with bands × rows ≤ num_perm minimizing the weighted area of
+    false positives (similarity below threshold yet bucketed together) and
+    false negatives (above threshold yet never bucketed together).
+
+    Candidates are verified with exact Jaccard, so false negatives are
+    weighted more heavily than false positives, which only cost time.
+    """
+    # Midpoint-rule integrals over [0, threshold] and [threshold, 1]
+    lo = (np.arange(200) + 0.5) / 200 * threshold
+    hi = threshold + (np.arange(200) + 0.5) / 200 * (1 - threshold)
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        fp = _collision_probability(lo, bands, rows).mean() * threshold
+        fn = (1 - _collision_probability(hi, bands, rows)).mean() * (1 - threshold)
+        cost = (1 - fn_weight) * fp + fn_weight * fn
+        if best is None or cost < best[0]:
+            best = (cost, bands, rows)
+    return best[1], best[2]
+
+
+def candidate_pairs(signatures: np.ndarray, bands: int, rows: int) -> set[tuple[int, int]]:
+    """Index pairs that share at least one band bucket."""
+    pairs = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        chunk = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for i, row in enumerate(chunk):
+            buckets[row.tobytes()].append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pairs.add((members[x], members[y]))
+    return pairs
+
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    if not len(a) and not len(b):
+        return 1.0
+    inter = len(np.intersect1d(a, b, assume_unique=True))
+    return inter / (len(a) + len(b) - inter)
+
+
+# ── Clustering ───────────────────────────────────────────────
+
+def _find(parent: list[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _keep_order(article: dict, protected: set) -> tuple:
+    # Prefer already-selected articles, then the fullest record, then the lowest PMID
+    pmid = str(article.get("pmid", ""))
+    return (pmid not in protected, -len(article.get("abstract") or ""),
+            int(pmid) if pmid.isdigit() else float("inf"), pmid)
+
+
+def find_near_duplicates(
+    articles: list[dict],
+    threshold: float = DEFAULT_THRESHOLD,
+    num_perm: int = NUM_PERM,
+    shingle_size: int = SHINGLE_SIZE,
+    protected: Optional[set] = None,
+) -> list[dict]:
+    """Clusters of near-duplicate articles (title + abstract Jaccard ≥ threshold).
+
+    Returns one dict per cluster of two or more articles:
+    {"pmids", "keep", "drop", "min_similarity", "max_similarity"}. The kept
+    article is a protected PMID if any, else the one with the longest abstract.
+    """
+    protected = protected or set()
+    sets = [shingles(f"{a.get('title', '')} {a.get('abstract', '')}", shingle_size) for a in articles]
+    bands, rows = lsh_params(threshold, num_perm)
+    sigs = minhash_signatures(sets, num_perm)
+
+    parent = list(range(len(articles)))
+    similarities = defaultdict(list)
+    for i, j in candidate_pairs(sigs, bands, rows):
+        sim = jaccard(sets[i], sets[j])
+        if sim >= threshold:
+            ri, rj = _find(parent, i), _find(parent, j)
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+            similarities[(i, j)] = sim
+
+    groups = defaultdict(list)
+    for i in range(len(articles)):
+        groups[_find(parent, i)].append(i)
+    root_sims = defaultdict(list)
+    for (i, _), sim in similarities.items():
+        root_sims[_find(parent, i)].append(sim)
+
+    clusters = []
+    for root, members in groups.items():
+        if len(members) < 2:
+            continue
+        ordered = sorted(members, key=lambda i: _keep_order(articles[i], protected))
+        clusters.append({
+            "pmids": [str(articles[i]["pmid"]) for i in sorted(members)],
+            "keep": str(articles[ordered[0]]["pmid"]),
+            "drop": [str(articles[i]["pmid"]) for i in ordered[1:]],
+            "min_similarity": round(min(root_sims[root]), 4),
+            "max_similarity": round(max(root_sims[root]), 4),
+        })
+    return sorted(clusters, key=lambda c: c["keep"])
+
+
+def drop_near_duplicates(
+    articles: list[dict],
+    threshold: float = DEFAULT_THRESHOLD,
+    protected: Optional[set] = None,
+) -> tuple[list[dict], list[dict]]:
+    """(articles without the dropped near-duplicates, cluster report)."""
+    clusters = find_near_duplicates(articles, threshold, protected=protected)
+    dropped = {pmid for c in clusters for pmid in c["drop"]}
+    return [a for a in articles if str(a["pmid"]) not in dropped], clusters
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Report near-duplicate abstracts")
+    parser.add_argument("paths", nargs="+", help="JSON files of articles (lists or {'corpus': [...]})")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    articles = {}
+    for path in args.paths:
+        with open(path) as f:
+            data = json.load(f)
+        for art in data["corpus"] if isinstance(data, dict) else data:
+            articles.setdefault(art["pmid"], art)
+
+    start = time.monotonic()
+    clusters = find_near_duplicates(list(articles.values()), args.threshold)
+    print(f"{len(articles)} articles → {len(clusters)} near-duplicate clusters "
+          f"({sum(len(c['drop']) for c in clusters)} to drop) in {time.monotonic() - start:.1f}s")
+    for c in clusters:
+        print(f"  keep {c['keep']}  drop {', '.join(c['drop'])}  "
+              f"(Jaccard {c['min_similarity']:.2f}–{c['max_similarity']:.2f})")
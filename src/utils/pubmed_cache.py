@@ -0,0 +1,157 @@
+"""
+On-disk cache for PubMed E-utilities responses and parsed article records.
+
+Two stores share one SQLite file:
+  - responses: JSON bodies of searches (the PMID list a search resolved to
+    on the history server), keyed by the SHA-256 of their normalized request
+    parameters (api_key excluded, whitespace in the query collapsed), so the
+    same search with or without a key hits the same entry
+  - articles: one parsed record per PMID, so overlapping queries reuse each
+    other's efetch results. PMIDs that efetch returned without an abstract are
+    stored as empty records and not requested again.
+
+Entries older than their TTL are treated as misses. In offline mode TTLs are
+ignored and any miss raises CacheMiss instead of touching the network, which
+makes corpus rebuilds reproducible from the cache alone.
+
+Usage:
+    from src.utils.pubmed_cache import PubmedCache
+    cache = PubmedCache("data/corpus/.pubmed_cache/pubmed.sqlite", ttl=7 * 86400)
+    articles = fetch_corpus(query, cache=cache)
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+CACHE_PATH = "data/corpus/.pubmed_cache/pubmed.sqlite"
+EXCLUDED_PARAMS = {"api_key", "tool", "email"}
+
+
+class CacheMiss(LookupError):
+    """Raised in offline mode when a request is not in the cache."""
+
+
+def normalize_params(params: dict) -> dict:
+    """Request parameters that identify a response (credentials dropped, query normalized)."""
+    normalized = {}
+    for key, value in params.items():
+        if key in EXCLUDED_PARAMS:
+            continue
+        value = str(value)
+        if key == "term":
+            value = re.sub(r"\s+", " ", value).strip()
+        normalized[key] = value
+    return dict(sorted(normalized.items()))
+
+
+def request_key(endpoint: str, params: dict) -> str:
+    payload = json.dumps({"endpoint": endpoint, "params": normalize_params(params)}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PubmedCache:
+    """Thread-safe SQLite cache of E-utilities responses and per-PMID articles.
+
+    Args:
+        path: SQLite file (created with its parent directory if missing)
+        ttl: Max age in seconds of cached responses (None = never expire)
+        article_ttl: Max age in seconds of article records (None = never expire)
+        offline: Serve from the cache only; misses raise CacheMiss
+    """
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        ttl: Optional[float] = None,
+        article_ttl: Optional[float] = None,
+        offline: bool = False,
+    ):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.article_ttl = article_ttl
+        self.offline = offline
+        self.stats = {"response_hits": 0, "response_misses": 0, "article_hits": 0, "article_misses": 0}
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS responses "
+                               "(key TEXT PRIMARY KEY, endpoint TEXT, params TEXT, fetched_at REAL, body TEXT)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS articles "
+                               "(pmid TEXT PRIMARY KEY, fetched_at REAL, record TEXT)")
+
+    def close(self):
+        self._conn.close()
+
+    def _fresh(self, fetched_at: float, ttl: Optional[float]) -> bool:
+        return self.offline or ttl is None or time.time() - fetched_at <= ttl
+
+    # ── Responses ────────────────────────────────────────────
+
+    def get_response(self, endpoint: str, params: dict):
+        """Cached JSON body for a request, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute("SELECT fetched_at, body FROM responses WHERE key = ?",
+                                     (request_key(endpoint, params),)).fetchone()
+            hit = row is not None and self._fresh(row[0], self.ttl)
+            self.stats["response_hits" if hit else "response_misses"] += 1
+        if hit:
+            return json.loads(row[1])
+        if self.offline:
+            raise CacheMiss(f"{endpoint} {normalize_params(params)} not cached (offline mode)")
+        return None
+
+    def put_response(self, endpoint: str, params: dict, body):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (request_key(endpoint, params), endpoint, json.dumps(normalize_params(params)),
+                 time.time(), json.dumps(body)),
+            )
+
+    # ── Articles ─────────────────────────────────────────────
+
+    def get_articles(self, pmids: list[str]) -> dict[str, Optional[dict]]:
+        """Cached records for the PMIDs present; None marks a PMID without an abstract."""
+        found = {}
+        with self._lock:
+            for i in range(0, len(pmids), 500):
+                chunk = pmids[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT pmid, fetched_at, record FROM articles WHERE pmid IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for pmid, fetched_at, record in rows:
+                    if self._fresh(fetched_at, self.article_ttl):
+                        found[pmid] = json.loads(record) if record else None
+            self.stats["article_hits"] += len(found)
+            self.stats["article_misses"] += len(set(pmids)) - len(found)
+        return found
+
+    def missing(self, pmids: list[str]) -> list[str]:
+        """PMIDs (deduplicated, in order) with no fresh record; those cached as empty count as present."""
+        present = set()
+        with self._lock:
+            for i in range(0, len(pmids), 500):
+                chunk = pmids[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT pmid, fetched_at FROM articles WHERE pmid IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                present.update(pmid for pmid, fetched_at in rows if self._fresh(fetched_at, self.article_ttl))
+        return [p for p in dict.fromkeys(pmids) if p not in present]
+
+    def put_articles(self, records: dict[str, Optional[dict]]):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO articles VALUES (?, ?, ?)",
+                [(pmid, now, json.dumps(rec, ensure_ascii=False) if rec else None)
+                 for pmid, rec in records.items()],
+            )
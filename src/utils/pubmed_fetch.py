@@ -2,25 +2,61 @@
 PubMed E-utilities fetcher for PM2.5/respiratory corpus construction.
 
 Uses NCBI E-utilities (esearch + efetch) via urllib — no extra dependencies.
-Respects NCBI rate limits (3 req/s without API key, 10 req/s with).
+Respects NCBI rate limits (3 req/s without API key, 10 req/s with) through a
+process-wide token bucket shared by every request, so efetch batches can be
+fetched concurrently without exceeding the limit. Failed requests are retried
+with exponential backoff.
+
+Searches are posted to the E-utilities history server (usehistory=y) and the
+result set is paged with retstart against its WebEnv/query_key, so PMID lists
+never travel in URLs and result sets are not capped by a single esearch retmax.
+Pages are yielded in order as they arrive.
+
+efetch responses are parsed incrementally with iterparse straight off the
+response stream; each PubmedArticle is cleared once parsed, so memory stays
+flat regardless of response size.
+
+With a PubmedCache (src/utils/pubmed_cache.py) the same history-server route
+is used: a search's PMIDs are listed off the history server (efetch
+rettype=uilist) and cached, PMIDs missing from the article cache are posted
+back with epost and streamed into the cache page by page, and the result is
+then read from the cache in pages, so only PMIDs not seen by any earlier
+query are fetched and memory stays flat either way.
 
 Usage:
     python -m src.utils.pubmed_fetch --output data/corpus/raw/pubmed_raw.json
 """
 
+import http.client
+import io
 import json
+import threading
 import time
+import urllib.error
 import urllib.request
 import urllib.parse
 import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
+
+from src.utils.pubmed_cache import CACHE_PATH, CacheMiss, PubmedCache
 
 ESEARCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
 EFETCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+EPOST_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/epost.fcgi"
+
+# NCBI rate limits (requests/sec)
+RATE_WITH_KEY = 10.0
+RATE_WITHOUT_KEY = 3.0
 
-# Rate limit: 3 requests/sec without API key
-REQUEST_DELAY = 0.35
+EFETCH_BATCH_SIZE = 200
+ID_PAGE_SIZE = 10000  # PMIDs per efetch rettype=uilist page
+DATE_TYPE = "edat"  # Entrez date: when the record was added to PubMed
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0  # seconds; doubles per attempt
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
 # PubMed query for PM2.5 + respiratory hospitalizations + time-series
 QUERY_BROAD = (
@@ -44,73 +80,350 @@ QUERY_DESIGN = (
 )
 
 
-def esearch(query: str, retmax: int = 2000, api_key: Optional[str] = None) -> list[str]:
-    """Search PubMed and return list of PMIDs."""
+# ── Rate limiting and retries ────────────────────────────────
+
+class RateLimiter:
+    """Thread-safe token bucket: at most `rate` requests/sec, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_limiters: dict[float, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limiter(api_key: Optional[str] = None) -> RateLimiter:
+    """The process-wide limiter for the rate allowed with (or without) an API key."""
+    rate = RATE_WITH_KEY if api_key else RATE_WITHOUT_KEY
+    with _limiters_lock:
+        if rate not in _limiters:
+            _limiters[rate] = RateLimiter(rate)
+        return _limiters[rate]
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code in RETRY_STATUS
+    return isinstance(error, (urllib.error.URLError, TimeoutError, ConnectionError,
+                              http.client.HTTPException, ET.ParseError))
+
+
+def _with_retries(fn, limiter: RateLimiter, max_retries: int = MAX_RETRIES, label: str = "request"):
+    """Call fn() under the rate limiter, retrying transient failures with backoff."""
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_retries or not _retryable(e):
+                raise
+            wait = BACKOFF_BASE * 2 ** attempt
+            print(f"  WARNING: {label} failed ({e}); retrying in {wait:.0f}s")
+            time.sleep(wait)
+
+
+def _http_get(url: str, timeout: int) -> bytes:
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return resp.read()
+
+
+def _http_post(url: str, data: dict, timeout: int) -> bytes:
+    req = urllib.request.Request(url, data=urllib.parse.urlencode(data).encode(), method="POST")
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.read()
+
+
+def _http_open(url: str, timeout: int):
+    """Open a URL for streaming reads (a context manager over the response)."""
+    return urllib.request.urlopen(url, timeout=timeout)
+
+
+# ── E-utilities ──────────────────────────────────────────────
+
+def _date_params(mindate: Optional[str], maxdate: Optional[str]) -> dict:
+    """esearch date-range parameters (YYYY/MM/DD); E-utilities needs both bounds."""
+    if not mindate and not maxdate:
+        return {}
+    return {"datetype": DATE_TYPE, "mindate": mindate or "1800/01/01", "maxdate": maxdate or "3000/12/31"}
+
+
+def esearch_history(query: str, api_key: Optional[str] = None, mindate: Optional[str] = None,
+                    maxdate: Optional[str] = None) -> dict:
+    """Run a search on the history server; returns {"count", "webenv", "query_key"}."""
     params = {
         "db": "pubmed",
         "term": query,
-        "retmax": str(retmax),
+        "usehistory": "y",
+        "retmax": "0",
         "retmode": "json",
         "sort": "relevance",
+        **_date_params(mindate, maxdate),
     }
     if api_key:
         params["api_key"] = api_key
 
     url = f"{ESEARCH_URL}?{urllib.parse.urlencode(params)}"
-    with urllib.request.urlopen(url, timeout=30) as resp:
-        data = json.loads(resp.read().decode())
+    data = _with_retries(lambda: json.loads(_http_get(url, timeout=30).decode()),
+                         rate_limiter(api_key), label="esearch")
 
     result = data.get("esearchresult", {})
-    count = int(result.get("count", 0))
-    pmids = result.get("idlist", [])
-    print(f"  esearch: {count} total results, fetched {len(pmids)} PMIDs")
+    history = {
+        "count": int(result.get("count", 0)),
+        "webenv": result.get("webenv"),
+        "query_key": result.get("querykey"),
+    }
+    print(f"  esearch: {history['count']} total results on the history server")
+    return history
+
+
+def epost(pmids: list[str], api_key: Optional[str] = None) -> dict:
+    """Post a PMID list to the history server (in the request body, not the URL).
+
+    Returns a history dict like esearch_history, so the set can be paged with
+    iter_efetch_history.
+    """
+    data = {"db": "pubmed", "id": ",".join(pmids)}
+    if api_key:
+        data["api_key"] = api_key
+    root = _with_retries(lambda: ET.fromstring(_http_post(EPOST_URL, data, timeout=60)),
+                         rate_limiter(api_key), label="epost")
+    if root.find("ERROR") is not None:
+        raise ValueError(f"epost failed: {root.findtext('ERROR')}")
+    return {"count": len(pmids), "webenv": root.findtext("WebEnv"), "query_key": root.findtext("QueryKey")}
+
+
+def _fetch_ids(history: dict, retstart: int, retmax: int, api_key: Optional[str]) -> list[str]:
+    params = {
+        "db": "pubmed",
+        "WebEnv": history["webenv"],
+        "query_key": history["query_key"],
+        "retstart": str(retstart),
+        "retmax": str(retmax),
+        "rettype": "uilist",
+        "retmode": "text",
+    }
+    if api_key:
+        params["api_key"] = api_key
+
+    url = f"{EFETCH_URL}?{urllib.parse.urlencode(params)}"
+    return _http_get(url, timeout=60).decode().split()
+
+
+def search_pmids(
+    query: str,
+    retmax: Optional[int] = None,
+    api_key: Optional[str] = None,
+    cache: Optional[PubmedCache] = None,
+    mindate: Optional[str] = None,
+    maxdate: Optional[str] = None,
+) -> list[str]:
+    """PMIDs of a search (up to retmax), listed off the history server.
+
+    The list is paged with efetch rettype=uilist against the search's WebEnv,
+    so it is not capped at esearch's 10,000 records. With a cache the list is
+    stored as the search's response and reused while within the cache TTL.
+    """
+    params = {"db": "pubmed", "term": query, "usehistory": "y", "retmax": str(retmax or "all"),
+              **_date_params(mindate, maxdate)}
+    if cache is not None:
+        body = cache.get_response(ESEARCH_URL, params)
+        if body is not None:
+            print(f"  esearch: {body['count']} total results, {len(body['idlist'])} PMIDs (cached)")
+            return body["idlist"]
+
+    history = esearch_history(query, api_key=api_key, mindate=mindate, maxdate=maxdate)
+    n = history["count"] if retmax is None else min(history["count"], retmax)
+    limiter = rate_limiter(api_key)
+    pmids = []
+    for start in range(0, n, ID_PAGE_SIZE):
+        pmids.extend(_with_retries(
+            lambda start=start: _fetch_ids(history, start, min(ID_PAGE_SIZE, n - start), api_key),
+            limiter, label=f"efetch uilist {start // ID_PAGE_SIZE + 1}"))
+    if cache is not None:
+        cache.put_response(ESEARCH_URL, params, {"count": history["count"], "idlist": pmids})
     return pmids
 
 
-def efetch_batch(pmids: list[str], api_key: Optional[str] = None) -> list[dict]:
-    """Fetch article details for a batch of PMIDs (max 200 per request)."""
-    articles = []
-    batch_size = 200
+def _fetch_batch(batch: list[str], api_key: Optional[str]) -> list[dict]:
+    params = {
+        "db": "pubmed",
+        "id": ",".join(batch),
+        "rettype": "xml",
+        "retmode": "xml",
+    }
+    if api_key:
+        params["api_key"] = api_key
 
-    for i in range(0, len(pmids), batch_size):
-        batch = pmids[i:i + batch_size]
-        params = {
-            "db": "pubmed",
-            "id": ",".join(batch),
-            "rettype": "xml",
-            "retmode": "xml",
-        }
-        if api_key:
-            params["api_key"] = api_key
-
-        url = f"{EFETCH_URL}?{urllib.parse.urlencode(params)}"
-        with urllib.request.urlopen(url, timeout=60) as resp:
-            xml_data = resp.read().decode()
-
-        articles.extend(_parse_pubmed_xml(xml_data))
-        print(f"  efetch: batch {i // batch_size + 1}, "
-              f"fetched {len(batch)} articles (total: {len(articles)})")
-        time.sleep(REQUEST_DELAY)
+    url = f"{EFETCH_URL}?{urllib.parse.urlencode(params)}"
+    with _http_open(url, timeout=60) as resp:
+        return list(iter_pubmed_articles(resp))
 
-    return articles
 
+def _fetch_page(history: dict, retstart: int, retmax: int, api_key: Optional[str]) -> list[dict]:
+    params = {
+        "db": "pubmed",
+        "WebEnv": history["webenv"],
+        "query_key": history["query_key"],
+        "retstart": str(retstart),
+        "retmax": str(retmax),
+        "rettype": "xml",
+        "retmode": "xml",
+    }
+    if api_key:
+        params["api_key"] = api_key
+
+    url = f"{EFETCH_URL}?{urllib.parse.urlencode(params)}"
+    with _http_open(url, timeout=60) as resp:
+        return list(iter_pubmed_articles(resp))
+
+
+def _ordered_fetch(tasks: list, api_key: Optional[str], max_workers: Optional[int],
+                   max_retries: int, label: str) -> Iterator[list[dict]]:
+    """Run zero-argument fetch tasks concurrently; yield their results in task order.
+
+    At most 2 × max_workers tasks are in flight, so memory stays bounded by the
+    window rather than the size of the result set.
+    """
+    limiter = rate_limiter(api_key)
+    if max_workers is None:
+        max_workers = int(limiter.rate)
+    max_workers = max(1, min(max_workers, len(tasks)))
+
+    def submit(executor, i):
+        return executor.submit(_with_retries, tasks[i], limiter, max_retries, f"{label} {i + 1}")
+
+    window = 2 * max_workers
+    total = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque(submit(executor, i) for i in range(min(window, len(tasks))))
+        for done in range(1, len(tasks) + 1):
+            articles = pending.popleft().result()
+            if done - 1 + window < len(tasks):
+                pending.append(submit(executor, done - 1 + window))
+            total += len(articles)
+            print(f"  {label}: {done}/{len(tasks)} ({len(articles)} articles, total: {total})")
+            yield articles
+
+
+def efetch_batch(
+    pmids: list[str],
+    api_key: Optional[str] = None,
+    batch_size: int = EFETCH_BATCH_SIZE,
+    max_workers: Optional[int] = None,
+    max_retries: int = MAX_RETRIES,
+) -> list[dict]:
+    """Fetch article details in batches of PMIDs (max 200 per request).
+
+    Batches are fetched concurrently under the shared rate limiter and each is
+    retried with backoff on transient failures. Articles are returned in the
+    order of `pmids`'s batches regardless of completion order.
+    """
+    tasks = [lambda b=pmids[i:i + batch_size]: _fetch_batch(b, api_key)
+             for i in range(0, len(pmids), batch_size)]
+    if not tasks:
+        return []
+    pages = _ordered_fetch(tasks, api_key, max_workers, max_retries, "efetch batch")
+    return [art for page in pages for art in page]
 
-def _parse_pubmed_xml(xml_str: str) -> list[dict]:
-    """Parse PubMed XML to extract article metadata."""
-    articles = []
-    root = ET.fromstring(xml_str)
 
-    for article_elem in root.findall(".//PubmedArticle"):
+def efetch_cached(
+    pmids: list[str],
+    cache: PubmedCache,
+    api_key: Optional[str] = None,
+    batch_size: int = EFETCH_BATCH_SIZE,
+) -> Iterator[list[dict]]:
+    """Pages of articles for pmids (in order), fetching only those not already cached.
+
+    Missing PMIDs are posted to the history server and their efetch pages are
+    written to the cache as they arrive; the result is then read back from the
+    cache batch_size PMIDs at a time.
+    """
+    missing = cache.missing(pmids)
+    print(f"  cache: {len(set(pmids)) - len(missing)} articles cached, {len(missing)} to fetch")
+    if missing:
+        if cache.offline:
+            raise CacheMiss(f"{len(missing)} PMIDs not cached (offline mode), e.g. {missing[:5]}")
+        returned = set()
+        for page in iter_efetch_history(epost(missing, api_key), api_key=api_key, batch_size=batch_size):
+            cache.put_articles({art["pmid"]: art for art in page})
+            returned.update(art["pmid"] for art in page)
+        # PMIDs efetch skipped (no abstract) are cached as empty records
+        cache.put_articles({pmid: None for pmid in missing if pmid not in returned})
+    for i in range(0, len(pmids), batch_size):
+        chunk = pmids[i:i + batch_size]
+        records = cache.get_articles(chunk)
+        yield [records[p] for p in chunk if records.get(p)]
+
+
+def iter_efetch_history(
+    history: dict,
+    api_key: Optional[str] = None,
+    max_records: Optional[int] = None,
+    batch_size: int = EFETCH_BATCH_SIZE,
+    max_workers: Optional[int] = None,
+    max_retries: int = MAX_RETRIES,
+) -> Iterator[list[dict]]:
+    """Page through a history-server result set with retstart, yielding pages in order."""
+    n = history["count"] if max_records is None else min(history["count"], max_records)
+    tasks = [lambda start=start: _fetch_page(history, start, min(batch_size, n - start), api_key)
+             for start in range(0, n, batch_size)]
+    if tasks:
+        yield from _ordered_fetch(tasks, api_key, max_workers, max_retries, "efetch page")
+
+
+# ── XML parsing ──────────────────────────────────────────────
+
+def iter_pubmed_articles(source) -> Iterator[dict]:
+    """Stream articles from PubMed XML (a path or binary file object).
+
+    Uses iterparse and clears each PubmedArticle after it is parsed, so peak
+    memory is bounded by one article rather than the whole response.
+    """
+    context = ET.iterparse(source, events=("start", "end"))
+    root = None
+    for event, elem in context:
+        if root is None:
+            root = elem
+        if event != "end" or elem.tag != "PubmedArticle":
+            continue
         try:
-            art = _parse_single_article(article_elem)
+            art = _parse_single_article(elem)
             if art:
-                articles.append(art)
+                yield art
         except Exception as e:
-            pmid_el = article_elem.find(".//PMID")
+            pmid_el = elem.find(".//PMID")
             pmid = pmid_el.text if pmid_el is not None else "unknown"
             print(f"  WARNING: failed to parse PMID {pmid}: {e}")
+        # Drop the parsed article and detach it from the root
+        elem.clear()
+        root.clear()
 
-    return articles
+
+def _parse_pubmed_xml(xml_str: str) -> list[dict]:
+    """Parse PubMed XML to extract article metadata."""
+    return list(iter_pubmed_articles(io.BytesIO(xml_str.encode())))
+
+
+def _text(elem) -> str:
+    """Text content of a mixed-content element (e.g. with <i>/<sup> children)."""
+    return "".join(elem.itertext())
 
 
 def _parse_single_article(elem) -> Optional[dict]:
@@ -126,13 +439,13 @@ def _parse_single_article(elem) -> Optional[dict]:
     title = title_el.text if title_el is not None else ""
     # Handle mixed content (italic tags etc.)
     if title_el is not None and title_el.text is None:
-        title = ET.tostring(title_el, encoding="unicode", method="text").strip()
+        title = _text(title_el).strip()
 
     # Abstract
     abstract_parts = []
     for abs_el in elem.findall(".//AbstractText"):
         label = abs_el.get("Label", "")
-        text = ET.tostring(abs_el, encoding="unicode", method="text").strip()
+        text = _text(abs_el).strip()
         if label:
             abstract_parts.append(f"{label}: {text}")
         else:
@@ -201,36 +514,64 @@ def _parse_single_article(elem) -> Optional[dict]:
     }
 
 
+# ── Pipeline ─────────────────────────────────────────────────
+
 def fetch_corpus(
     query: str = QUERY_BROAD,
-    retmax: int = 2000,
+    retmax: Optional[int] = 2000,
     output_path: Optional[str] = None,
     api_key: Optional[str] = None,
+    cache: Optional[PubmedCache] = None,
+    mindate: Optional[str] = None,
+    maxdate: Optional[str] = None,
 ) -> list[dict]:
-    """Full pipeline: search + fetch + deduplicate + save."""
+    """Full pipeline: search + fetch + deduplicate + save.
+
+    retmax caps the number of records fetched; None fetches the whole result set.
+    Both paths page the history server; with a cache, only PMIDs missing from
+    it are fetched. mindate/maxdate (YYYY/MM/DD) limit the search to records
+    added to PubMed in that range.
+    """
     print(f"=== PubMed Corpus Fetch ===")
     print(f"Query: {query[:100]}...")
     print()
 
-    # Step 1: Search
-    print("[1/3] Searching PubMed...")
-    pmids = esearch(query, retmax=retmax, api_key=api_key)
-    if not pmids:
-        print("ERROR: No results found.")
-        return []
-
-    # Step 2: Fetch details
-    print(f"\n[2/3] Fetching {len(pmids)} article details...")
-    articles = efetch_batch(pmids, api_key=api_key)
+    if cache is not None:
+        # Step 1: Resolve PMIDs through cached esearch pages
+        print("[1/3] Searching PubMed (cached)...")
+        pmids = search_pmids(query, retmax=retmax, api_key=api_key, cache=cache,
+                             mindate=mindate, maxdate=maxdate)
+        if not pmids:
+            print("ERROR: No results found.")
+            return []
+
+        # Step 2: Serve cached articles, fetch the rest
+        print(f"\n[2/3] Fetching {len(pmids)} article details...")
+        pages = efetch_cached(pmids, cache, api_key=api_key)
+    else:
+        # Step 1: Search on the history server
+        print("[1/3] Searching PubMed...")
+        history = esearch_history(query, api_key=api_key, mindate=mindate, maxdate=maxdate)
+        if not history["count"]:
+            print("ERROR: No results found.")
+            return []
+
+        # Step 2: Stream article pages as they arrive
+        n = history["count"] if retmax is None else min(history["count"], retmax)
+        print(f"\n[2/3] Fetching {n} article details...")
+        pages = iter_efetch_history(history, api_key=api_key, max_records=retmax)
 
     # Step 3: Deduplicate by PMID
     seen = set()
     unique = []
-    for art in articles:
-        if art["pmid"] not in seen:
-            seen.add(art["pmid"])
-            unique.append(art)
-    print(f"\n[3/3] Deduplication: {len(articles)} → {len(unique)} unique articles")
+    n_articles = 0
+    for page in pages:
+        n_articles += len(page)
+        for art in page:
+            if art["pmid"] not in seen:
+                seen.add(art["pmid"])
+                unique.append(art)
+    print(f"\n[3/3] Deduplication: {n_articles} → {len(unique)} unique articles")
 
     # Save
     if output_path:
@@ -243,6 +584,77 @@ def fetch_corpus(
     return unique
 
 
+def fetch_multi_query(
+    queries: list[tuple],
+    api_key: Optional[str] = None,
+    cache: Optional[PubmedCache] = None,
+    mindate: Optional[str] = None,
+    maxdate: Optional[str] = None,
+) -> list[dict]:
+    """Fetch several queries with one shared efetch pass over the union of their PMIDs.
+
+    queries holds (label, query, retmax) tuples. Each search runs on the
+    history server (concurrently, under the shared rate limiter) and its PMIDs
+    are listed off it, so no query is capped at 10,000 records. The union is
+    fetched once: posted back with epost and streamed in efetch pages, or
+    served through the cache. Each article appears once, in order of first
+    match, tagged with "matched_queries" (every label whose search returned it).
+    """
+    print(f"=== PubMed Multi-Query Fetch ({len(queries)} queries) ===\n")
+    print("[1/2] Searching PubMed...")
+    with ThreadPoolExecutor(max_workers=len(queries) or 1) as executor:
+        id_lists = list(executor.map(
+            lambda q: search_pmids(q[1], retmax=q[2], api_key=api_key, cache=cache,
+                                   mindate=mindate, maxdate=maxdate),
+            queries,
+        ))
+
+    matched: dict[str, list[str]] = {}
+    for (label, _, _), pmids in zip(queries, id_lists):
+        print(f"  {label}: {len(pmids)} PMIDs")
+        for pmid in pmids:
+            labels = matched.setdefault(pmid, [])
+            if label not in labels:
+                labels.append(label)
+    total = sum(len(ids) for ids in id_lists)
+    print(f"  union: {total} → {len(matched)} unique PMIDs")
+
+    print(f"\n[2/2] Fetching {len(matched)} article details...")
+    pmids = list(matched)
+    if not pmids:
+        return []
+    if cache is not None:
+        pages = efetch_cached(pmids, cache, api_key=api_key)
+    else:
+        pages = iter_efetch_history(epost(pmids, api_key), api_key=api_key)
+    articles = []
+    for page in pages:
+        for art in page:
+            art["matched_queries"] = matched[art["pmid"]]
+            articles.append(art)
+    # The history server need not keep the posted order
+    order = {pmid: i for i, pmid in enumerate(pmids)}
+    articles.sort(key=lambda art: order[art["pmid"]])
+    return articles
+
+
+def add_cache_arguments(parser):
+    """Cache flags shared by the PubMed fetch CLIs."""
+    parser.add_argument("--cache", default=CACHE_PATH, help="Response cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Always fetch from PubMed")
+    parser.add_argument("--cache-ttl", type=float, default=None,
+                        help="Max age of cached search results in hours (default: never expire)")
+    parser.add_argument("--offline", action="store_true",
+                        help="Serve only from the cache; fail on any miss")
+
+
+def cache_from_args(args) -> Optional[PubmedCache]:
+    if args.no_cache:
+        return None
+    ttl = args.cache_ttl * 3600 if args.cache_ttl is not None else None
+    return PubmedCache(args.cache, ttl=ttl, offline=args.offline)
+
+
 if __name__ == "__main__":
     import argparse
     import os
@@ -263,8 +675,11 @@ if __name__ == "__main__":
         "--retmax", "-n",
         type=int,
         default=2000,
-        help="Maximum PMIDs to retrieve (default: 2000)",
+        help="Maximum PMIDs to retrieve (default: 2000; 0 for all results)",
     )
+    parser.add_argument("--mindate", default=None,
+                        help="Only records added to PubMed since this date (YYYY/MM/DD)")
+    add_cache_arguments(parser)
     args = parser.parse_args()
 
     api_key = os.environ.get("NCBI_API_KEY")
@@ -272,8 +687,10 @@ if __name__ == "__main__":
 
     articles = fetch_corpus(
         query=query,
-        retmax=args.retmax,
+        retmax=args.retmax or None,
         output_path=args.output,
         api_key=api_key,
+        cache=cache_from_args(args),
+        mindate=args.mindate,
     )
     print(f"\nDone. Total articles with abstracts: {len(articles)}")
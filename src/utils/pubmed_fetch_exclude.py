@@ -12,7 +12,7 @@ from pathlib import Path
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
-from src.utils.pubmed_fetch import fetch_corpus
+from src.utils.pubmed_fetch import add_cache_arguments, cache_from_args, fetch_multi_query
 
 # Query 1: PM10-only studies (no PM2.5)
 QUERY_PM10_ONLY = (
@@ -48,45 +48,36 @@ QUERY_CARDIOVASCULAR = (
     'AND ("time series" OR "case-crossover")'
 )
 
+QUERIES = [
+    ("PM10-only", QUERY_PM10_ONLY, 150),
+    ("Mortality-only", QUERY_MORTALITY, 150),
+    ("Reviews", QUERY_REVIEWS, 150),
+    ("Cardiovascular", QUERY_CARDIOVASCULAR, 150),
+]
+
 
 if __name__ == "__main__":
-    api_key = os.environ.get("NCBI_API_KEY")
-    all_exclude = []
+    import argparse
 
-    queries = [
-        ("PM10-only", QUERY_PM10_ONLY, 150),
-        ("Mortality-only", QUERY_MORTALITY, 150),
-        ("Reviews", QUERY_REVIEWS, 150),
-        ("Cardiovascular", QUERY_CARDIOVASCULAR, 150),
-    ]
+    parser = argparse.ArgumentParser(description="Fetch near-miss exclusion candidates from PubMed")
+    add_cache_arguments(parser)
+    args = parser.parse_args()
 
-    for label, query, retmax in queries:
-        print(f"\n{'='*60}")
-        print(f"Fetching: {label}")
-        print(f"{'='*60}")
-        articles = fetch_corpus(
-            query=query,
-            retmax=retmax,
-            api_key=api_key,
-        )
-        for art in articles:
-            art["exclude_reason"] = label
-        all_exclude.extend(articles)
+    api_key = os.environ.get("NCBI_API_KEY")
+    cache = cache_from_args(args)
 
-    # Deduplicate
-    seen = set()
-    unique = []
-    for art in all_exclude:
-        if art["pmid"] not in seen:
-            seen.add(art["pmid"])
-            unique.append(art)
+    # One concurrent search per query, then a single efetch pass over the union
+    articles = fetch_multi_query(QUERIES, api_key=api_key, cache=cache)
+    for art in articles:
+        art["exclude_reason"] = art["matched_queries"][0]
+    n_matches = sum(len(art["matched_queries"]) for art in articles)
 
     print(f"\n{'='*60}")
-    print(f"Total exclude candidates: {len(all_exclude)} → {len(unique)} unique")
+    print(f"Total exclude candidates: {n_matches} query matches → {len(articles)} unique")
     print(f"{'='*60}")
 
     out_path = Path("data/corpus/raw/pubmed_exclude_candidates.json")
     out_path.parent.mkdir(parents=True, exist_ok=True)
     with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(unique, f, indent=2, ensure_ascii=False)
+        json.dump(articles, f, indent=2, ensure_ascii=False)
     print(f"Saved to {out_path}")
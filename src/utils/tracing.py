@@ -0,0 +1,144 @@
+"""
+Lightweight tracing spans for pipeline phases.
+
+A span times one phase (prompt building, the HTTP request, JSON extraction,
+schema validation, hashing, retry sleeps, disk writes, ...) and carries
+attributes such as model, run and corpus_id. Child spans inherit their
+parent's attributes, so a per-call span opened with corpus_id inside a run
+span opened with model and run tags everything beneath it with all three.
+
+Finished spans go to a local file, either as JSONL (one span per line) or
+as a Chrome trace (load in chrome://tracing or https://ui.perfetto.dev).
+
+When tracing is disabled span() returns a shared no-op context manager, so
+instrumented code pays one global lookup per span.
+
+Usage:
+    from src.utils import tracing
+    tracing.enable("trace.json")             # .json → Chrome trace, else JSONL
+    with tracing.span("inference", model="llama3-8b", corpus_id="ABS-0001"):
+        ...
+    tracing.disable()                        # flush and close the file
+
+    python run_experiment.py --model llama3-8b --runs 1 --trace trace.json
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+_attributes: contextvars.ContextVar = contextvars.ContextVar("trace_attributes", default={})
+_tracer: Optional["Tracer"] = None
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    """One timed phase; attributes can be added while it is open with set()."""
+
+    __slots__ = ("tracer", "name", "attrs", "start", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = {**_attributes.get(), **attrs}
+
+    def __enter__(self):
+        self._token = _attributes.set(self.attrs)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        _attributes.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer.record(self.name, self.start, end, self.attrs)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """Collects finished spans and writes them as JSONL or a Chrome trace."""
+
+    def __init__(self, path: str, fmt: Optional[str] = None):
+        self.path = Path(path)
+        self.format = fmt or ("chrome" if self.path.suffix == ".json" else "jsonl")
+        if self.format not in ("chrome", "jsonl"):
+            raise ValueError(f"Unknown trace format: {self.format}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._events: list[dict] = []
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._file = open(self.path, "w") if self.format == "jsonl" else None
+
+    def record(self, name: str, start_ns: int, end_ns: int, attrs: dict):
+        ts = (start_ns - self._origin) / 1000
+        dur = (end_ns - start_ns) / 1000
+        tid = threading.get_ident()
+        if self.format == "jsonl":
+            line = json.dumps({"name": name, "ts_us": round(ts, 1), "dur_us": round(dur, 1),
+                               "pid": self._pid, "tid": tid, "attrs": attrs}, default=str)
+            with self._lock:
+                self._file.write(line + "\n")
+        else:
+            event = {"name": name, "ph": "X", "ts": round(ts, 1), "dur": round(dur, 1),
+                     "pid": self._pid, "tid": tid, "args": attrs}
+            with self._lock:
+                self._events.append(event)
+
+    def close(self):
+        with self._lock:
+            if self.format == "jsonl":
+                self._file.close()
+            else:
+                with open(self.path, "w") as f:
+                    json.dump({"traceEvents": self._events, "displayTimeUnit": "ms"}, f, default=str)
+
+
+def enable(path: str, fmt: Optional[str] = None) -> Tracer:
+    """Start recording spans to path (replacing any active tracer)."""
+    global _tracer
+    disable()
+    _tracer = Tracer(path, fmt)
+    return _tracer
+
+
+def disable():
+    """Stop recording and write out the trace file."""
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+        _tracer = None
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, **attrs):
+    """Context manager timing one phase; a no-op while tracing is disabled."""
+    if _tracer is None:
+        return _NOOP
+    return Span(_tracer, name, attrs)
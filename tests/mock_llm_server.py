@@ -0,0 +1,296 @@
+"""
+Local mock LLM server speaking the wire formats of the model runners.
+
+Serves, on one port:
+  - POST /v1/messages                           Anthropic Messages
+  - POST /v1beta/models/{model}:generateContent  Gemini generateContent
+  - POST /api/generate, GET /api/tags           Ollama
+
+Outputs are canned and deterministic: each prompt is hashed to pick a valid
+screening decision or extraction record (extraction when the prompt names the
+"estimates" array). Latency is drawn from a configurable distribution, and a seeded
+RNG injects HTTP 429 and 5xx errors and malformed (truncated) JSON outputs at
+configurable rates. `script` forces the status of the first requests, which
+tests use to exercise retries deterministically.
+
+The real runners are pointed at the server with patch_runners(), which swaps
+the Anthropic and Gemini base URLs; Ollama takes the server URL as its
+endpoint.
+
+Usage:
+    from tests.mock_llm_server import MockLLMServer, patch_runners
+    with MockLLMServer(latency=("lognormal", 50, 0.5), rate_429=0.02) as server, patch_runners(server.url):
+        run_screening(corpus, {"id": "m", "provider": "anthropic"}, 1, prompt)
+
+    python -m tests.mock_llm_server --port 8808 --latency 50
+"""
+
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Union
+
+_GEMINI_PATH = re.compile(r"^/v1beta/models/(?P<model>[^/:]+):generateContent")
+# Only the extraction prompt quotes its output key; abstracts may say estimates
+EXTRACTION_MARKER = '"estimates"'
+
+
+# ── Canned outputs ───────────────────────────────────────────
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+
+
+def canned_output(prompt: str) -> str:
+    """Deterministic, schema-valid JSON output for a prompt."""
+    h = _digest(prompt)
+    if EXTRACTION_MARKER in prompt:
+        estimate = 1.0 + (h % 50) / 1000
+        return json.dumps({
+            "study_id": f"mock-{h % 10000:04d}",
+            "study_location": "Mock City",
+            "study_period": "2010-2015",
+            "study_design": ["time_series", "case_crossover", "other"][h % 3],
+            "population": "general",
+            "sample_size": None,
+            "estimates": [{
+                "effect_measure": "RR",
+                "effect_estimate": round(estimate, 3),
+                "ci_lower": round(estimate - 0.01, 3),
+                "ci_upper": round(estimate + 0.01, 3),
+                "ci_level": 95,
+                "exposure_increment": "10 µg/m³",
+                "lag": "lag0-1",
+                "outcome_specific": "respiratory admissions",
+                "covariates": ["temperature", "humidity"],
+            }],
+        })
+    return json.dumps({
+        "decision": ["include", "exclude", "uncertain"][h % 3],
+        "confidence": round(0.5 + (h % 50) / 100, 2),
+        "rationale": "Canned mock rationale for benchmarking the pipeline.",
+        "exposure": "PM2.5",
+        "outcome": "respiratory_hospitalization",
+        "study_design": "time_series",
+        "has_effect_estimate": bool(h % 2),
+    })
+
+
+# ── Wire formats ─────────────────────────────────────────────
+
+def _anthropic(model: str, text: str, input_tokens: int, output_tokens: int) -> dict:
+    return {"id": f"msg_mock_{_digest(text) % 10 ** 8}", "type": "message", "role": "assistant",
+            "model": model, "content": [{"type": "text", "text": text}], "stop_reason": "end_turn",
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens}}
+
+
+def _gemini(model: str, text: str, input_tokens: int, output_tokens: int) -> dict:
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": input_tokens, "candidatesTokenCount": output_tokens,
+                              "totalTokenCount": input_tokens + output_tokens},
+            "modelVersion": model}
+
+
+def _ollama(model: str, text: str, input_tokens: int, output_tokens: int, elapsed_ns: int) -> dict:
+    return {"model": model, "response": text, "done": True, "done_reason": "stop",
+            "total_duration": elapsed_ns, "load_duration": 0,
+            "prompt_eval_count": input_tokens, "prompt_eval_duration": elapsed_ns // 4,
+            "eval_count": output_tokens, "eval_duration": elapsed_ns - elapsed_ns // 4}
+
+
+# ── Server ───────────────────────────────────────────────────
+
+class MockLLMServer:
+    """Threaded mock of the Anthropic, Gemini and Ollama inference endpoints.
+
+    Args:
+        latency: Milliseconds per request: a number, ("fixed", ms),
+            ("uniform", lo, hi) or ("lognormal", median, sigma)
+        rate_429: Probability of a 429 Too Many Requests response
+        rate_5xx: Probability of a 500/503 response
+        malformed_rate: Probability of a truncated, unparseable JSON output
+        script: HTTP statuses forced for the first requests (200 = normal)
+        seed: Seed of the fault and latency RNG
+        host, port: Bind address (port 0 picks a free port)
+    """
+
+    def __init__(
+        self,
+        latency: Union[float, tuple] = 0.0,
+        rate_429: float = 0.0,
+        rate_5xx: float = 0.0,
+        malformed_rate: float = 0.0,
+        script: Optional[list[int]] = None,
+        seed: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.malformed_rate = malformed_rate
+        self.script = list(script or [])
+        self.stats = {"requests": 0, "ok": 0, "429": 0, "5xx": 0, "malformed": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _draw(self) -> tuple[int, float, bool]:
+        """(status, latency seconds, malformed) for the next request."""
+        with self._lock:
+            self.stats["requests"] += 1
+            if self.script:
+                status = self.script.pop(0)
+            else:
+                u = self._rng.random()
+                status = 429 if u < self.rate_429 else (
+                    self._rng.choice([500, 503]) if u < self.rate_429 + self.rate_5xx else 200)
+            malformed = status == 200 and self._rng.random() < self.malformed_rate
+            delay = self._latency_ms() / 1000
+            self.stats["ok" if status == 200 else "429" if status == 429 else "5xx"] += 1
+            self.stats["malformed"] += malformed
+        return status, delay, malformed
+
+    def _latency_ms(self) -> float:
+        spec = self.latency
+        if isinstance(spec, (int, float)):
+            return float(spec)
+        kind, *params = spec
+        if kind == "fixed":
+            return float(params[0])
+        if kind == "uniform":
+            return self._rng.uniform(params[0], params[1])
+        if kind == "lognormal":
+            return self._rng.lognormvariate(math.log(params[0]), params[1])
+        raise ValueError(f"Unknown latency distribution: {kind}")
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: dict):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.startswith("/api/tags"):
+                    self._send(200, {"models": [{"name": "mock:latest", "digest": "sha256:mock",
+                                                 "size": 0, "details": {"family": "mock"}}]})
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                gemini = _GEMINI_PATH.match(self.path)
+                if self.path.startswith("/v1/messages"):
+                    prompt = payload["messages"][-1]["content"]
+                elif gemini:
+                    prompt = payload["contents"][-1]["parts"][0]["text"]
+                elif self.path.startswith("/api/generate"):
+                    prompt = payload["prompt"]
+                else:
+                    self._send(404, {"error": "not found"})
+                    return
+
+                start = time.perf_counter_ns()
+                status, delay, malformed = server._draw()
+                if delay > 0:
+                    time.sleep(delay)
+                if status != 200:
+                    message = "Too Many Requests" if status == 429 else "Internal Server Error"
+                    self._send(status, {"error": {"type": "mock_error", "message": message}})
+                    return
+
+                text = canned_output(prompt)
+                if malformed:
+                    text = text[:len(text) // 2]
+                input_tokens, output_tokens = len(prompt) // 4, len(text) // 4
+                if self.path.startswith("/v1/messages"):
+                    body = _anthropic(payload.get("model", "mock"), text, input_tokens, output_tokens)
+                elif gemini:
+                    body = _gemini(gemini.group("model"), text, input_tokens, output_tokens)
+                else:
+                    body = _ollama(payload.get("model", "mock"), text, input_tokens, output_tokens,
+                                   time.perf_counter_ns() - start)
+                self._send(200, body)
+
+        return Handler
+
+
+@contextmanager
+def patch_runners(base_url: str):
+    """Point the Anthropic and Gemini runners (and dummy API keys) at a mock server."""
+    from src.models import claude_runner, gemini_runner
+    saved = (claude_runner.API_URL, gemini_runner.API_BASE,
+             os.environ.get("ANTHROPIC_API_KEY"), os.environ.get("GEMINI_API_KEY"))
+    claude_runner.API_URL = f"{base_url}/v1/messages"
+    gemini_runner.API_BASE = f"{base_url}/v1beta/models"
+    os.environ.setdefault("ANTHROPIC_API_KEY", "mock-key")
+    os.environ.setdefault("GEMINI_API_KEY", "mock-key")
+    try:
+        yield
+    finally:
+        claude_runner.API_URL, gemini_runner.API_BASE = saved[:2]
+        for name, value in zip(("ANTHROPIC_API_KEY", "GEMINI_API_KEY"), saved[2:]):
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the mock LLM server")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency", type=float, default=0.0, help="Median latency in ms (lognormal, σ=0.5)")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    latency = ("lognormal", args.latency, 0.5) if args.latency else 0.0
+    server = MockLLMServer(latency, args.rate_429, args.rate_5xx, args.malformed_rate, port=args.port)
+    print(f"Mock LLM server on {server.url} (Ctrl-C to stop)")
+    try:
+        server.start()._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,475 @@
+"""Tests for cross-run analysis: metrics store and evaluation engines."""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from src.analysis.arrays import MISSING, clear_cache, encode_decisions, load_decision_tensor
+from src.analysis.screening_eval import (
+    confusion_counts,
+    evaluate_screening,
+    rates_from_confusion,
+)
+from src.analysis import extraction_eval
+from src.analysis.extraction_eval import (
+    evaluate_run,
+    match_estimates,
+    normalize_lag,
+    parse_estimates,
+)
+from src.analysis.estimates import build_estimates_table
+from src.analysis.stability import estimate_stability, grouped_stats
+from src.analysis.build import build, define_targets
+from src.analysis.figures import render_figures, spec_hash
+from src.analysis.permutation import flip_rate, mean_kappa, permutation_test
+from src.analysis.metrics_store import (
+    add_run,
+    kappa_from_table,
+    load_store,
+    summarize_store,
+    update_metrics_store,
+)
+
+CORPUS_IDS = ["ABS-0001", "ABS-0002", "ABS-0003", "ABS-0004"]
+
+
+def _results(decisions: list[str]) -> list[dict]:
+    return [
+        {"corpus_id": cid, "output": {"decision": d} if d else {"error": "json_parse_failed"}}
+        for cid, d in zip(CORPUS_IDS, decisions)
+    ]
+
+
+def _write_run(output_dir, model_id, stage, run_id, results):
+    run_dir = output_dir / model_id / stage / f"run_{run_id:03d}"
+    run_dir.mkdir(parents=True)
+    (run_dir / "results.json").write_text(json.dumps(results))
+
+
+@pytest.fixture
+def corpus_path(tmp_path):
+    path = tmp_path / "corpus.json"
+    path.write_text(json.dumps({"corpus": [{"corpus_id": cid} for cid in CORPUS_IDS]}))
+    return str(path)
+
+
+@pytest.fixture
+def gold_path(tmp_path):
+    labels = [
+        {"corpus_id": "ABS-0001", "final_label": "include"},
+        {"corpus_id": "ABS-0002", "final_label": "exclude"},
+        {"corpus_id": "ABS-0003", "final_label": None},
+        {"corpus_id": "ABS-0004", "final_label": "include"},
+    ]
+    path = tmp_path / "screening_labels.json"
+    path.write_text(json.dumps({"labels": labels}))
+    return str(path)
+
+
+# ── Metrics Store Tests ─────────────────────────────────────
+
+class TestMetricsStore:
+    """Test incremental sufficient statistics for screening runs."""
+
+    RUNS = {
+        1: ["include", "exclude", "uncertain", "include"],
+        2: ["include", "exclude", "include", "exclude"],
+        3: ["include", "include", "uncertain", None],
+    }
+
+    def _store(self, gold_path, order=(1, 2, 3)):
+        store = load_store("/nonexistent", "m", "screening")
+        for run_id in order:
+            add_run(store, run_id, _results(self.RUNS[run_id]), CORPUS_IDS, gold_path=gold_path)
+        return store
+
+    def test_encode_missing(self):
+        codes = encode_decisions(_results(["include", None, "uncertain", "exclude"]), CORPUS_IDS)
+        assert codes.tolist() == [0, MISSING, 2, 1]
+
+    def test_tallies_and_flip_rate(self, gold_path):
+        summary = summarize_store(self._store(gold_path))
+        assert summary["n_runs"] == 3
+        # ABS-0002, ABS-0003 and ABS-0004 flip across runs
+        assert summary["flip_rate"] == pytest.approx(0.75)
+
+    def test_pairwise_kappa_matches_direct(self, gold_path):
+        store = self._store(gold_path)
+        # Runs 1 vs 2: 2/4 agree; marginals inc {2,2}, exc {1,2}, unc {1,0}
+        po, pe = 0.5, (2 * 2 + 1 * 2 + 1 * 0) / 16
+        assert kappa_from_table(store["pairwise"]["1-2"]) == pytest.approx((po - pe) / (1 - pe))
+
+    def test_order_independent(self, gold_path):
+        a = summarize_store(self._store(gold_path, order=(1, 2, 3)))
+        b = summarize_store(self._store(gold_path, order=(3, 1, 2)))
+        assert a["pairwise_kappa"] == pytest.approx(b["pairwise_kappa"])
+        assert a["flip_rate"] == b["flip_rate"]
+
+    def test_confusion_skips_unlabeled(self, gold_path):
+        summary = summarize_store(self._store(gold_path))
+        run1 = summary["per_run"][1]
+        assert run1["n_labeled"] == 3
+        assert run1["sensitivity"] == 1.0
+        assert run1["specificity"] == 1.0
+        run3 = summary["per_run"][3]
+        assert run3["n_missing"] == 1
+
+    def test_redone_run_replaces_previous(self, gold_path, tmp_path):
+        out = str(tmp_path / "raw")
+        for run_id in (1, 2):
+            update_metrics_store(out, "m", "screening", run_id,
+                                 _results(self.RUNS[run_id]), CORPUS_IDS, gold_path=gold_path)
+        store = update_metrics_store(out, "m", "screening", 2,
+                                     _results(self.RUNS[1]), CORPUS_IDS, gold_path=gold_path)
+        summary = summarize_store(store)
+        assert summary["n_runs"] == 2
+        assert summary["flip_rate"] == 0.0
+        assert np.array(store["tallies"]).sum() == 2 * len(CORPUS_IDS)
+
+
+# ── Screening Evaluation Tests ──────────────────────────────
+
+class TestScreeningEval:
+    """Test batched confusion matrices against the gold standard."""
+
+    GOLD = np.array([0, 1, -1, 0], dtype=np.int8)  # include, exclude, unlabeled, include
+
+    def test_confusion_counts_batched(self):
+        decisions = np.array([
+            [[0, 1, 0, 2], [0, 0, 1, MISSING]],
+        ], dtype=np.int8)
+        counts = confusion_counts(decisions, self.GOLD)
+        assert counts.shape == (1, 2, 2, 4)
+        assert counts[0, 0].tolist() == [[1, 0, 1, 0], [0, 1, 0, 0]]
+        assert counts[0, 1].tolist() == [[1, 0, 0, 1], [1, 0, 0, 0]]
+
+    def test_uncertain_policies(self):
+        counts = confusion_counts(np.array([0, 1, 0, 2], dtype=np.int8), self.GOLD)
+        as_include = rates_from_confusion(counts, policy="include")
+        as_exclude = rates_from_confusion(counts, policy="exclude")
+        dropped = rates_from_confusion(counts, policy="drop")
+        assert as_include["sensitivity"] == 1.0
+        assert as_exclude["sensitivity"] == 0.5
+        assert dropped["sensitivity"] == 1.0
+        assert dropped["n_evaluated"] == 2
+
+    def test_wss(self):
+        # 2 of 3 labeled screened out at full recall → WSS = 1/3
+        gold = np.array([0, 1, 1], dtype=np.int8)
+        counts = confusion_counts(np.array([0, 1, 0], dtype=np.int8), gold)
+        assert rates_from_confusion(counts)["wss"] == pytest.approx(1 / 3)
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            rates_from_confusion(np.zeros((2, 4)), policy="maybe")
+
+    def test_evaluate_all_models_and_runs(self, tmp_path, corpus_path, gold_path):
+        out = tmp_path / "raw"
+        _write_run(out, "a", "screening", 1, _results(["include", "exclude", "include", "include"]))
+        _write_run(out, "a", "screening", 2, _results(["include", "include", "include", None]))
+        _write_run(out, "b", "screening", 2, _results(["exclude", "exclude", "uncertain", "include"]))
+        clear_cache()
+
+        table = evaluate_screening(["a", "b"], output_dir=str(out),
+                                   corpus_path=corpus_path, gold_path=gold_path)
+        assert list(zip(table.model_id, table.run_id)) == [("a", 1), ("a", 2), ("b", 2)]
+        assert table.f1.tolist()[0] == 1.0
+        assert table.n_missing.tolist() == [0, 1, 0]
+        assert table.sensitivity.tolist()[2] == 0.5
+
+        run_ids, tensor, present = load_decision_tensor(str(out), ["a", "b"], CORPUS_IDS)
+        assert run_ids == [1, 2]
+        assert present.tolist() == [[True, True], [False, True]]
+        assert (tensor[1, 0] == MISSING).all()
+
+
+# ── Extraction Matching Tests ───────────────────────────────
+
+def _estimate(value, lo, hi, measure="RR", lag="lag0", outcome="all_respiratory", **extra):
+    return {"effect_measure": measure, "effect_estimate": value, "ci_lower": lo,
+            "ci_upper": hi, "lag": lag, "outcome_specific": outcome, **extra}
+
+
+class TestExtractionMatching:
+    """Test optimal estimate assignment and field-level scoring."""
+
+    GOLD = [
+        _estimate(1.023, 1.005, 1.042, lag="lag0-1"),
+        _estimate(1.048, 1.010, 1.087, outcome="asthma"),
+    ]
+
+    def test_normalize_lag(self):
+        assert normalize_lag("lag0-1") == "0-1"
+        assert normalize_lag("L0-1") == "0-1"
+        assert normalize_lag("lag07") == "0-7"
+        assert normalize_lag("Lag Day 2") == "2"
+        assert normalize_lag(None) == ""
+
+    def test_match_is_order_independent(self):
+        extracted = [
+            _estimate(1.049, 1.010, 1.087, outcome="Asthma"),
+            _estimate(1.023, 1.005, 1.042, lag="L0-1"),
+        ]
+        pairs = match_estimates(parse_estimates(self.GOLD), parse_estimates(extracted))
+        assert sorted(pairs) == [(0, 1), (1, 0)]
+
+    def test_unrelated_estimate_left_unmatched(self):
+        extracted = [_estimate(2.5, 1.9, 3.1, measure="OR", lag="lag5", outcome="pneumonia")]
+        pairs = match_estimates(parse_estimates(self.GOLD), parse_estimates(extracted))
+        assert pairs == []
+
+    def test_evaluate_run_exact_and_tolerance(self):
+        gold = {"ABS-0001": parse_estimates(self.GOLD)}
+        gold["ABS-0001"]["key"] = "g1"
+        results = [{
+            "corpus_id": "ABS-0001",
+            "output_hash": "h1",
+            "output": {"estimates": [
+                _estimate(1.023, 1.005, 1.042, lag="lag0-1"),
+                _estimate(1.051, 1.010, 1.087, outcome="asthma"),
+            ]},
+        }]
+        extraction_eval.clear_caches()
+        row = evaluate_run(results, gold)
+        assert row["recall"] == 1.0
+        assert row["effect_estimate_exact_rate"] == 0.5
+        assert row["effect_estimate_tolerance_rate"] == 1.0
+        assert row["effect_estimate_mae"] == pytest.approx(0.0015)
+
+    def test_identical_outputs_parsed_once(self):
+        gold = {"ABS-0001": parse_estimates(self.GOLD)}
+        gold["ABS-0001"]["key"] = "g1"
+        result = {"corpus_id": "ABS-0001", "output_hash": "same",
+                  "output": {"estimates": list(self.GOLD)}}
+        extraction_eval.clear_caches()
+        for _ in range(3):
+            evaluate_run([result], gold)
+        assert len(extraction_eval._PARSE_CACHE) == 1
+        assert len(extraction_eval._MATCH_CACHE) == 1
+
+    def test_parse_cache_keyed_by_increment_and_bounded(self, monkeypatch):
+        estimates = [{k: v for k, v in e.items() if k != "exposure_increment"} for e in self.GOLD]
+        extraction_eval.clear_caches()
+        per_10 = extraction_eval.cached_estimates("h", estimates, "per 10 µg/m³")
+        per_iqr = extraction_eval.cached_estimates("h", estimates, "per IQR")
+        assert per_10["raw"][0]["exposure_increment"] == "per 10 µg/m³"
+        assert per_iqr["raw"][0]["exposure_increment"] == "per IQR"
+
+        monkeypatch.setattr(extraction_eval, "PARSE_CACHE_SIZE", 3)
+        for i in range(10):
+            extraction_eval.cached_estimates(f"h{i}", estimates)
+        assert list(extraction_eval._PARSE_CACHE) == [("h7", None), ("h8", None), ("h9", None)]
+
+
+# ── Stability Tests ─────────────────────────────────────────
+
+class TestStability:
+    """Test cross-run alignment and grouped stability statistics."""
+
+    A = _estimate(1.023, 1.005, 1.042, lag="lag0-1")
+    B = _estimate(1.048, 1.010, 1.087, outcome="asthma")
+
+    def _write_runs(self, out, runs):
+        for run_id, estimates in runs.items():
+            _write_run(out, "m", "extraction", run_id, [{
+                "corpus_id": "ABS-0001",
+                "output_hash": f"h{run_id}",
+                "output": {"estimates": estimates},
+            }])
+        extraction_eval.clear_caches()
+
+    def test_grouped_stats(self):
+        group = np.array([0, 0, 0, 1, 1, 2])
+        values = np.array([1.0, 1.0, 2.0, 3.0, np.nan, 5.0])
+        stats = grouped_stats(group, values, 3)
+        assert stats["n"].tolist() == [3, 1, 1]
+        assert stats["range"].tolist() == [1.0, 0.0, 0.0]
+        assert stats["modal_share"][0] == pytest.approx(2 / 3)
+        assert stats["sd"][0] == pytest.approx(np.std([1, 1, 2], ddof=1))
+        assert np.isnan(stats["sd"][1])
+
+    def test_identical_values_have_zero_cv(self):
+        stats = grouped_stats(np.zeros(10, dtype=int), np.full(10, 1.0031), 1)
+        assert stats["cv"][0] == 0.0
+
+    def test_runs_aligned_by_slot(self, tmp_path):
+        out = tmp_path / "raw"
+        self._write_runs(out, {1: [self.A, self.B], 2: [self.B, self.A], 3: [dict(self.A, effect_estimate=1.025)]})
+        estimates, set_sizes = build_estimates_table(["m"], str(out))
+        slot_of_a = estimates[estimates.lag == "lag0-1"].groupby("run_id")["slot"].first()
+        assert slot_of_a.nunique() == 1
+        assert set_sizes.n_estimates.tolist() == [2, 2, 1]
+
+    def test_stability_table(self, tmp_path):
+        out = tmp_path / "raw"
+        self._write_runs(out, {1: [self.A, self.B], 2: [self.B, self.A], 3: [dict(self.A, effect_estimate=1.025)]})
+        table = estimate_stability(["m"], str(out))
+        row_a = table[table.lag == "lag0-1"].iloc[0]
+        assert row_a.effect_estimate_n == 3
+        assert row_a.effect_estimate_range == pytest.approx(0.002)
+        assert row_a.effect_estimate_modal_share == pytest.approx(2 / 3)
+        assert row_a.n_runs_set_size_changed == 1
+        row_b = table[table.outcome_specific == "asthma"].iloc[0]
+        assert row_b.effect_estimate_cv == 0.0
+
+
+# ── Permutation Tests ───────────────────────────────────────
+
+class TestPermutation:
+    """Test batched permutation statistics and the sampling engine."""
+
+    def _data(self, a, b):
+        return {"n_a": {"flip_rate": len(a), "kappa": len(a)},
+                "decisions": np.concatenate([a, b]).astype(np.int8), "estimates": None}
+
+    def test_mean_kappa_matches_store(self):
+        rng = np.random.default_rng(0)
+        d = rng.choice(4, size=(1, 4, 50), p=[0.4, 0.4, 0.15, 0.05]).astype(np.int8)
+        kappas = []
+        for i in range(4):
+            for j in range(i + 1, 4):
+                table = np.zeros((4, 4))
+                np.add.at(table, (d[0, i], d[0, j]), 1)
+                kappas.append(kappa_from_table(table))
+        assert mean_kappa(d)[0] == pytest.approx(np.mean(kappas))
+
+    def test_flip_rate_ignores_missing(self):
+        d = np.array([[[0, 1, 0], [0, 1, MISSING], [0, 0, 1]]], dtype=np.int8)
+        assert flip_rate(d)[0] == pytest.approx(2 / 3)
+
+    def test_detects_difference_and_reports_null(self):
+        rng = np.random.default_rng(1)
+        base = rng.choice(2, size=200)
+        stable = np.tile(base, (6, 1))
+        noisy = np.where(rng.random((6, 200)) < 0.3, 1 - base, base)
+        result = permutation_test(self._data(stable, noisy), ("flip_rate", "kappa"),
+                                  min_permutations=400, max_permutations=400, batch_size=20)
+        assert result["flip_rate"]["observed"] < 0
+        assert result["flip_rate"]["p_value"] < 0.01
+        assert len(result["kappa"]["null"]) == result["kappa"]["n_permutations"] >= 400
+
+    def test_early_stop_and_reproducible(self):
+        rng = np.random.default_rng(2)
+        a = rng.choice(3, size=(4, 50))
+        b = rng.choice(3, size=(4, 50))
+        kwargs = dict(min_permutations=200, max_permutations=5000, batch_size=10,
+                      mc_se_threshold=0.5, scheme="abstracts", seed=7)
+        first = permutation_test(self._data(a, b), ("kappa",), **kwargs)
+        second = permutation_test(self._data(a, b), ("kappa",), **kwargs)
+        assert first["kappa"]["n_permutations"] < 5000
+        np.testing.assert_array_equal(first["kappa"]["null"], second["kappa"]["null"])
+
+    def test_unknown_scheme(self):
+        with pytest.raises(ValueError):
+            permutation_test(self._data(np.zeros((2, 3)), np.zeros((2, 3))), ("kappa",), scheme="rows")
+
+
+# ── Build Tests ─────────────────────────────────────────────
+
+def _copy_input(target):
+    with open(target["args"]["source"]) as src, open(target["outputs"][0], "w") as out:
+        out.write(src.read())
+
+
+def _record_worker(target):
+    with open(target["outputs"][0], "w") as out:
+        out.write(f"{os.getpid()} {target['args'].get('jobs')}")
+
+
+class TestBuild:
+    """Test incremental, input-tracked rebuilds."""
+
+    def _screening_targets(self, out, corpus_path, gold_path, analysis):
+        return [t for t in define_targets(str(out), corpus_path, gold_path, "missing.json", str(analysis))
+                if t["name"].startswith("screening_vs_gold")]
+
+    def _write_screening(self, out, model_id, run_id, decisions):
+        _write_run(out, model_id, "screening", run_id, _results(decisions))
+        card = {"provenance": {"aggregate_output_hash": f"{model_id}-{run_id}-{decisions}"}}
+        (out / model_id / "screening" / f"run_{run_id:03d}" / "run_card.json").write_text(json.dumps(card))
+
+    def test_only_affected_targets_rebuilt(self, tmp_path, corpus_path, gold_path):
+        out, analysis = tmp_path / "raw", tmp_path / "analysis"
+        for model_id in ("m1", "m2"):
+            self._write_screening(out, model_id, 1, ["include", "exclude", "include", "exclude"])
+
+        first = build(self._screening_targets(out, corpus_path, gold_path, analysis), str(analysis))
+        assert sorted(first["built"]) == ["screening_vs_gold:m1", "screening_vs_gold:m2"]
+        assert (analysis / "tables" / "screening_vs_gold_include_m1.csv").exists()
+
+        self._write_screening(out, "m1", 2, ["include", "include", "include", "exclude"])
+        second = build(self._screening_targets(out, corpus_path, gold_path, analysis), str(analysis))
+        assert second["built"] == ["screening_vs_gold:m1"]
+        assert second["skipped"] == ["screening_vs_gold:m2"]
+
+    def test_parallel_target_runs_in_parent_after_pool(self, tmp_path):
+        targets = [{"name": name, "builder": _record_worker, "outputs": [str(tmp_path / f"{name}.txt")],
+                    "inputs": {}, "args": {}, "parallel": name == "figures"} for name in ("t1", "t2", "figures")]
+        assert build(targets, str(tmp_path), jobs=2)["built"] == ["t1", "t2", "figures"]
+        workers = {name: (tmp_path / f"{name}.txt").read_text().split() for name in ("t1", "t2", "figures")}
+        assert workers["figures"] == [str(os.getpid()), "2"]
+        assert all(workers[name][0] != str(os.getpid()) for name in ("t1", "t2"))
+
+    def test_missing_or_forced_outputs_rebuilt(self, tmp_path):
+        source = tmp_path / "source.txt"
+        source.write_text("a")
+        targets = [{"name": name, "builder": _copy_input, "outputs": [str(tmp_path / f"{name}.txt")],
+                    "inputs": {"version": 1}, "args": {"source": str(source)}} for name in ("t1", "t2")]
+
+        assert build(targets, str(tmp_path), jobs=2)["built"] == ["t1", "t2"]
+        assert build(targets, str(tmp_path))["built"] == []
+        (tmp_path / "t2.txt").unlink()
+        assert build(targets, str(tmp_path))["built"] == ["t2"]
+        assert build(targets, str(tmp_path), force=["t1"])["built"] == ["t1"]
+
+
+# ── Figure Tests ────────────────────────────────────────────
+
+class TestFigures:
+    """Test figure rendering with data-hash skipping."""
+
+    EST = {"effect_measure": "RR", "lag": "lag0-1", "outcome_specific": "all_respiratory",
+           "exposure_increment": "per 10 µg/m³"}
+
+    def _write_extraction(self, out, run_id, effect):
+        _write_run(out, "m", "extraction", run_id, [{
+            "corpus_id": cid,
+            "output_hash": f"h{run_id}-{cid}-{effect}",
+            "output": {"estimates": [dict(self.EST, effect_estimate=effect + i / 100,
+                                          ci_lower=effect - 0.01, ci_upper=effect + i / 50)]},
+        } for i, cid in enumerate(CORPUS_IDS[:3])])
+        extraction_eval.clear_caches()
+
+    def test_spec_hash_sees_array_contents(self):
+        data = {"y": np.linspace(0, 1, 5000), "title": "t"}
+        changed = {"y": data["y"].copy(), "title": "t"}
+        changed["y"][2500] += 1e-12
+        assert spec_hash("forest", data) == spec_hash("forest", dict(data))
+        assert spec_hash("forest", data) != spec_hash("forest", changed)
+        assert spec_hash("forest", data) != spec_hash("overlay", data)
+
+    def test_renders_then_skips_unchanged(self, tmp_path, corpus_path):
+        out, figures = tmp_path / "raw", tmp_path / "figures"
+        self._write_extraction(out, 1, 1.02)
+        self._write_extraction(out, 2, 1.03)
+        for run_id, decisions in ((1, ["include", "exclude", "include", "exclude"]),
+                                  (2, ["include", "include", "include", "exclude"])):
+            _write_run(out, "m", "screening", run_id, _results(decisions))
+
+        first = render_figures(["m"], str(out), corpus_path, str(figures))
+        assert sorted(first["rendered"]) == [
+            "m/forest_run_001.png", "m/forest_run_002.png", "m/kappa_heatmap.png",
+            "m/pooled_overlay.png", "pooled_overlay.png",
+        ]
+        assert all((figures / p).stat().st_size > 0 for p in first["rendered"])
+
+        second = render_figures(["m"], str(out), corpus_path, str(figures))
+        assert second["rendered"] == []
+
+        # A new run re-renders its forest plot and the overlays, nothing else
+        self._write_extraction(out, 3, 1.05)
+        third = render_figures(["m"], str(out), corpus_path, str(figures))
+        assert sorted(third["rendered"]) == ["m/forest_run_003.png", "m/pooled_overlay.png",
+                                             "pooled_overlay.png"]
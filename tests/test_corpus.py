@@ -132,3 +132,216 @@ class TestExtractionLabels:
             assert "effect_estimate" in est
             assert "ci_lower" in est
             assert "ci_upper" in est
+
+
+# ── Classifier Tests ────────────────────────────────────────
+
+def _reference_criteria(article: dict) -> dict:
+    """The per-pattern searches classify_abstract used before the combined scan."""
+    from src.utils.corpus_builder import CRITERIA_PATTERNS, FULL_TEXT_PATTERNS
+    text = f"{article.get('title', '')} {article.get('abstract', '')}"
+    full_text = f"{text} {' '.join(article.get('pub_types', []))} {' '.join(article.get('mesh_terms', []))}"
+    return {name: bool(pat.search(full_text if name in FULL_TEXT_PATTERNS else text))
+            for name, pat in CRITERIA_PATTERNS.items()}
+
+
+class TestClassifier:
+    """Verify the single-pass classifier against per-pattern searches."""
+
+    MESH = ["Disease Model, Animal", "Models, Animal", "Time Factors", "Meta-Analysis as Topic", "Cardiovascular Diseases",
+            "Asthma", "Mice", "Particulate Matter", "Hospitalization"]
+    PUB_TYPES = ["Journal Article", "Review", "Systematic Review", "Meta-Analysis", "Comparative Study"]
+
+    def test_matches_per_pattern_search(self, corpus):
+        import random
+        from src.utils.corpus_builder import scan_criteria
+
+        rng = random.Random(0)
+        for art in corpus["corpus"]:
+            for _ in range(3):
+                art = dict(art, mesh_terms=rng.sample(self.MESH, rng.randint(0, 4)),
+                           pub_types=rng.sample(self.PUB_TYPES, rng.randint(0, 2)))
+                text = f"{art['title']} {art['abstract']}"
+                full_text = f"{text} {' '.join(art['pub_types'])} {' '.join(art['mesh_terms'])}"
+                assert scan_criteria(text, full_text) == _reference_criteria(art), art["corpus_id"]
+
+    def test_text_only_criteria_ignore_mesh(self):
+        from src.utils.corpus_builder import classify_abstract
+
+        art = {"title": "An animal study of PM2.5", "abstract": "Mice were exposed.",
+               "mesh_terms": ["Disease Model, Animal", "Cardiovascular Diseases"], "pub_types": []}
+        assert _reference_criteria(art)["animal"]
+        # "animal" in the title and "model" only in MeSH: matches full text, not title + abstract
+        art["abstract"] = "Hospital admissions rose."
+        assert not _reference_criteria(art)["animal"]
+        assert classify_abstract(art)["exclusion_reasons"] == []
+
+    def test_lowered_patterns_keep_escapes(self):
+        import re
+        from src.utils.corpus_builder import _lower_pattern
+
+        pattern = re.compile(r"\bPM\S*2\.5\B|Non-\W?Human", re.IGNORECASE)
+        assert _lower_pattern(pattern) == r"\bpm\S*2\.5\B|non-\W?human"
+        lowered = re.compile(_lower_pattern(pattern))
+        for text in ("PM-2.5x", "pm 2.5x", "NON-HUMAN", "Non- human", "non-human"):
+            assert bool(lowered.search(text.lower())) == bool(pattern.search(text))
+        with pytest.raises(ValueError):
+            _lower_pattern(re.compile("PM2.5"))
+
+    def test_stored_criteria_reproduced(self, corpus):
+        from src.utils.corpus_builder import classify_abstract
+
+        for art in corpus["corpus"]:
+            criteria = classify_abstract(art)["criteria"]
+            stored = art["classification"]["criteria_met"]
+            for name in ("pm25", "respiratory", "hospitalization", "effect_estimate"):
+                assert criteria[name] == stored[name], art["corpus_id"]
+
+    def test_process_pool_matches_serial(self, corpus):
+        from src.utils.corpus_builder import classify_abstract, classify_many
+
+        articles = corpus["corpus"][:200]
+        assert classify_many(articles, jobs=2, chunksize=50) == [classify_abstract(a) for a in articles]
+
+
+# ── Incremental Update Tests ────────────────────────────────
+
+def _candidate(pmid: str, title: str) -> dict:
+    return {"pmid": pmid, "title": title, "authors": [], "journal": "J", "year": "2025", "doi": "",
+            "abstract": "Time-series study of PM2.5 and respiratory hospital admissions; "
+                        "RR 1.02 (95% CI 1.01-1.03) per 10 µg/m3.",
+            "pub_types": ["Journal Article"], "mesh_terms": []}
+
+
+class TestCorpusUpdate:
+    """Verify stable corpus IDs across rebuilds and incremental updates."""
+
+    def test_update_keeps_ids_and_records_diff(self, tmp_path, corpus):
+        from src.utils.corpus_builder import update_corpus
+
+        corpus_path = tmp_path / "corpus.json"
+        corpus_path.write_text(json.dumps(corpus))
+        paths = dict(id_map_path=str(tmp_path / "ids.json"), versions_path=str(tmp_path / "versions.json"),
+                     near_duplicate_threshold=None)
+        existing = corpus["corpus"][0]
+        new = [_candidate("99000001", "New study A"), _candidate("99000002", "New study B"),
+               dict(existing, pub_types=[], mesh_terms=[])]
+
+        diff = update_corpus(str(corpus_path), new_articles=new, **paths)
+        assert diff["added"] == ["ABS-0501", "ABS-0502"]
+        assert diff["version"] == "1.1" and diff["previous_version"] == "1.0"
+
+        updated = json.loads(corpus_path.read_text())
+        assert updated["corpus"][:500] == corpus["corpus"]
+        assert updated["metadata"]["total"] == 502
+        assert updated["corpus"][500]["gold_category"] == "include"
+        assert json.loads((tmp_path / "ids.json").read_text())["ids"]["99000002"] == "ABS-0502"
+
+        again = update_corpus(str(corpus_path), new_articles=new, **paths)
+        assert again["added"] == []
+        assert [v["version"] for v in json.loads((tmp_path / "versions.json").read_text())] == ["1.1", "1.1"]
+
+    def test_rebuild_keeps_ids(self, tmp_path):
+        from src.utils.corpus_builder import build_corpus
+
+        raw = tmp_path / "broad.json"
+        out = tmp_path / "corpus.json"
+        kwargs = dict(broad_path=str(raw), design_path="missing.json", exclude_path="missing.json",
+                      output_path=str(out), target_include=3, target_exclude=0, target_ambiguous=0,
+                      id_map_path=str(tmp_path / "ids.json"), versions_path=str(tmp_path / "versions.json"),
+                      near_duplicate_threshold=None)
+        raw.write_text(json.dumps([_candidate("1", "a"), _candidate("2", "b")]))
+        first = {a["pmid"]: a["corpus_id"] for a in build_corpus(**kwargs)["corpus"]}
+        assert first == {"1": "ABS-0001", "2": "ABS-0002"}
+
+        # A new candidate that sorts first no longer renumbers the others
+        raw.write_text(json.dumps([_candidate("3", "c"), _candidate("1", "a"), _candidate("2", "b")]))
+        second = {a["pmid"]: a["corpus_id"] for a in build_corpus(**kwargs)["corpus"]}
+        assert second == {"1": "ABS-0001", "2": "ABS-0002", "3": "ABS-0003"}
+
+        # Rebuilds bump the version only when the corpus_ids change, logging the diff
+        raw.write_text(json.dumps([_candidate("3", "c"), _candidate("1", "a")]))
+        third = build_corpus(**kwargs)
+        build_corpus(**kwargs)
+        versions = json.loads((tmp_path / "versions.json").read_text())
+        assert [(v["previous_version"], v["version"]) for v in versions] == [
+            (None, "1.0"), ("1.0", "1.1"), ("1.1", "1.2"), ("1.2", "1.2")]
+        assert versions[0]["added"] == ["ABS-0001", "ABS-0002"]
+        assert (versions[1]["added"], versions[1]["removed"]) == (["ABS-0003"], [])
+        assert (versions[2]["added"], versions[2]["removed"]) == ([], ["ABS-0002"])
+        assert third["metadata"]["version"] == "1.2"
+
+    def test_last_fetched_is_raw_fetch_date(self, tmp_path, corpus):
+        import os
+        from src.utils.corpus_builder import build_corpus, update_corpus
+
+        raw = tmp_path / "broad.json"
+        raw.write_text(json.dumps([_candidate("1", "a")]))
+        fetched = 1700000000  # 2023-11-14
+        os.utime(raw, (fetched, fetched))
+        out = build_corpus(broad_path=str(raw), design_path="missing.json", exclude_path="missing.json",
+                           output_path=str(tmp_path / "corpus.json"), target_include=1, target_exclude=0,
+                           target_ambiguous=0, id_map_path=str(tmp_path / "ids.json"),
+                           versions_path=str(tmp_path / "versions.json"), near_duplicate_threshold=None)
+        assert out["metadata"]["last_fetched"] == "2023/11/14"
+
+        # A corpus with no fetch date on record needs an explicit mindate
+        corpus_path = tmp_path / "legacy.json"
+        corpus_path.write_text(json.dumps({**corpus, "metadata": {**corpus["metadata"], "sources": {}}}))
+        with pytest.raises(ValueError, match="mindate"):
+            update_corpus(str(corpus_path), id_map_path=str(tmp_path / "ids2.json"))
+
+
+# ── Near-Duplicate Tests ────────────────────────────────────
+
+class TestNearDuplicates:
+    """Verify MinHash/LSH near-duplicate clustering."""
+
+    def _variant(self, art, pmid, n_edits, seed=0):
+        import random
+        rng = random.Random(seed)
+        words = art["abstract"].split()
+        for _ in range(n_edits):
+            words[rng.randrange(len(words))] = "edited"
+        return dict(art, pmid=pmid, abstract=" ".join(words))
+
+    def test_corpus_has_no_near_duplicates(self, corpus):
+        from src.utils.near_duplicates import find_near_duplicates
+        assert find_near_duplicates(corpus["corpus"], threshold=0.5) == []
+
+    def test_clusters_variants(self, corpus):
+        from src.utils.near_duplicates import find_near_duplicates
+
+        arts = corpus["corpus"][:200]
+        a, b = arts[3], arts[10]
+        extra = [self._variant(a, "90000001", 2), self._variant(a, "90000002", 3, seed=1),
+                 self._variant(b, "90000003", 60)]
+        clusters = find_near_duplicates(arts + extra, threshold=0.8)
+        assert len(clusters) == 1
+        assert sorted(clusters[0]["pmids"]) == sorted([a["pmid"], "90000001", "90000002"])
+        assert clusters[0]["min_similarity"] >= 0.8
+
+        # A heavily edited copy joins only at a lower threshold
+        loose = find_near_duplicates(arts + extra, threshold=0.3)
+        assert any("90000003" in c["pmids"] and b["pmid"] in c["pmids"] for c in loose)
+
+    def test_keep_prefers_protected(self, corpus):
+        from src.utils.near_duplicates import drop_near_duplicates
+
+        art = corpus["corpus"][0]
+        longer = dict(self._variant(art, "90000001", 1), abstract=art["abstract"] + " Extra sentence.")
+        kept, clusters = drop_near_duplicates([art, longer])
+        assert [k["pmid"] for k in kept] == ["90000001"]
+        kept, _ = drop_near_duplicates([art, longer], protected={art["pmid"]})
+        assert [k["pmid"] for k in kept] == [art["pmid"]]
+
+    def test_update_drops_duplicate_candidates(self, tmp_path, corpus):
+        from src.utils.corpus_builder import update_corpus
+
+        corpus_path = tmp_path / "corpus.json"
+        corpus_path.write_text(json.dumps(corpus))
+        copy = self._variant(corpus["corpus"][5], "99000001", 2)
+        diff = update_corpus(str(corpus_path), new_articles=[copy, _candidate("99000002", "New")],
+                             id_map_path=str(tmp_path / "ids.json"), versions_path=str(tmp_path / "v.json"))
+        assert diff["added"] == ["ABS-0501"]
+        assert diff["near_duplicates"][0]["drop"] == ["99000001"]
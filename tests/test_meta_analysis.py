@@ -0,0 +1,219 @@
+"""Tests for meta-analytic pooling, datasets and the sensitivity grid."""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import optimize
+
+from src.analysis import extraction_eval
+from src.meta_analysis.cumulative import (
+    country_of,
+    cumulative_meta_analysis,
+    cumulative_pool,
+    subgroup_meta_analysis,
+    subgroup_pool,
+)
+from src.meta_analysis.dataset import pack_meta_arrays, select_primary_estimates
+from src.meta_analysis.pooling import leave_one_out, pool, tau2_dl, tau2_pm, tau2_reml
+from src.meta_analysis.sensitivity import run_sensitivity_grid
+
+
+def _random_metas(n_metas=50, width=12, seed=0):
+    rng = np.random.default_rng(seed)
+    y = rng.normal(0.05, 0.1, (n_metas, width))
+    v = rng.uniform(0.001, 0.02, (n_metas, width))
+    mask = rng.random((n_metas, width)) < 0.7
+    return y, v, mask
+
+
+def _write_extraction(output_dir, model_id, run_id, outputs):
+    run_dir = output_dir / model_id / "extraction" / f"run_{run_id:03d}"
+    run_dir.mkdir(parents=True)
+    results = [{"corpus_id": cid, "output_hash": f"{model_id}-{run_id}-{cid}", "output": out}
+               for cid, out in outputs.items()]
+    (run_dir / "results.json").write_text(json.dumps(results))
+
+
+# ── Pooling Tests ───────────────────────────────────────────
+
+class TestPooling:
+    """Test vectorized heterogeneity estimators and pooling."""
+
+    def test_dl_hand_computed(self):
+        # FE mean 0.2, Q = 8, C = 200 → tau² = (8 - 2) / 200
+        y = np.array([[0.0, 0.2, 0.4]])
+        v = np.full((1, 3), 0.01)
+        assert tau2_dl(y, v, np.ones((1, 3), bool))[0] == pytest.approx(0.03)
+
+    def test_pm_solves_generalized_q(self):
+        y, v, mask = _random_metas()
+        tau2, converged, _ = tau2_pm(y, v, mask)
+        assert converged.all()
+        for i in np.flatnonzero(tau2 > 0):
+            w = 1 / (v[i, mask[i]] + tau2[i])
+            mu = (w * y[i, mask[i]]).sum() / w.sum()
+            q = (w * (y[i, mask[i]] - mu) ** 2).sum()
+            assert q == pytest.approx(mask[i].sum() - 1, abs=1e-8)
+
+    def test_reml_maximizes_restricted_likelihood(self):
+        y, v, mask = _random_metas()
+        tau2, converged, _ = tau2_reml(y, v, mask)
+        assert converged.all()
+
+        def nll(t, yy, vv):
+            w = 1 / (vv + t)
+            mu = (w * yy).sum() / w.sum()
+            return 0.5 * (np.log(vv + t).sum() + np.log(w.sum()) + (w * (yy - mu) ** 2).sum())
+
+        for i in range(10):
+            yy, vv = y[i, mask[i]], v[i, mask[i]]
+            best = optimize.minimize_scalar(nll, bounds=(0, 5), args=(yy, vv), method="bounded",
+                                            options={"xatol": 1e-12}).x
+            assert tau2[i] == pytest.approx(best, abs=1e-6)
+
+    def test_batch_matches_single_rows(self):
+        y, v, mask = _random_metas(n_metas=8)
+        for estimator in ("DL", "REML", "PM"):
+            batch = pool(y, v, mask, estimator, hartung_knapp=True)
+            for i in range(8):
+                single = pool(y[i:i + 1, mask[i]], v[i:i + 1, mask[i]],
+                              np.ones((1, mask[i].sum()), bool), estimator, hartung_knapp=True)
+                assert batch["pooled_log"][i] == pytest.approx(single["pooled_log"][0])
+                assert batch["ci_upper"][i] == pytest.approx(single["ci_upper"][0])
+
+    def test_hartung_knapp_uses_t_quantile(self):
+        y = np.array([[0.01, 0.02, 0.03, 0.02]])
+        v = np.full((1, 4), 0.0001)
+        mask = np.ones((1, 4), bool)
+        plain = pool(y, v, mask, "DL")
+        hk = pool(y, v, mask, "DL", hartung_knapp=True)
+        assert hk["pooled_log"][0] == pytest.approx(plain["pooled_log"][0])
+        assert hk["ci_lower_log"][0] != pytest.approx(plain["ci_lower_log"][0])
+
+    def test_empty_and_single_study(self):
+        y = np.array([[0.1, 0.0], [0.1, 0.0]])
+        v = np.full((2, 2), 0.01)
+        mask = np.array([[False, False], [True, False]])
+        result = pool(y, v, mask, "REML")
+        assert np.isnan(result["pooled_log"][0]) and np.isnan(result["se"][0])
+        assert not result["converged"][0] and not result["ci_crosses_null"][0]
+        assert result["pooled_log"][1] == pytest.approx(0.1)
+        assert result["tau2"][1] == 0.0 and result["converged"][1]
+        for estimator in ("DL", "PM"):
+            assert np.isnan(pool(y, v, mask, estimator)["se"][0])
+
+    def test_unknown_estimator(self):
+        with pytest.raises(ValueError):
+            pool(np.zeros((1, 1)), np.ones((1, 1)), np.ones((1, 1), bool), "SJ")
+
+    def test_leave_one_out(self):
+        y, v, mask = _random_metas(n_metas=3, width=5)
+        ly, lv, lmask, parent, omitted = leave_one_out(y, v, mask)
+        assert len(parent) == mask.sum()
+        assert (lmask.sum(axis=1) == mask.sum(axis=1)[parent] - 1).all()
+        assert not lmask[np.arange(len(parent)), omitted].any()
+
+
+# ── Dataset and Grid Tests ──────────────────────────────────
+
+class TestSensitivityGrid:
+    """Test primary-estimate selection and the tidy sensitivity table."""
+
+    def test_primary_estimate_preferences(self):
+        table = pd.DataFrame({
+            "model_id": ["m"] * 4, "run_id": [1] * 4, "corpus_id": ["A", "A", "A", "B"],
+            "outcome_specific": ["asthma", "all_respiratory", "all_respiratory", "COPD"],
+            "lag": ["lag0-1", "lag2", "lag0-1", None],
+            "norm_ok": [True, True, True, True],
+            "log_effect": [0.1, 0.2, 0.3, 0.4],
+            "log_ci_lower": [0.0, 0.1, 0.2, 0.3],
+            "log_ci_upper": [0.2, 0.3, 0.4, 0.5],
+        })
+        primary = select_primary_estimates(table)
+        assert primary.set_index("corpus_id")["yi"].to_dict() == {"A": 0.3, "B": 0.4}
+
+    def test_pack_keeps_empty_runs(self):
+        studies = pd.DataFrame({"model_id": ["m", "m"], "run_id": [1, 1], "corpus_id": ["A", "B"],
+                                "yi": [0.1, 0.2], "vi": [0.01, 0.02]})
+        keys = pd.DataFrame({"model_id": ["m", "m"], "run_id": [1, 2]})
+        data = pack_meta_arrays(studies, keys)
+        assert data["mask"].sum(axis=1).tolist() == [2, 0]
+        assert data["corpus_ids"][0].tolist() == ["A", "B"]
+
+    def test_grid_rows(self, tmp_path):
+        out = tmp_path / "raw"
+        est = {"effect_measure": "RR", "lag": "lag0-1", "outcome_specific": "all_respiratory",
+               "exposure_increment": "per 10 µg/m³"}
+        for run_id in (1, 2):
+            _write_extraction(out, "m", run_id, {
+                "ABS-0001": {"estimates": [dict(est, effect_estimate=1.02, ci_lower=1.01, ci_upper=1.03)]},
+                "ABS-0002": {"estimates": [dict(est, effect_estimate=1.05, ci_lower=1.00, ci_upper=1.10)]},
+                "ABS-0003": {"estimates": [dict(est, effect_estimate=1.01, ci_lower=0.99, ci_upper=1.03,
+                                                exposure_increment="per 1 µg/m³")]},
+            })
+        extraction_eval.clear_caches()
+        grid = run_sensitivity_grid(["m"], str(out))
+        # 2 runs × (1 full + 3 leave-one-out) × 3 estimators × 2 adjustments
+        assert len(grid) == 2 * 4 * 3 * 2
+        full = grid[grid.omitted_corpus_id.isna()]
+        assert (full.k == 3).all()
+        assert set(grid.omitted_corpus_id.dropna()) == {"ABS-0001", "ABS-0002", "ABS-0003"}
+        assert full.converged.all()
+
+
+# ── Cumulative and Subgroup Tests ───────────────────────────
+
+class TestCumulativeSubgroup:
+    """Test prefix-sum cumulative pooling and grouped subgroup pooling."""
+
+    def test_cumulative_matches_prefix_pooling(self):
+        y, v, _ = _random_metas(n_metas=6, width=10)
+        mask = np.arange(10)[None, :] < np.array([0, 1, 2, 5, 9, 10])[:, None]
+        result = cumulative_pool(y, v, mask)
+        for j in range(10):
+            prefix = pool(y, v, mask & (np.arange(10)[None, :] <= j), "DL")
+            rows = mask[:, j]
+            np.testing.assert_allclose(result["pooled_log"][rows, j], prefix["pooled_log"][rows])
+            np.testing.assert_allclose(result["tau2"][rows, j], prefix["tau2"][rows], atol=1e-12)
+            np.testing.assert_allclose(result["q"][rows, j], prefix["q"][rows], atol=1e-9)
+
+    def test_subgroups_match_subset_pooling(self):
+        rng = np.random.default_rng(1)
+        dataset, subgroup = rng.integers(0, 3, 120), rng.integers(0, 4, 120)
+        y, v = rng.normal(0.05, 0.1, 120), rng.uniform(0.001, 0.02, 120)
+        result = subgroup_pool(y, v, dataset, subgroup, 3, 4)
+        for d in range(3):
+            for g in range(4):
+                sel = (dataset == d) & (subgroup == g)
+                ref = pool(y[sel][None], v[sel][None], np.ones((1, sel.sum()), bool), "DL")
+                assert result["pooled_log"][d, g] == pytest.approx(ref["pooled_log"][0])
+                assert result["tau2"][d, g] == pytest.approx(ref["tau2"][0], abs=1e-12)
+
+    def test_country_of(self):
+        assert country_of("Beijing, China") == "China"
+        assert country_of("New York State, USA") == "United States"
+        assert country_of(None) is None
+
+    def test_tables_ordered_by_year(self, tmp_path):
+        out = tmp_path / "raw"
+        corpus = tmp_path / "corpus.json"
+        years = {"ABS-0001": "2021", "ABS-0002": "2015", "ABS-0003": "2018"}
+        corpus.write_text(json.dumps({"corpus": [{"corpus_id": c, "year": y} for c, y in years.items()]}))
+        est = {"effect_measure": "RR", "lag": "lag0-1", "outcome_specific": "all_respiratory",
+               "exposure_increment": "per 10 µg/m³", "effect_estimate": 1.02,
+               "ci_lower": 1.01, "ci_upper": 1.03}
+        _write_extraction(out, "m", 1, {
+            "ABS-0001": {"study_location": "Lanzhou, China", "population": "general", "estimates": [est]},
+            "ABS-0002": {"study_location": "Ohio, USA", "population": "children", "estimates": [est]},
+            "ABS-0003": {"study_location": "Wuhan, China", "population": "general", "estimates": [est]},
+        })
+        extraction_eval.clear_caches()
+        cumulative = cumulative_meta_analysis(["m"], str(out), str(corpus))
+        assert cumulative["corpus_id"].tolist() == ["ABS-0002", "ABS-0003", "ABS-0001"]
+        assert cumulative["k"].tolist() == [1, 2, 3]
+
+        subgroups = subgroup_meta_analysis(["m"], str(out), str(corpus))
+        countries = subgroups[subgroups.dimension == "country"].set_index("subgroup")["k"]
+        assert countries.to_dict() == {"China": 2, "United States": 1}
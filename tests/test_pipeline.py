@@ -5,6 +5,7 @@ import hashlib
 from pathlib import Path
 from unittest.mock import patch, MagicMock
 
+import pandas as pd
 import pytest
 
 from src.provenance.hasher import (
@@ -12,9 +13,28 @@ from src.provenance.hasher import (
     compute_output_hash,
     create_call_record,
     create_run_card,
+    merge_timing,
+    save_run_outputs,
+    template_digest,
+    timing_stats,
 )
+from src.provenance.merkle import (
+    MerkleTree,
+    backfill_trees,
+    build_tree,
+    diff_trees,
+    inclusion_proof,
+    load_tree,
+    verify_proof,
+)
+from src.provenance.ledger import Ledger, verify_ledger
+from src.provenance.sketch import QuantileSketch
+from src.provenance.verify import runs_using_template, verify_outputs
 from src.screening.runner import _extract_json, run_screening
 from src.extraction.runner import run_extraction
+from src.extraction.normalize import Increment, normalize_estimates, parse_increment
+from src.utils import tracing
+from tests.mock_llm_server import MockLLMServer, patch_runners
 
 
 # ── Provenance Tests ────────────────────────────────────────
@@ -37,6 +57,23 @@ class TestProvenance:
         h2 = compute_call_hash("prompt", "input", "model", 0.0, 99)
         assert h1 != h2
 
+    def test_call_hash_scheme_1_is_canonical_json(self):
+        fields = {"prompt": "p", "input_text": "i", "model_id": "m", "temperature": 0.0, "seed": 42}
+        expected = hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+        assert compute_call_hash("p", "i", "m", 0.0, 42, scheme=1) == expected
+        assert compute_call_hash("p", "i", "m", 0.0, 42) != expected
+
+    def test_call_hash_scheme_2_covers_settings(self):
+        base = compute_call_hash("prompt", "input", "model", 0.0, 42)
+        assert compute_call_hash("prompt!", "input", "model", 0.0, 42) != base
+        assert compute_call_hash("prompt", "input", "model2", 0.0, 42) != base
+        assert compute_call_hash("prompt", "input", "model", 0.5, 42) != base
+        assert compute_call_hash("prompt", "input", "model", 0, 42) != base  # as in scheme 1
+
+    def test_unknown_call_hash_scheme(self):
+        with pytest.raises(ValueError):
+            compute_call_hash("prompt", "input", "model", 0.0, 42, scheme=3)
+
     def test_output_hash_deterministic(self):
         h1 = compute_output_hash("test output")
         h2 = compute_output_hash("test output")
@@ -92,6 +129,339 @@ class TestProvenance:
         assert card["execution"]["total_calls"] == 2
         assert card["execution"]["mean_duration_ms"] == 150.0
         assert "aggregate_output_hash" in card["provenance"]
+        assert card["provenance"]["call_hash_schemes"] == [1]
+
+    def test_run_card_lists_mixed_call_hash_schemes(self):
+        records = [{"output_hash": "h1", "inference_duration_ms": 100, "call_hash_scheme": 2},
+                   {"output_hash": "h2", "inference_duration_ms": 100}]
+        card = create_run_card(1, "m", "test", "screening", 2, 2, 0, records, {}, {}, "t0", "t1")
+        assert card["provenance"]["call_hash_schemes"] == [1, 2]
+
+
+def _records(n: int, changed: tuple = ()) -> list[dict]:
+    return [
+        {
+            "corpus_id": f"ABS-{i:05d}",
+            "call_hash": compute_call_hash("prompt", f"input {i}", "model", 0.0, 42),
+            "output_hash": compute_output_hash(f"output {i}{'*' if i in changed else ''}"),
+        }
+        for i in range(n)
+    ]
+
+
+class TestMerkle:
+    """Test Merkle-tree run diffs and inclusion proofs."""
+
+    def test_identical_runs_visit_only_root(self):
+        diff = diff_trees(MerkleTree(build_tree(_records(1000))), MerkleTree(build_tree(_records(1000))))
+        assert diff["changed"] == []
+        assert diff["nodes_visited"] == 1
+
+    def test_diff_finds_changed_calls_in_log_time(self):
+        changed = (3, 512, 44999)
+        a = MerkleTree(build_tree(_records(45000)))
+        b = MerkleTree(build_tree(list(reversed(_records(45000, changed)))))
+        diff = diff_trees(a, b)
+        assert diff["changed"] == [f"ABS-{i:05d}" for i in changed]
+        assert diff["nodes_visited"] <= 2 * len(changed) * a.depth
+
+    def test_diff_with_different_corpus(self):
+        a = MerkleTree(build_tree(_records(10, changed=(2,))))
+        b = MerkleTree(build_tree(_records(12)[1:]))
+        diff = diff_trees(a, b)
+        assert diff["changed"] == ["ABS-00002"]
+        assert diff["only_a"] == ["ABS-00000"]
+        assert diff["only_b"] == ["ABS-00010", "ABS-00011"]
+
+    def test_inclusion_proof(self):
+        records = _records(37)
+        tree = MerkleTree(build_tree(records))
+        for record in (records[0], records[20], records[36]):
+            proof = inclusion_proof(tree, record["corpus_id"])
+            assert len(proof["path"]) <= tree.depth
+            assert verify_proof(record, proof, tree.root_hex)
+
+    def test_tampered_record_fails_proof(self):
+        records = _records(37)
+        tree = MerkleTree(build_tree(records))
+        proof = inclusion_proof(tree, "ABS-00005")
+        tampered = {**records[5], "output_hash": compute_output_hash("other")}
+        assert not verify_proof(tampered, proof, tree.root_hex)
+
+    def test_saved_with_run_card(self, tmp_path):
+        records = _records(5)
+        card = {"provenance": {}}
+        path = save_run_outputs(str(tmp_path), 1, "m", "screening", [], records, card)
+        tree = load_tree(path)
+        assert card["provenance"]["merkle_root"] == tree.root_hex
+        assert tree.keys == [r["corpus_id"] for r in records]
+        with open(Path(path) / "run_card.json") as f:
+            assert json.load(f)["provenance"]["merkle_root"] == tree.root_hex
+
+    def test_backfill_records_root_in_run_card(self, tmp_path):
+        path = Path(save_run_outputs(str(tmp_path), 1, "m", "screening", [], _records(5), {"provenance": {}}))
+        (path / "merkle_tree.bin").unlink()
+        card = json.loads((path / "run_card.json").read_text())
+        del card["provenance"]["merkle_root"]
+        (path / "run_card.json").write_text(json.dumps(card))
+
+        roots = backfill_trees(str(tmp_path))
+        provenance = json.loads((path / "run_card.json").read_text())["provenance"]
+        assert roots == {str(path): load_tree(str(path)).root_hex}
+        assert provenance == {"merkle_root": roots[str(path)], "merkle_backfilled": True}
+        assert backfill_trees(str(tmp_path)) == {}
+
+
+def _verifiable_outputs(tmp_path: Path, n_runs: int = 2, scheme: int = 2) -> dict:
+    """A raw_outputs tree with stored output text, plus its corpus and prompt files."""
+    corpus = [{"corpus_id": f"ABS-{i:04d}", "pmid": str(i), "title": f"T{i}", "abstract": f"A{i}"}
+              for i in range(1, 6)]
+    (tmp_path / "corpus.json").write_text(json.dumps({"corpus": corpus}))
+    (tmp_path / "screening.txt").write_text("Screen: {title}")
+    for run_id in range(1, n_runs + 1):
+        results, records = [], []
+        for art in corpus:
+            text = f'{{"decision": "include", "run": {run_id}}}'
+            call_hash = compute_call_hash("Screen: {title}", f"{art['title']}\n{art['abstract']}", "m", 0.0, 42,
+                                          scheme=scheme)
+            record = create_call_record(art["corpus_id"], call_hash, compute_output_hash(text), "m", "test",
+                                        "screening", run_id, {"inference_duration_ms": 10},
+                                        template_digest("Screen: {title}"), scheme)
+            if scheme == 1:
+                del record["call_hash_scheme"], record["template_digest"]
+            records.append(record)
+            results.append({"corpus_id": art["corpus_id"], "output_hash": record["output_hash"],
+                            "output_text": text})
+        card = create_run_card(run_id, "m", "test", "screening", 5, 5, 0, records, {},
+                               {"temperature": 0.0, "seed": 42}, "t0", "t1")
+        save_run_outputs(str(tmp_path / "raw"), run_id, "m", "screening", results, records, card)
+    return {"output_dir": str(tmp_path / "raw"), "corpus_path": str(tmp_path / "corpus.json"),
+            "prompt_paths": {"screening": str(tmp_path / "screening.txt")}}
+
+
+class TestVerify:
+    """Test the provenance verifier over a raw_outputs tree."""
+
+    def test_clean_outputs_pass(self, tmp_path):
+        report = verify_outputs(**_verifiable_outputs(tmp_path), jobs=2)
+        assert report["failed"] == []
+        assert [r["outputs_checked"] for r in report["verified"]] == [5, 5]
+        assert all(r["aggregate_ok"] and r["merkle_ok"] for r in report["verified"])
+
+    def test_scheme_1_runs_still_verify(self, tmp_path):
+        report = verify_outputs(**_verifiable_outputs(tmp_path, scheme=1))
+        assert report["failed"] == []
+
+    def test_runs_using_template(self, tmp_path):
+        paths = _verifiable_outputs(tmp_path)
+        assert len(runs_using_template(paths["output_dir"], "Screen: {title}")) == 2
+        assert runs_using_template(paths["output_dir"], "Other prompt") == []
+
+    def test_tampered_output_text(self, tmp_path):
+        paths = _verifiable_outputs(tmp_path)
+        results_path = Path(paths["output_dir"]) / "m" / "screening" / "run_002" / "results.json"
+        results = json.loads(results_path.read_text())
+        results[3]["output_text"] = '{"decision": "exclude"}'
+        results_path.write_text(json.dumps(results))
+        report = verify_outputs(**paths)
+        assert report["failed"] == [str(results_path.parent)]
+        bad = next(r for r in report["verified"] if not r["ok"])
+        assert bad["output_mismatches"] == ["ABS-0004"]
+
+    def test_edited_prompt_breaks_call_hashes(self, tmp_path):
+        paths = _verifiable_outputs(tmp_path, n_runs=1)
+        (tmp_path / "screening.txt").write_text("Screen carefully: {title}")
+        report = verify_outputs(**paths)
+        assert len(report["verified"][0]["call_hash_mismatches"]) == 5
+
+    def test_incremental(self, tmp_path):
+        paths = _verifiable_outputs(tmp_path)
+        assert len(verify_outputs(**paths)["verified"]) == 2
+        again = verify_outputs(**paths)
+        assert again["verified"] == [] and len(again["skipped"]) == 2
+
+        card = Path(paths["output_dir"]) / "m" / "screening" / "run_001" / "run_card.json"
+        card.write_text(card.read_text().replace('"aggregate_output_hash": "', '"aggregate_output_hash": "0'))
+        report = verify_outputs(**paths)
+        assert [r["run"] for r in report["verified"]] == [str(card.parent)]
+        assert report["failed"] == [str(card.parent)]
+
+
+def _ledger(tmp_path: Path, n: int = 10) -> Path:
+    path = tmp_path / "ledger.jsonl"
+    with Ledger(str(path)) as ledger:
+        for i in range(n):
+            ledger.append("call", {"corpus_id": f"ABS-{i:04d}", "output_hash": f"h{i}"})
+    return path
+
+
+def _append_from_process(path: str, worker: int, n: int):
+    with Ledger(path, fsync=False) as ledger:
+        for i in range(n):
+            ledger.append("call", {"worker": worker, "i": i})
+
+
+class TestLedger:
+    """Test the hash-chained provenance ledger."""
+
+    def test_chain_verifies_and_resumes(self, tmp_path):
+        path = _ledger(tmp_path)
+        with Ledger(str(path)) as ledger:
+            entry = ledger.append("run_card", {"run_id": 1})
+        assert entry["seq"] == 11
+        report = verify_ledger(str(path))
+        assert report["ok"] and report["entries"] == 11
+        assert report["head"] == entry["hash"]
+
+    def test_tampered_entry(self, tmp_path):
+        path = _ledger(tmp_path)
+        lines = path.read_text().splitlines(keepends=True)
+        lines[4] = lines[4].replace('"h4"', '"hX"')
+        path.write_text("".join(lines))
+        report = verify_ledger(str(path))
+        assert not report["ok"] and report["entries"] == 4
+        assert "line 5" in report["error"]
+
+    def test_removed_entry(self, tmp_path):
+        path = _ledger(tmp_path)
+        lines = path.read_text().splitlines(keepends=True)
+        path.write_text("".join(lines[:3] + lines[4:]))
+        assert "seq 5 follows 3" in verify_ledger(str(path))["error"]
+
+    def test_truncation(self, tmp_path):
+        path = _ledger(tmp_path)
+        lines = path.read_text().splitlines(keepends=True)
+        path.write_text("".join(lines[:7]))
+        assert "truncated" in verify_ledger(str(path))["error"]
+        path.write_text("".join(lines) + lines[0][:20])
+        assert "partial entry" in verify_ledger(str(path))["error"]
+
+    def test_concurrent_appends_group_commit(self, tmp_path):
+        import threading
+        path = tmp_path / "ledger.jsonl"
+        ledger = Ledger(str(path))
+
+        def worker(w):
+            for i in range(100):
+                ledger.append("call", {"worker": w, "i": i})
+
+        threads = [threading.Thread(target=worker, args=(w,)) for w in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        ledger.close()
+        assert verify_ledger(str(path)) == {"ok": True, "entries": 800, "head": ledger.head["hash"], "error": None}
+        assert ledger.commits < 800
+
+
+    def test_failed_commit_requeues_its_batch(self, tmp_path, monkeypatch):
+        import threading
+        import time
+        path = tmp_path / "ledger.jsonl"
+        ledger = Ledger(str(path), fsync=False)
+        commit, calls = ledger._commit, []
+
+        def failing_once(batch):
+            calls.append(len(batch))
+            if len(calls) == 1:
+                time.sleep(0.05)  # let the other threads queue behind this commit
+                raise OSError("disk full")
+            commit(batch)
+
+        monkeypatch.setattr(ledger, "_commit", failing_once)
+        ledger.append("call", {"name": "first"}, wait=False)
+        durable, errors = [], []
+
+        def worker(name):
+            try:
+                ledger.append("call", {"name": name})
+                durable.append(name)
+            except OSError:
+                errors.append(name)
+
+        threads = [threading.Thread(target=worker, args=(name,)) for name in "abc"]
+        for t in threads:
+            t.start()
+            time.sleep(0.01)
+        for t in threads:
+            t.join()
+        ledger.close()
+
+        assert len(errors) == 1 and len(durable) == 2
+        written = [json.loads(line)["data"]["name"] for line in path.read_text().splitlines()]
+        assert sorted(written) == ["a", "b", "c", "first"]
+        assert verify_ledger(str(path))["ok"]
+
+    def test_appenders_in_several_processes_share_one_chain(self, tmp_path):
+        import multiprocessing
+        path = tmp_path / "ledger.jsonl"
+        first, second = Ledger(str(path)), Ledger(str(path))
+        # Both opened on the empty ledger; each commit chains onto the current tail
+        first.append("call", {"i": 1})
+        second.append("call", {"i": 2})
+        assert first.append("call", {"i": 3})["seq"] == 3
+        first.close()
+        second.close()
+
+        procs = [multiprocessing.Process(target=_append_from_process, args=(str(path), w, 50)) for w in range(4)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        report = verify_ledger(str(path))
+        assert report["ok"] and report["entries"] == 203
+
+class TestTiming:
+    """Test the quantile sketch and run-card timing stats."""
+
+    def test_sketch_relative_error(self):
+        import numpy as np
+        values = np.random.default_rng(0).lognormal(7, 1, 20000)
+        sketch = QuantileSketch().update(values)
+        for q in (0.5, 0.9, 0.99):
+            exact = np.quantile(values, q, method="lower")
+            assert abs(sketch.quantile(q) - exact) <= 0.02 * exact
+        assert sketch.quantile(1.0) == values.max()
+
+    def test_sketch_merge_equals_union(self):
+        a = QuantileSketch().update([10, 20, 30, 0])
+        b = QuantileSketch().update([15, 2000])
+        merged = QuantileSketch.from_dict(a.to_dict()).merge(QuantileSketch.from_dict(b.to_dict()))
+        assert merged.to_dict() == QuantileSketch().update([10, 20, 30, 0, 15, 2000]).to_dict()
+        assert merged.summary()["max"] == 2000
+
+    def test_timing_stats(self):
+        records = [{"inference_duration_ms": 1000.0 * (i + 1), "input_tokens": 500, "output_tokens": 100,
+                    "attempts": 2 if i == 3 else 1, "throttle_wait_ms": 2000.0 if i == 3 else 0.0,
+                    "backoff_wait_ms": 1000.0 if i == 5 else None, "ttft_ms": None}
+                   for i in range(10)]
+        timing = timing_stats(records)
+        assert timing["latency_ms"]["max"] == 10000.0
+        assert timing["latency_ms"]["p50"] == pytest.approx(5000, rel=0.01)
+        assert timing["ttft_ms"] is None
+        assert timing["input_tokens_per_sec"] == round(5000 / 55, 1)
+        assert timing["retries"] == 1 and timing["throttle_wait_ms"] == 2000.0
+        assert timing["backoff_wait_ms"] == 1000.0
+
+        merged = merge_timing([timing_stats(records[:4]), timing_stats(records[4:])])
+        assert merged == timing
+
+    @patch("src.screening.runner.time.sleep")
+    @patch("src.screening.runner._get_runner")
+    def test_retries_recorded(self, mock_get_runner, mock_sleep):
+        mock_runner = MagicMock()
+        mock_runner.run_inference.side_effect = [
+            Exception("HTTP Error 429: Too Many Requests"), TestScreeningPipeline.MOCK_SCREENING_RESPONSE,
+            Exception("HTTP Error 503: Service Unavailable"), {"output_text": "not json"},
+            TestScreeningPipeline.MOCK_SCREENING_RESPONSE]
+        mock_get_runner.return_value = mock_runner
+        _, records, _ = run_screening(TestScreeningPipeline.SAMPLE_CORPUS[:2], {"id": "m", "provider": "test"},
+                                      1, TestScreeningPipeline.SAMPLE_PROMPT)
+        assert [r["attempts"] for r in records] == [2, 3]
+        # Only the 429 counts as throttling; the 503 backoff and the parse-retry sleep are backoff
+        assert [r["throttle_wait_ms"] for r in records] == [5000.0, 0.0]
+        assert [r["backoff_wait_ms"] for r in records] == [0.0, 3000.0]
 
 
 # ── JSON Extraction Tests ───────────────────────────────────
@@ -234,6 +604,53 @@ class TestScreeningPipeline:
         assert "error" in results[0]["output"]
 
 
+class TestTracing:
+    """Test tracing spans around the screening pipeline."""
+
+    def _screen(self, mock_get_runner):
+        mock_runner = MagicMock()
+        mock_runner.run_inference.return_value = TestScreeningPipeline.MOCK_SCREENING_RESPONSE
+        mock_get_runner.return_value = mock_runner
+        run_screening(TestScreeningPipeline.SAMPLE_CORPUS, {"id": "test-model", "provider": "test"},
+                      3, TestScreeningPipeline.SAMPLE_PROMPT)
+
+    def test_disabled_is_noop(self):
+        assert not tracing.enabled()
+        assert tracing.span("x", a=1) is tracing.span("y")
+
+    @patch("src.screening.runner._get_runner")
+    def test_jsonl_spans_carry_attributes(self, mock_get_runner, tmp_path):
+        path = tmp_path / "trace.jsonl"
+        tracing.enable(str(path))
+        try:
+            self._screen(mock_get_runner)
+        finally:
+            tracing.disable()
+        spans = [json.loads(line) for line in path.read_text().splitlines()]
+        names = {s["name"] for s in spans}
+        assert {"call", "prompt.build", "inference", "json.extract", "hash"} <= names
+        inference = [s for s in spans if s["name"] == "inference"]
+        assert [s["attrs"]["corpus_id"] for s in inference] == ["ABS-0001", "ABS-0002"]
+        assert all(s["attrs"]["model"] == "test-model" and s["attrs"]["run"] == 3 for s in inference)
+        call = next(s for s in spans if s["name"] == "call")
+        assert call["dur_us"] >= inference[0]["dur_us"]
+
+    @patch("src.screening.runner._get_runner")
+    def test_chrome_trace(self, mock_get_runner, tmp_path):
+        path = tmp_path / "trace.json"
+        tracing.enable(str(path))
+        try:
+            self._screen(mock_get_runner)
+            with pytest.raises(KeyError):
+                with tracing.span("failing"):
+                    raise KeyError("x")
+        finally:
+            tracing.disable()
+        events = json.loads(path.read_text())["traceEvents"]
+        assert all(e["ph"] == "X" for e in events)
+        assert events[-1]["name"] == "failing" and events[-1]["args"]["error"] == "KeyError"
+
+
 # ── Extraction Pipeline Tests (Mocked) ─────────────────────
 
 class TestExtractionPipeline:
@@ -326,6 +743,58 @@ class TestExtractionPipeline:
         assert stats["valid"] == 1
 
 
+# ── Increment Normalization Tests ───────────────────────────
+
+class TestIncrementNormalization:
+    """Test exposure-increment parsing and rescaling."""
+
+    @pytest.mark.parametrize("text,expected", [
+        ("per 10 µg/m³", Increment(10.0, "ok")),
+        ("per 10-µg/m³ increase in PM2.5", Increment(10.0, "ok")),
+        ("per 23.4 μg/m3", Increment(23.4, "ok")),
+        ("per_10_µg/m³", Increment(10.0, "ok")),
+        ("per IQR (7.2 µg/m³)", Increment(7.2, "ok")),
+        ("30 vs 20 µg/m³", Increment(10.0, "ok")),
+        ("per 1 mg/m³", Increment(1000.0, "ok")),
+        ("per IQR", Increment(None, "iqr_without_value")),
+        ("per interquartile range", Increment(None, "iqr_without_value")),
+        ("per IQR (2.0 ppb)", Increment(None, "unsupported_unit")),
+        ("per 10-unit AQI increase", Increment(None, "unsupported_unit")),
+        ("per 10,166 n/cm3", Increment(None, "unsupported_unit")),
+        ("per unit AQI", Increment(None, "unsupported_unit")),
+        ("per IQR (2088 p/cm3)", Increment(None, "unsupported_unit")),
+        ("per IQR (12 mm)", Increment(None, "unsupported_unit")),
+        ("per µg/m³", Increment(1.0, "ok")),
+        ("elevated PM2.5", Increment(None, "unparsed")),
+        ("not specified", Increment(None, "missing")),
+        (None, Increment(None, "missing")),
+    ])
+    def test_parse_increment(self, text, expected):
+        assert parse_increment(text) == expected
+
+    def test_parse_memoized(self):
+        parse_increment.cache_clear()
+        for _ in range(3):
+            parse_increment("per 5 µg/m³")
+        assert parse_increment.cache_info().hits == 2
+
+    def test_rescale_to_per_10(self):
+        table = pd.DataFrame({
+            "effect_measure": ["RR", "OR", "percent change", "RR", "other"],
+            "effect_estimate": [1.01, 1.02, 1.5, 1.03, 1.04],
+            "ci_lower": [1.00, 1.01, 0.5, 1.01, 1.01],
+            "ci_upper": [1.02, 1.03, 2.5, 1.05, 1.07],
+            "exposure_increment": ["per 1 µg/m³", "per 10 µg/m³", "per 5 µg/m³", "per IQR", "per 10 µg/m³"],
+        })
+        out = normalize_estimates(table)
+        assert out["effect_norm"][0] == pytest.approx(1.01 ** 10)
+        assert out["ci_upper_norm"][0] == pytest.approx(1.02 ** 10)
+        assert out["effect_norm"][1] == pytest.approx(1.02)
+        assert out["effect_norm"][2] == pytest.approx(1.015 ** 2)
+        assert out["norm_ok"].tolist() == [True, True, True, False, False]
+        assert out["increment_status"][3] == "iqr_without_value"
+
+
 # ── Model Runner Tests (Unit) ──────────────────────────────
 
 class TestModelRunnerImports:
@@ -358,6 +827,55 @@ class TestModelRunnerImports:
         assert info["provider"] == "google"
 
 
+class TestMockServer:
+    """Run the real HTTP model runners against the local mock LLM server."""
+
+    MODELS = {
+        "anthropic": {"id": "mock-claude", "provider": "anthropic", "model": "claude-mock"},
+        "google": {"id": "mock-gemini", "provider": "google", "model": "gemini-mock"},
+        "ollama": {"id": "mock-llama", "provider": "ollama", "model": "llama-mock"},
+    }
+
+    def _run(self, stage_fn, provider, prompt_path, schema_path, **server_kwargs):
+        with open(prompt_path) as f:
+            prompt = f.read()
+        with open(schema_path) as f:
+            schema = json.load(f)
+        with MockLLMServer(**server_kwargs) as server, patch_runners(server.url):
+            config = {**self.MODELS[provider], "endpoint": server.url}
+            results, records, stats = stage_fn(TestScreeningPipeline.SAMPLE_CORPUS, config, 1, prompt, schema)
+        return results, records, stats, server.stats
+
+    @pytest.mark.parametrize("provider", ["anthropic", "google", "ollama"])
+    def test_screening_wire_formats(self, provider):
+        results, records, stats, _ = self._run(run_screening, provider,
+                                               SCREENING_PROMPT_PATH, SCREENING_SCHEMA_PATH)
+        assert stats["valid"] == 2
+        assert results[0]["output"]["decision"] in ("include", "exclude", "uncertain")
+        assert all(r["output_tokens"] for r in records)
+
+    def test_extraction_deterministic(self):
+        first, _, stats, _ = self._run(run_extraction, "ollama", EXTRACTION_PROMPT_PATH, EXTRACTION_SCHEMA_PATH)
+        second, _, _, _ = self._run(run_extraction, "ollama", EXTRACTION_PROMPT_PATH, EXTRACTION_SCHEMA_PATH)
+        assert stats["valid"] == 2
+        assert [r["output_hash"] for r in first] == [r["output_hash"] for r in second]
+
+    @patch("src.screening.runner.time.sleep")
+    def test_injected_429_is_retried(self, mock_sleep):
+        _, records, stats, served = self._run(run_screening, "anthropic", SCREENING_PROMPT_PATH,
+                                              SCREENING_SCHEMA_PATH, script=[429, 503])
+        assert stats["valid"] == 2
+        assert records[0]["attempts"] == 3 and records[1]["attempts"] == 1
+        assert served == {"requests": 4, "ok": 2, "429": 1, "5xx": 1, "malformed": 0}
+
+    @patch("src.screening.runner.time.sleep")
+    def test_malformed_output(self, mock_sleep):
+        results, _, stats, _ = self._run(run_screening, "google", SCREENING_PROMPT_PATH,
+                                         SCREENING_SCHEMA_PATH, malformed_rate=1.0)
+        assert stats["failed"] == 2
+        assert results[0]["output"]["error"] == "json_parse_failed"
+
+
 # ── Integration-style Tests ─────────────────────────────────
 
 class TestOrchestrator:
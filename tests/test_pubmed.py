@@ -0,0 +1,333 @@
+"""Tests for the PubMed E-utilities fetcher."""
+
+import io
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+
+import pytest
+
+from src.utils import pubmed_fetch
+from src.utils.pubmed_cache import CacheMiss, PubmedCache, request_key
+
+
+def _article_xml(pmid: str) -> str:
+    return (f"<PubmedArticle><MedlineCitation><PMID>{pmid}</PMID><Article>"
+            f"<ArticleTitle>Title {pmid}</ArticleTitle>"
+            f"<Abstract><AbstractText>Abstract {pmid}</AbstractText></Abstract>"
+            f"</Article></MedlineCitation></PubmedArticle>")
+
+
+def _efetch_response(url: str) -> bytes:
+    ids = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)["id"][0].split(",")
+    body = "".join(_article_xml(pmid) for pmid in ids)
+    return f"<PubmedArticleSet>{body}</PubmedArticleSet>".encode()
+
+
+def _serve(monkeypatch, http_get):
+    monkeypatch.setattr(pubmed_fetch, "_http_get", http_get)
+    monkeypatch.setattr(pubmed_fetch, "_http_open", lambda url, timeout: io.BytesIO(http_get(url, timeout)))
+
+
+def _history_server(monkeypatch, results: dict, requests: list, no_abstract=lambda pmid: int(pmid) % 50 == 0):
+    """Fake E-utilities history server: esearch, epost and efetch (uilist or XML) by WebEnv."""
+    posted = {}
+
+    def http_get(url, timeout):
+        params = {k: v[0] for k, v in urllib.parse.parse_qs(urllib.parse.urlparse(url).query).items()}
+        requests.append(params)
+        if url.startswith(pubmed_fetch.ESEARCH_URL):
+            assert params["usehistory"] == "y"
+            return json.dumps({"esearchresult": {"count": str(len(results[params["term"]])),
+                                                 "webenv": f"Q:{params['term']}", "querykey": "1"}}).encode()
+        assert "id" not in params
+        kind, key = params["WebEnv"].split(":", 1)
+        ids = results[key] if kind == "Q" else posted[key]
+        start = int(params["retstart"])
+        page = ids[start:start + int(params["retmax"])]
+        if params["rettype"] == "uilist":
+            return "\n".join(page).encode()
+        body = "".join(_article_xml(i) for i in page if not no_abstract(i))
+        return f"<PubmedArticleSet>{body}</PubmedArticleSet>".encode()
+
+    def http_post(url, data, timeout):
+        assert url == pubmed_fetch.EPOST_URL
+        requests.append({**data, "_method": "POST"})
+        key = str(len(posted))
+        posted[key] = data["id"].split(",")
+        return f"<ePostResult><QueryKey>1</QueryKey><WebEnv>P:{key}</WebEnv></ePostResult>".encode()
+
+    _serve(monkeypatch, http_get)
+    monkeypatch.setattr(pubmed_fetch, "_http_post", http_post)
+
+
+@pytest.fixture
+def fast(monkeypatch):
+    monkeypatch.setattr(pubmed_fetch, "BACKOFF_BASE", 0.0)
+    monkeypatch.setattr(pubmed_fetch, "_limiters", {})
+    monkeypatch.setattr(pubmed_fetch, "RATE_WITHOUT_KEY", 1000.0)
+
+
+# ── Concurrent efetch Tests ─────────────────────────────────
+
+class TestConcurrentFetch:
+    """Test rate limiting, retries and ordering of batched efetch."""
+
+    def test_order_is_deterministic(self, monkeypatch, fast):
+        rng = random.Random(0)
+
+        def http_get(url, timeout):
+            time.sleep(rng.uniform(0, 0.01))
+            return _efetch_response(url)
+
+        _serve(monkeypatch, http_get)
+        pmids = [str(i) for i in range(1, 1001)]
+        articles = pubmed_fetch.efetch_batch(pmids, batch_size=37, max_workers=8)
+        assert [a["pmid"] for a in articles] == pmids
+
+    def test_transient_failures_retried(self, monkeypatch, fast):
+        failures = {"1": 2}
+        lock = threading.Lock()
+
+        def http_get(url, timeout):
+            first = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)["id"][0].split(",")[0]
+            with lock:
+                if failures.get(first, 0):
+                    failures[first] -= 1
+                    raise urllib.error.HTTPError(url, 503, "unavailable", {}, None)
+            return _efetch_response(url)
+
+        _serve(monkeypatch, http_get)
+        articles = pubmed_fetch.efetch_batch([str(i) for i in range(1, 11)], batch_size=5)
+        assert len(articles) == 10
+        assert failures["1"] == 0
+
+    def test_client_errors_not_retried(self, monkeypatch, fast):
+        calls = []
+
+        def http_get(url, timeout):
+            calls.append(url)
+            raise urllib.error.HTTPError(url, 400, "bad request", {}, None)
+
+        _serve(monkeypatch, http_get)
+        with pytest.raises(urllib.error.HTTPError):
+            pubmed_fetch.efetch_batch(["1"])
+        assert len(calls) == 1
+
+    def test_rate_limiter_spacing(self):
+        limiter = pubmed_fetch.RateLimiter(rate=50.0)
+        stamps = []
+
+        def worker():
+            for _ in range(5):
+                limiter.acquire()
+                stamps.append(time.monotonic())
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # 20 acquisitions at 50/s with a burst of 1 take at least 19 intervals
+        assert max(stamps) - min(stamps) >= 19 / 50 * 0.95
+
+    def test_limiter_chosen_by_api_key(self, monkeypatch):
+        monkeypatch.setattr(pubmed_fetch, "_limiters", {})
+        assert pubmed_fetch.rate_limiter("key").rate == pubmed_fetch.RATE_WITH_KEY
+        assert pubmed_fetch.rate_limiter(None).rate == pubmed_fetch.RATE_WITHOUT_KEY
+        assert pubmed_fetch.rate_limiter("other") is pubmed_fetch.rate_limiter("key")
+
+
+# ── History Server Tests ────────────────────────────────────
+
+class TestHistoryPaging:
+    """Test history-server search and retstart paging."""
+
+    COUNT = 2345
+
+    def _server(self, monkeypatch, requests):
+        def http_get(url, timeout):
+            params = {k: v[0] for k, v in urllib.parse.parse_qs(urllib.parse.urlparse(url).query).items()}
+            requests.append(params)
+            if url.startswith(pubmed_fetch.ESEARCH_URL):
+                assert params["usehistory"] == "y"
+                return json.dumps({"esearchresult": {"count": str(self.COUNT), "webenv": "ENV",
+                                                     "querykey": "1"}}).encode()
+            assert "id" not in params and params["WebEnv"] == "ENV"
+            start, size = int(params["retstart"]), int(params["retmax"])
+            time.sleep(random.uniform(0, 0.005))
+            body = "".join(_article_xml(str(i)) for i in range(start, min(start + size, self.COUNT)))
+            return f"<PubmedArticleSet>{body}</PubmedArticleSet>".encode()
+
+        _serve(monkeypatch, http_get)
+
+    def test_pages_cover_result_set_in_order(self, monkeypatch, fast):
+        requests = []
+        self._server(monkeypatch, requests)
+        history = pubmed_fetch.esearch_history("pm25")
+        assert history == {"count": self.COUNT, "webenv": "ENV", "query_key": "1"}
+        pages = list(pubmed_fetch.iter_efetch_history(history, batch_size=200, max_workers=4))
+        assert len(pages) == 12
+        assert [a["pmid"] for page in pages for a in page] == [str(i) for i in range(self.COUNT)]
+
+    def test_fetch_corpus_respects_retmax(self, monkeypatch, fast, tmp_path):
+        requests = []
+        self._server(monkeypatch, requests)
+        articles = pubmed_fetch.fetch_corpus("pm25", retmax=450, output_path=str(tmp_path / "raw.json"))
+        assert len(articles) == 450
+        assert sorted(int(r["retmax"]) for r in requests if "retstart" in r) == [50, 200, 200]
+        assert len(json.loads((tmp_path / "raw.json").read_text())) == 450
+        assert len(pubmed_fetch.fetch_corpus("pm25", retmax=None)) == self.COUNT
+
+    def test_mindate_restricts_search(self, monkeypatch, fast):
+        requests = []
+        self._server(monkeypatch, requests)
+        pubmed_fetch.esearch_history("pm25", mindate="2025/01/01")
+        assert requests[0]["datetype"] == "edat"
+        assert (requests[0]["mindate"], requests[0]["maxdate"]) == ("2025/01/01", "3000/12/31")
+
+
+# ── Streaming Parser Tests ──────────────────────────────────
+
+ARTICLE_SET = b"""<?xml version="1.0" ?>
+<PubmedArticleSet>
+<PubmedArticle><MedlineCitation><PMID>11</PMID><Article>
+  <Journal><Title>Environ Health</Title><JournalIssue><PubDate><Year>2019</Year></PubDate></JournalIssue></Journal>
+  <ArticleTitle><i>PM</i><sub>2.5</sub> and asthma</ArticleTitle>
+  <Abstract>
+    <AbstractText Label="BACKGROUND">Fine <i>particulate</i> matter.</AbstractText>
+    <AbstractText Label="RESULTS">RR 1.02 per 10 &#181;g/m<sup>3</sup>.</AbstractText>
+  </Abstract>
+  <AuthorList><Author><LastName>Li</LastName><ForeName>Wei</ForeName></Author></AuthorList>
+  <PublicationTypeList><PublicationType>Journal Article</PublicationType></PublicationTypeList>
+</Article>
+<MeshHeadingList><MeshHeading><DescriptorName>Asthma</DescriptorName></MeshHeading></MeshHeadingList>
+</MedlineCitation>
+<PubmedData><ArticleIdList><ArticleId IdType="doi">10.1/x</ArticleId></ArticleIdList></PubmedData>
+</PubmedArticle>
+<PubmedArticle><MedlineCitation><PMID>12</PMID><Article><ArticleTitle>No abstract</ArticleTitle></Article>
+</MedlineCitation></PubmedArticle>
+</PubmedArticleSet>
+"""
+
+
+class TestStreamingParser:
+    """Test iterparse-based article extraction."""
+
+    def test_mixed_content_and_fields(self):
+        (art,) = pubmed_fetch.iter_pubmed_articles(io.BytesIO(ARTICLE_SET))
+        assert art["pmid"] == "11"
+        assert art["title"] == "PM2.5 and asthma"
+        assert art["abstract"] == ("BACKGROUND: Fine particulate matter. "
+                                   "RESULTS: RR 1.02 per 10 \u00b5g/m3.")
+        assert art["authors"] == ["Li Wei"]
+        assert (art["journal"], art["year"], art["doi"]) == ("Environ Health", "2019", "10.1/x")
+        assert art["mesh_terms"] == ["Asthma"]
+
+    def test_string_wrapper_matches_stream(self):
+        streamed = list(pubmed_fetch.iter_pubmed_articles(io.BytesIO(ARTICLE_SET)))
+        assert pubmed_fetch._parse_pubmed_xml(ARTICLE_SET.decode()) == streamed
+
+    def test_malformed_article_skipped(self):
+        body = _article_xml("1") + "<PubmedArticle><MedlineCitation><PMID>2</PMID><Article>" \
+            "<Abstract><AbstractText>x</AbstractText></Abstract><PubDate><Year/></PubDate>" \
+            "</Article></MedlineCitation></PubmedArticle>" + _article_xml("3")
+        stream = io.BytesIO(f"<PubmedArticleSet>{body}</PubmedArticleSet>".encode())
+        assert [a["pmid"] for a in pubmed_fetch.iter_pubmed_articles(stream)] == ["1", "3"]
+
+
+# ── Cache Tests ─────────────────────────────────────────────
+
+class TestPubmedCache:
+    """Test cached search results and per-PMID article reuse."""
+
+    RESULTS = {"pm25": [str(i) for i in range(1, 301)], "asthma": [str(i) for i in range(201, 401)]}
+
+    def test_key_ignores_api_key_and_whitespace(self):
+        a = request_key("esearch", {"term": "PM2.5  AND\nasthma", "retmax": 10, "api_key": "secret"})
+        b = request_key("esearch", {"retmax": "10", "term": "PM2.5 AND asthma"})
+        assert a == b
+
+    def test_overlapping_queries_reuse_articles(self, monkeypatch, fast, tmp_path):
+        requests = []
+        _history_server(monkeypatch, self.RESULTS, requests)
+        cache = PubmedCache(str(tmp_path / "cache.sqlite"))
+
+        first = pubmed_fetch.fetch_corpus("pm25", retmax=None, cache=cache)
+        assert len(first) == 294
+        requests.clear()
+        second = pubmed_fetch.fetch_corpus("asthma", retmax=None, cache=cache, api_key="k")
+        (posted,) = [r["id"].split(",") for r in requests if r.get("_method") == "POST"]
+        assert posted == [str(i) for i in range(301, 401)]
+        assert all("id" not in r for r in requests if r.get("_method") != "POST")
+        assert [a["pmid"] for a in second] == [str(i) for i in range(201, 401) if i % 50]
+
+        requests.clear()
+        assert pubmed_fetch.fetch_corpus("pm25", retmax=None, cache=cache) == first
+        assert requests == []
+
+    def test_search_pages_history_ids(self, monkeypatch, fast, tmp_path):
+        requests = []
+        _history_server(monkeypatch, {"big": [str(i) for i in range(25000)]}, requests)
+        pmids = pubmed_fetch.search_pmids("big", cache=PubmedCache(str(tmp_path / "cache.sqlite")))
+        assert pmids == [str(i) for i in range(25000)]
+        assert [r["retstart"] for r in requests if r.get("rettype") == "uilist"] == ["0", "10000", "20000"]
+
+    def test_ttl_expires_search_results(self, monkeypatch, fast, tmp_path):
+        requests = []
+        _history_server(monkeypatch, self.RESULTS, requests)
+        cache = PubmedCache(str(tmp_path / "cache.sqlite"), ttl=60)
+        pubmed_fetch.search_pmids("pm25", cache=cache)
+        requests.clear()
+        pubmed_fetch.search_pmids("pm25", cache=cache)
+        assert requests == []
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 120)
+        pubmed_fetch.search_pmids("pm25", cache=cache)
+        assert len(requests) == 2  # esearch + one uilist page
+
+    def test_offline_mode(self, monkeypatch, fast, tmp_path):
+        requests = []
+        _history_server(monkeypatch, self.RESULTS, requests)
+        path = str(tmp_path / "cache.sqlite")
+        online = pubmed_fetch.fetch_corpus("pm25", retmax=None, cache=PubmedCache(path, ttl=0))
+
+        requests.clear()
+        offline = PubmedCache(path, ttl=0, offline=True)
+        assert pubmed_fetch.fetch_corpus("pm25", retmax=None, cache=offline) == online
+        assert requests == []
+        with pytest.raises(CacheMiss):
+            pubmed_fetch.fetch_corpus("asthma", retmax=None, cache=offline)
+
+
+# ── Multi-Query Tests ───────────────────────────────────────
+
+class TestMultiQuery:
+    """Test concurrent searches with one shared efetch pass."""
+
+    RESULTS = {"a": ["1", "2", "3"], "b": ["3", "4"], "c": ["2", "5", "50"]}
+
+    def test_union_fetched_once_and_tagged(self, monkeypatch, fast):
+        requests = []
+        _history_server(monkeypatch, self.RESULTS, requests, no_abstract=lambda pmid: pmid == "50")
+        queries = [("A", "a", 100), ("B", "b", 100), ("C", "c", None)]
+        articles = pubmed_fetch.fetch_multi_query(queries)
+        (posted,) = [r["id"].split(",") for r in requests if r.get("_method") == "POST"]
+        assert sorted(posted, key=int) == ["1", "2", "3", "4", "5", "50"]
+        assert {a["pmid"]: a["matched_queries"] for a in articles} == {
+            "1": ["A"], "2": ["A", "C"], "3": ["A", "B"], "4": ["B"], "5": ["C"],
+        }
+        assert [a["pmid"] for a in articles] == ["1", "2", "3", "4", "5"]
+
+    def test_union_served_from_cache(self, monkeypatch, fast, tmp_path):
+        requests = []
+        _history_server(monkeypatch, self.RESULTS, requests, no_abstract=lambda pmid: pmid == "50")
+        cache = PubmedCache(str(tmp_path / "cache.sqlite"))
+        queries = [("A", "a", 100), ("C", "c", None)]
+        first = pubmed_fetch.fetch_multi_query(queries, cache=cache)
+        requests.clear()
+        assert pubmed_fetch.fetch_multi_query(queries, cache=cache) == first
+        assert requests == []